@@ -0,0 +1,176 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import instrumentation
+
+# Responses telling that the backend is overloaded: the batch is sent again later
+OVERLOAD_STATUSES = {429, 502, 503, 504}
+
+
+def retryAfterSeconds(response, default=1.0):
+    """
+    Reads the Retry-After header of a response (a number of seconds or an HTTP date)
+
+    :response: the requests response
+    :default: seconds returned when the header is missing or invalid
+    :return: the seconds to wait
+    """
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+class AdaptiveController:
+    """
+    AIMD (additive increase, multiplicative decrease) control of the size of the batches and of
+    the number of concurrent requests sent to a backend service. Each request answered within
+    targetLatency grows the batch size by a fixed step and the concurrency by one, each up to its
+    maximum. A slow answer halves the batch size; an overload (429, 503, ...) halves both and
+    pauses the requests for the Retry-After time. The current batch size,
+    concurrency and rate are recorded as instrumentation gauges '<name>.batchSize', ...
+
+    :name: the name of the service in the gauges
+    :batchSize: the initial number of cells per request
+    :minBatchSize, maxBatchSize: the bounds of the batch size
+    :concurrency: the initial number of concurrent requests
+    :maxConcurrency: the maximum number of concurrent requests
+    :targetLatency: seconds above which a request is considered slow
+    :step: the additive increase of the batch size, minBatchSize if None
+    :decrease: the multiplicative decrease factor
+    """
+
+    def __init__(self, name='backend', batchSize=100, minBatchSize=10, maxBatchSize=5000,
+                 concurrency=1, maxConcurrency=8, targetLatency=2.0, step=None, decrease=0.5):
+        self.name = name
+        self.batchSize = batchSize
+        self.minBatchSize = minBatchSize
+        self.maxBatchSize = maxBatchSize
+        self.concurrency = concurrency
+        self.maxConcurrency = maxConcurrency
+        self.targetLatency = targetLatency
+        self.step = step or minBatchSize
+        self.decrease = decrease
+        # Cells per second, smoothed over the last requests
+        self.rate = None
+        self.overloads = 0
+        self._pausedUntil = 0.0
+        self._lock = threading.Lock()
+
+    def success(self, cells, seconds):
+        """Records a request of cells answered in seconds and adapts the batch size and concurrency"""
+        with self._lock:
+            if seconds > self.targetLatency:
+                self.batchSize = max(self.minBatchSize, int(self.batchSize * self.decrease))
+            else:
+                self.batchSize = min(self.maxBatchSize, self.batchSize + self.step)
+                self.concurrency = min(self.maxConcurrency, self.concurrency + 1)
+            rate = cells * self.concurrency / seconds if seconds > 0 else None
+            if rate is not None:
+                self.rate = rate if self.rate is None else 0.8 * self.rate + 0.2 * rate
+        self._gauges()
+
+    def overload(self, retryAfter=0.0):
+        """Records an overloaded answer of the backend: backs off, and pauses for retryAfter seconds"""
+        with self._lock:
+            self.overloads += 1
+            self.batchSize = max(self.minBatchSize, int(self.batchSize * self.decrease))
+            self.concurrency = max(1, int(self.concurrency * self.decrease))
+            self._pausedUntil = max(self._pausedUntil, time.monotonic() + retryAfter)
+        instrumentation.add(self.name + '.overloads')
+        self._gauges()
+
+    def wait(self):
+        """Sleeps until the end of the pause asked by the backend, if any"""
+        delay = self._pausedUntil - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _gauges(self):
+        instrumentation.gauge(self.name + '.batchSize', self.batchSize)
+        instrumentation.gauge(self.name + '.concurrency', self.concurrency)
+        if self.rate is not None:
+            instrumentation.gauge(self.name + '.cellsPerSecond', self.rate)
+
+
+# Controllers kept per service URL, so that what is learned is reused by the next calls
+_controllers = {}
+_controllersLock = threading.Lock()
+
+
+def getController(url, name='backend'):
+    """Returns the AdaptiveController of a service URL, created on first use"""
+    with _controllersLock:
+        if url not in _controllers:
+            _controllers[url] = AdaptiveController(name)
+        return _controllers[url]
+
+
+def sendAdaptive(session, url, items, buildPayload, controller, maxRetries=5):
+    """
+    Sends items to a backend service in batches whose size and concurrency follow the controller.
+    The batches answered with an overload status are sent again after the backend's Retry-After
+    time, split to the batch size reduced by the overload; other errors are raised (requests.HTTPError)
+
+    :session: the requests session
+    :url: the URL of the service
+    :items: the list of items to send
+    :buildPayload: function building the payload of a request from (items, start), start being
+                   the position of the first item of the batch
+    :controller: the AdaptiveController of the service
+    :maxRetries: the number of times a batch is sent again before the error is raised
+    :return: the response texts, in the order of the items
+    """
+    texts = {}
+    # Batches to send again: (start, end, attempt)
+    retries = deque()
+    position = 0
+
+    def post(start, end):
+        controller.wait()
+        began = time.perf_counter()
+        response = session.post(url, json=buildPayload(items[start:end], start))
+        return response, time.perf_counter() - began
+
+    with ThreadPoolExecutor(max_workers=controller.maxConcurrency) as executor:
+        running = {}
+        while position < len(items) or retries or running:
+            while len(running) < controller.concurrency and (retries or position < len(items)):
+                if retries:
+                    start, end, attempt = retries.popleft()
+                    if end - start > controller.batchSize:
+                        # The batch size was reduced by the overload: the rest of the batch is sent apart
+                        retries.appendleft((start + controller.batchSize, end, attempt))
+                        end = start + controller.batchSize
+                else:
+                    start, end, attempt = position, min(len(items), position + controller.batchSize), 0
+                    position = end
+                running[executor.submit(post, start, end)] = (start, end, attempt)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                start, end, attempt = running.pop(future)
+                response, seconds = future.result()
+                if response.status_code in OVERLOAD_STATUSES and attempt < maxRetries:
+                    controller.overload(retryAfterSeconds(response))
+                    retries.append((start, end, attempt + 1))
+                    continue
+                response.raise_for_status()
+                controller.success(end - start, seconds)
+                texts[start] = response.text
+    return [texts[start] for start in sorted(texts)]
+
+# Example usage:
+#controller = AdaptiveController('reconcile', batchSize=200, maxConcurrency=4, targetLatency=1.0)
+#texts = sendAdaptive(semtui.SESSION, url, items, lambda batch, start: {'serviceId': 'wikidata', 'items': batch}, controller)
+#print(instrumentation.summary()['gauges'])
@@ -0,0 +1,398 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+import backpressure
+import instrumentation
+import semtui
+import utils
+from mock_semtui import RECONCILIATORS, MockSemtuiServer, make_candidates, make_table
+
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+N_COLS = 10
+# parseTable grows the DataFrame row by row (quadratic): larger tables are not parsed
+PARSE_TABLE_MAX_CELLS = 10000
+
+
+def measure(server, operation, *args, trace_memory=True, **kwargs):
+    """
+    Runs an operation once and measures it
+
+    :server: the MockSemtuiServer the operation talks to
+    :operation: the function to run
+    :trace_memory: if True, the peak of Python allocations is traced (this slows the operation down)
+    :return: a tuple (result, measures)
+    """
+    server.reset_counters()
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    instrumentation.enable()
+    start = time.perf_counter()
+    result = operation(*args, **kwargs)
+    seconds = time.perf_counter() - start
+    instrumentation.disable()
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, {
+        'seconds': seconds,
+        'peakMemoryBytes': peak,
+        'requests': dict(server.requests),
+        'bytesUploaded': server.bytesReceived,
+        'bytesDownloaded': server.bytesSent,
+        # Time spent in each stage (network, decoding, utils functions)
+        'stages': {name: stage['seconds'] for name, stage in instrumentation.summary()['spans'].items()},
+    }
+
+
+def run_size(server, idTable, nCells, trace_memory=True, parseTableMaxCells=PARSE_TABLE_MAX_CELLS):
+    """
+    Times getTable, parseTable, reconcile, extendColumn and updateTable on a table of nCells cells
+
+    :parseTableMaxCells: parseTable is skipped on larger tables, always timed if None
+
+    :return: list of measures, one per operation
+    """
+    nRows = max(1, nCells // N_COLS)
+    server.tables[(1, idTable)] = (nRows, N_COLS)
+    server.table_json(1, idTable)
+    results = []
+
+    def record(name, operation, *args, **kwargs):
+        result, measures = measure(server, operation, *args, trace_memory=trace_memory, **kwargs)
+        measures.update({'operation': name, 'cells': nRows * N_COLS, 'rows': nRows})
+        results.append(measures)
+        print(f"{nRows * N_COLS:>9} cells  {name:<14} {measures['seconds']:9.3f} s")
+        return result
+
+    table = record('getTable', semtui.getTable, 1, idTable)
+    if parseTableMaxCells is None or nRows * N_COLS <= parseTableMaxCells:
+        record('parseTable', utils.parseTable, json.dumps(table['raw']))
+    table = record('reconcile', semtui.reconcile, table, 'col0', 'wikidata')
+    record('updateTable', semtui.updateTable, table)
+    table = record('extendColumn', semtui.extendColumn, table, 'col0', 'wikidataSPARQL',
+                   ['wdt:P625'], ['coordinates'])
+    record('updateTable', semtui.updateTable, table)
+    return results
+
+
+def time_stage(name, operation, *args):
+    """Runs an operation once and returns (result, seconds), printing the time"""
+    gc.collect()
+    start = time.perf_counter()
+    result = operation(*args)
+    seconds = time.perf_counter() - start
+    print(f"{name:<28} {seconds:9.3f} s")
+    return result, seconds
+
+
+def run_merge_benchmark(nCells=1000000, candidates=3):
+    """
+    Times the in-memory merge of reconciliation and extension results into a table of
+    nCells cells (one column), without any backend: createCellMetadataNameField,
+    updateMetadataCells, the column and table metadata, and addExtendedCell
+
+    :nCells: the number of cells reconciled and extended
+    :candidates: number of candidates of each reconciled cell
+    :return: dictionary of the seconds of each stage
+    """
+    table = make_table(1, 1, nCells, 1)
+    response = [{'id': f"{rowId}$col0", 'metadata': make_candidates(row['cells']['col0']['label'], candidates)}
+                for rowId, row in table['rows'].items()]
+    extension = {'label': 'P625', 'kind': 'entity', 'metadata': [],
+                 'cells': {rowId: {'label': f"entity of {rowId}",
+                                   'metadata': [{'id': 'wd:Q1', 'name': 'entity', 'score': 1.0, 'match': True}]}
+                           for rowId in table['rows']}}
+    results = {'cells': nCells, 'candidates': candidates}
+    metadata, results['createCellMetadataNameField'] = time_stage(
+        'createCellMetadataNameField', utils.createCellMetadataNameField, response, 'wikidata', RECONCILIATORS)
+    table, results['updateMetadataCells'] = time_stage(
+        'updateMetadataCells', utils.updateMetadataCells, table, metadata)
+    table, results['updateMetadataColumn'] = time_stage(
+        'updateMetadataColumn', utils.updateMetadataColumn, table, 'col0', 'wikidata', metadata, RECONCILIATORS)
+    table, results['updateMetadataTable'] = time_stage('updateMetadataTable', utils.updateMetadataTable, table)
+    table, results['addExtendedCell'] = time_stage(
+        'addExtendedCell', utils.addExtendedCell, table, extension, 'P625', 'wikidata', RECONCILIATORS)
+    return results
+
+
+def run_postprocess_benchmark(nCells=1000000, candidates=3, processes=None):
+    """
+    Times the decoding and post-processing of a reconciliation response of nCells cells
+    (one column), without any backend: in this process, then sharded by row ranges across
+    a process pool
+
+    :nCells: the number of cells reconciled
+    :candidates: number of candidates of each reconciled cell
+    :processes: the number of worker processes, the number of CPUs if None
+    :return: dictionary of the seconds of each mode and of the speedup
+    """
+    processes = processes or os.cpu_count() or 1
+
+    def response_for(table):
+        return [{'id': f"{rowId}$col0", 'metadata': make_candidates(row['cells']['col0']['label'], candidates)}
+                for rowId, row in table['rows'].items()]
+
+    results = {'cells': nCells, 'candidates': candidates, 'processes': processes}
+    for name, nProcesses in (('serial', 1), ('parallel', processes)):
+        table = make_table(1, 1, nCells, 1)
+        # The undecoded batch responses, as received by semtui.reconcile
+        shards = [json.dumps(shard) for shard in utils.shardResponse(response_for(table), processes)]
+        _, results[name] = time_stage(f"postProcess {name} ({nProcesses})", utils.postProcessReconciliation,
+                                      table, shards, 'wikidata', RECONCILIATORS, nProcesses)
+    results['speedup'] = results['serial'] / results['parallel'] if results['parallel'] > 0 else None
+    print(f"{'speedup':<28} x{results['speedup']:.2f}")
+    return results
+
+
+def run_storage_benchmark(nCells=100000, candidates=10, topK=3):
+    """
+    Compares the memory and the upload payload of a reconciled column of nCells cells
+    (one column) stored in full, and with top-k pruning and compact candidates
+
+    :nCells: the number of cells reconciled
+    :candidates: number of candidates returned for each cell
+    :topK: the number of candidates kept by the pruned mode
+    :return: dictionary of the bytes of each mode, the memory being the one added to the table
+    """
+    results = {'cells': nCells, 'candidates': candidates, 'topK': topK}
+    for name, options in (('full', {}), ('compact', {'topK': topK, 'compact': True})):
+        table = make_table(1, 1, nCells, 1)
+        response = [{'id': f"{rowId}$col0", 'metadata': make_candidates(row['cells']['col0']['label'], candidates)}
+                    for rowId, row in table['rows'].items()]
+        gc.collect()
+        tracemalloc.start()
+        table, metadata = utils.postProcessReconciliation(table, [response], 'wikidata', RECONCILIATORS, **options)
+        table = utils.updateMetadataColumn(table, 'col0', 'wikidata', metadata, RECONCILIATORS)
+        del response, metadata
+        gc.collect()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        payload = len(json.dumps(utils.createUpdatePayload(table)))
+        results[name] = {'memoryBytes': memory, 'payloadBytes': payload}
+        print(f"{name:<10} memory {memory / 2 ** 20:9.1f} MiB  payload {payload / 2 ** 20:9.1f} MiB")
+    return results
+
+
+def run_dataset_benchmark(nTables=8, nCells=10000, workers=4, latency=0.0, candidates=3):
+    """
+    Times processDataset (reconcile, extend and update of every table of a dataset) against a
+    local MockSemtuiServer, with one table at a time and then with several tables at a time
+
+    :nTables: the number of tables of the dataset
+    :nCells: the number of cells of each table
+    :workers: the number of tables processed at the same time by the concurrent run
+    :latency: seconds added by the mock backend to each response
+    :candidates: number of candidates returned for each reconciled cell
+    :return: dictionary of the seconds, throughput and requests of each run
+    """
+    nRows = max(1, nCells // N_COLS)
+    operations = [{'op': 'reconcile', 'column': 'col0', 'reconciliator': 'wikidata'},
+                  {'op': 'extend', 'column': 'col0', 'extender': 'wikidataSPARQL',
+                   'properties': ['wdt:P625'], 'newColumns': ['coordinates']}]
+    results = {'tables': nTables, 'cells': nRows * N_COLS, 'workers': workers}
+    tables = {(1, idTable): (nRows, N_COLS) for idTable in range(1, nTables + 1)}
+    with MockSemtuiServer(tables, latency=latency, candidates=candidates) as server:
+        previous_uri = semtui.SEMTUI_URI
+        semtui.SEMTUI_URI = server.uri
+        try:
+            for name, nWorkers in (('sequential', 1), ('concurrent', workers)):
+                server.reset_counters()
+                job = semtui.processDataset(1, operations, workers=nWorkers)
+                results[name] = {'seconds': job['seconds'], 'cellsPerSecond': job['cellsPerSecond'],
+                                 'failed': job['failed'], 'requests': dict(server.requests)}
+                print(f"{nTables} tables  {name:<10} {job['seconds']:9.3f} s  {job['cellsPerSecond']:12.0f} cells/s")
+        finally:
+            semtui.SEMTUI_URI = previous_uri
+    return results
+
+
+def run_adaptive_benchmark(nCells=100000, maxInFlight=2, cellLatency=0.00002, batchSize=100, candidates=3):
+    """
+    Compares fixed batches with adaptive batches (backpressure.AdaptiveController) when reconciling
+    a column against a MockSemtuiServer that answers 429 beyond maxInFlight concurrent requests
+
+    :nCells: the number of cells reconciled (one column)
+    :maxInFlight: the concurrent requests the mock backend accepts
+    :cellLatency: seconds the mock backend spends on each cell
+    :batchSize: the size of the fixed batches, and the initial size of the adaptive ones
+    :candidates: number of candidates returned for each reconciled cell
+    :return: dictionary of the seconds and requests of each mode, and the final adaptive state
+    """
+    results = {'cells': nCells, 'maxInFlight': maxInFlight}
+    with MockSemtuiServer({(1, 1): (nCells, 1)}, candidates=candidates, maxInFlight=maxInFlight,
+                          cellLatency=cellLatency) as server:
+        previous_uri = semtui.SEMTUI_URI
+        semtui.SEMTUI_URI = server.uri
+        try:
+            for name in ('fixed', 'adaptive'):
+                table = semtui.getTable(1, 1)
+                controller = None
+                options = {'batchSize': batchSize}
+                if name == 'adaptive':
+                    controller = backpressure.AdaptiveController('reconcile', batchSize=batchSize,
+                                                                 maxConcurrency=2 * maxInFlight, targetLatency=1.0)
+                    options = {'adaptive': controller}
+                server.reset_counters()
+                _, seconds = time_stage(f"reconcile {name}", lambda: semtui.reconcile(
+                    table, 'col0', 'wikidata', RECONCILIATORS, **options))
+                results[name] = {'seconds': seconds, 'cellsPerSecond': nCells / seconds,
+                                 'requests': dict(server.requests)}
+                if controller is not None:
+                    results[name].update({'batchSize': controller.batchSize, 'concurrency': controller.concurrency,
+                                          'overloads': controller.overloads})
+        finally:
+            semtui.SEMTUI_URI = previous_uri
+    return results
+
+
+IMPORT_MODULES = ['semtui', 'semtui_grid', 'semtui_llm', 'semtui_geocoding']
+# Optional packages whose presence in sys.modules after an import is reported
+OPTIONAL_PACKAGES = ['ipyaggrid', 'ipywidgets', 'groq', 'langchain_groq', 'pandasai']
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {optional} if name in sys.modules]}}))
+"""
+
+
+def import_time(module, repeats=5):
+    """
+    Measures the time to import a module in a fresh interpreter (the best of several runs)
+
+    :module: the module to import
+    :repeats: the number of fresh interpreters started
+    :return: dictionary with the seconds, and the optional packages the import loaded,
+             or the error if the module cannot be imported here
+    """
+    script = IMPORT_SCRIPT.format(module=module, optional=OPTIONAL_PACKAGES)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for _ in range(repeats):
+        process = subprocess.run([sys.executable, '-c', script], cwd=directory,
+                                 capture_output=True, text=True)
+        if process.returncode != 0:
+            return {'module': module, 'error': process.stderr.strip().splitlines()[-1]}
+        result = json.loads(process.stdout)
+        if best is None or result['seconds'] < best['seconds']:
+            best = result
+    best['module'] = module
+    return best
+
+
+def run_import_benchmarks(modules=None, repeats=5):
+    """Measures the import time of semtui and of its optional integration modules"""
+    results = []
+    for module in modules or IMPORT_MODULES:
+        result = import_time(module, repeats)
+        results.append(result)
+        if 'error' in result:
+            print(f"{module:<18} not importable: {result['error']}")
+        else:
+            print(f"{module:<18} {result['seconds']:9.3f} s  loads {', '.join(result['loaded']) or 'no optional package'}")
+    return results
+
+
+def compare(report, baseline):
+    """Prints the time ratio of each operation against a previous report"""
+    previous = {(item['cells'], item['operation']): item['seconds'] for item in baseline['results']}
+    for item in report['results']:
+        key = (item['cells'], item['operation'])
+        if key in previous and previous[key] > 0:
+            print(f"{item['cells']:>9} cells  {item['operation']:<14} x{item['seconds'] / previous[key]:.2f}")
+
+
+def run_benchmarks(sizes=None, latency=0.0, candidates=3, trace_memory=True, parseTableMaxCells=PARSE_TABLE_MAX_CELLS):
+    """
+    Runs the benchmarks against a local MockSemtuiServer
+
+    :sizes: the table sizes in cells
+    :latency: seconds added by the mock backend to each response
+    :candidates: number of candidates returned for each reconciled cell
+    :trace_memory: if True, the peak memory of each operation is measured
+    :parseTableMaxCells: parseTable is only timed on tables of at most this many cells, on all if None
+    :return: the report as a dictionary
+    """
+    sizes = sizes or DEFAULT_SIZES
+    report = {'meta': {'date': datetime.now().isoformat(), 'python': platform.python_version(),
+                       'platform': platform.platform(), 'latency': latency, 'candidates': candidates,
+                       'columns': N_COLS},
+              'results': []}
+    with MockSemtuiServer(latency=latency, candidates=candidates) as server:
+        previous_uri = semtui.SEMTUI_URI
+        semtui.SEMTUI_URI = server.uri
+        try:
+            for idTable, nCells in enumerate(sizes, start=1):
+                report['results'].extend(run_size(server, idTable, nCells, trace_memory, parseTableMaxCells))
+        finally:
+            semtui.SEMTUI_URI = previous_uri
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the SemTUI client against a local mock backend.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help='table sizes in cells, e.g. 1000 10000 100000 1000000')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to each backend response')
+    parser.add_argument('--candidates', type=int, default=3, help='candidates per reconciled cell')
+    parser.add_argument('--parse-table-max-cells', type=int, default=PARSE_TABLE_MAX_CELLS,
+                        help='larger tables are not parsed by parseTable, which is quadratic (0 to always parse)')
+    parser.add_argument('--no-memory', action='store_true', help='do not trace the peak memory (faster)')
+    parser.add_argument('--output', default='benchmark_report.json', help='where to write the JSON report')
+    parser.add_argument('--baseline', default=None, help='previous JSON report to compare with')
+    parser.add_argument('--merge-cells', type=int, default=None,
+                        help='also time the in-memory metadata merge on a table of this many cells, e.g. 1000000')
+    parser.add_argument('--postprocess-cells', type=int, default=None,
+                        help='also compare serial and multi-process post-processing of a reconciliation '
+                             'response of this many cells, e.g. 1000000')
+    parser.add_argument('--processes', type=int, default=None,
+                        help='worker processes of the post-processing benchmark, the number of CPUs by default')
+    parser.add_argument('--storage-cells', type=int, default=None,
+                        help='also compare the memory and payload of full and pruned/compact candidates '
+                             'on a column of this many cells')
+    parser.add_argument('--top-k', type=int, default=3, help='candidates kept by the storage benchmark')
+    parser.add_argument('--dataset-tables', type=int, default=None,
+                        help='also time processDataset on a dataset of this many tables (of the first size)')
+    parser.add_argument('--workers', type=int, default=4, help='tables processed at the same time by processDataset')
+    parser.add_argument('--adaptive-cells', type=int, default=None,
+                        help='also compare fixed and adaptive batches against a mock backend accepting '
+                             '--max-in-flight concurrent requests, on a column of this many cells')
+    parser.add_argument('--max-in-flight', type=int, default=2,
+                        help='concurrent requests accepted by the mock backend of the adaptive benchmark')
+    parser.add_argument('--imports', action='store_true',
+                        help='also measure the import time of semtui and of its optional modules')
+    args = parser.parse_args()
+
+    report = run_benchmarks(args.sizes, args.latency, args.candidates, not args.no_memory,
+                            args.parse_table_max_cells or None)
+    if args.merge_cells:
+        report['merge'] = run_merge_benchmark(args.merge_cells, args.candidates)
+    if args.postprocess_cells:
+        report['postprocess'] = run_postprocess_benchmark(args.postprocess_cells, args.candidates, args.processes)
+    if args.storage_cells:
+        report['storage'] = run_storage_benchmark(args.storage_cells, args.candidates, args.top_k)
+    if args.dataset_tables:
+        report['dataset'] = run_dataset_benchmark(args.dataset_tables, args.sizes[0], args.workers,
+                                                  args.latency, args.candidates)
+    if args.adaptive_cells:
+        report['adaptive'] = run_adaptive_benchmark(args.adaptive_cells, args.max_in_flight, candidates=args.candidates)
+    if args.imports:
+        report['imports'] = run_import_benchmarks()
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            compare(report, json.load(file))
@@ -0,0 +1,257 @@
+import functools
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger('semtui.instrumentation')
+
+# Checked on every span and traced call: while False, instrumentation costs one global lookup
+ENABLED = False
+
+_config = {'log': False, 'trace_memory': False, 'max_spans': 100000}
+_lock = threading.Lock()
+_local = threading.local()
+_spans = []
+_counters = {}
+_gauges = {}
+_trace_id = None
+
+
+def enable(log=False, trace_memory=False, max_spans=100000):
+    """
+    Turns the instrumentation on and clears the previous measures
+
+    :log: if True, every finished span is also logged on the 'semtui.instrumentation' logger
+    :trace_memory: if True, the memory allocated during each span is measured with tracemalloc
+                   (this slows the traced code down)
+    :max_spans: maximum number of finished spans kept, the oldest are dropped beyond
+    """
+    global ENABLED, _trace_id
+    reset()
+    _config.update({'log': log, 'trace_memory': trace_memory, 'max_spans': max_spans})
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _trace_id = os.urandom(16).hex()
+    ENABLED = True
+
+
+def disable():
+    """Turns the instrumentation off, the measures are kept until the next enable or reset"""
+    global ENABLED
+    ENABLED = False
+    if _config['trace_memory'] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def reset():
+    """Clears the spans, counters and gauges"""
+    with _lock:
+        _spans.clear()
+        _counters.clear()
+        _gauges.clear()
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _record(entry):
+    with _lock:
+        _spans.append(entry)
+        if len(_spans) > _config['max_spans']:
+            del _spans[:len(_spans) - _config['max_spans']]
+    if _config['log']:
+        logger.info("%s %.3f ms %s", entry['name'], entry['duration'] / 1e6, entry['attributes'])
+
+
+class _NoopSpan:
+    """Span returned while the instrumentation is disabled: it does nothing"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Span:
+    """Timing span, to be used as a context manager. Spans opened inside it are its children"""
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+
+    def set(self, **attributes):
+        """Adds attributes to the span (e.g. payload sizes)"""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent_id = stack[-1].span_id if stack else None
+        stack.append(self)
+        if _config['trace_memory'] and tracemalloc.is_tracing():
+            self.memory = tracemalloc.get_traced_memory()[0]
+        else:
+            self.memory = None
+        self.start_wall = time.time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter_ns() - self.start
+        _stack().pop()
+        if self.memory is not None and tracemalloc.is_tracing():
+            self.attributes['allocatedBytes'] = tracemalloc.get_traced_memory()[0] - self.memory
+        _record({'name': self.name, 'spanId': self.span_id, 'parentId': self.parent_id,
+                 'start': self.start_wall, 'duration': duration, 'attributes': self.attributes,
+                 'error': repr(exc) if exc is not None else None})
+        return False
+
+
+def span(name, **attributes):
+    """
+    Opens a timing span: with instrumentation.span('utils.updateMetadataCells'): ...
+
+    :name: the name of the measured stage
+    :attributes: attributes recorded with the span
+    :return: a Span, or a shared no-op span while the instrumentation is disabled
+    """
+    if not ENABLED:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def traced(name):
+    """Decorator measuring every call of a function as a span"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return function(*args, **kwargs)
+            with Span(name, {}):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def add(name, value=1):
+    """Adds a value to a counter (e.g. number of requests, bytes sent)"""
+    if not ENABLED:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def gauge(name, value):
+    """Records the current value of a measure (e.g. the current request rate)"""
+    if not ENABLED:
+        return
+    with _lock:
+        _gauges[name] = value
+
+
+def record_response(response, *args, **kwargs):
+    """
+    requests response hook: records each HTTP call as a span ('http.<METHOD>') with its
+    network time, and counts the requests and the bytes sent and received
+    """
+    if not ENABLED:
+        return
+    body = response.request.body or b''
+    sent = len(body if isinstance(body, bytes) else str(body).encode())
+    received = len(response.content)
+    duration = int(response.elapsed.total_seconds() * 1e9)
+    stack = _stack()
+    _record({'name': 'http.' + response.request.method, 'spanId': os.urandom(8).hex(),
+             'parentId': stack[-1].span_id if stack else None,
+             'start': time.time_ns() - duration, 'duration': duration,
+             'attributes': {'url': response.request.url, 'status': response.status_code,
+                            'bytesSent': sent, 'bytesReceived': received},
+             'error': None})
+    add('http.requests')
+    add('http.bytesSent', sent)
+    add('http.bytesReceived', received)
+
+
+def spans():
+    """Returns a copy of the finished spans"""
+    with _lock:
+        return list(_spans)
+
+
+def summary():
+    """
+    Summarizes the measures
+
+    :return: dictionary with, for each span name, the number of calls, the total and maximum
+             duration in seconds and the allocated bytes, plus the counters and gauges
+    """
+    stages = {}
+    for entry in spans():
+        stage = stages.setdefault(entry['name'], {'count': 0, 'seconds': 0.0, 'maxSeconds': 0.0})
+        seconds = entry['duration'] / 1e9
+        stage['count'] += 1
+        stage['seconds'] += seconds
+        stage['maxSeconds'] = max(stage['maxSeconds'], seconds)
+        if 'allocatedBytes' in entry['attributes']:
+            stage['allocatedBytes'] = stage.get('allocatedBytes', 0) + entry['attributes']['allocatedBytes']
+    with _lock:
+        return {'spans': stages, 'counters': dict(_counters), 'gauges': dict(_gauges)}
+
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def to_otel(service_name='semtui'):
+    """
+    Exports the spans in the OpenTelemetry (OTLP/JSON) trace format, which can be sent to an
+    OpenTelemetry collector
+
+    :service_name: the service.name resource attribute
+    :return: the OTLP/JSON document as a dictionary
+    """
+    otel_spans = []
+    for entry in spans():
+        otel_span = {
+            'traceId': _trace_id or '0' * 32,
+            'spanId': entry['spanId'],
+            'name': entry['name'],
+            'kind': 3 if entry['name'].startswith('http.') else 1,
+            'startTimeUnixNano': str(entry['start']),
+            'endTimeUnixNano': str(entry['start'] + entry['duration']),
+            'attributes': [{'key': key, 'value': _otel_value(value)} for key, value in entry['attributes'].items()],
+            'status': {'code': 2, 'message': entry['error']} if entry['error'] else {'code': 1},
+        }
+        if entry['parentId']:
+            otel_span['parentSpanId'] = entry['parentId']
+        otel_spans.append(otel_span)
+    return {'resourceSpans': [{
+        'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': service_name}}]},
+        'scopeSpans': [{'scope': {'name': 'semtui.instrumentation'}, 'spans': otel_spans}],
+    }]}
+
+
+# Example usage:
+#instrumentation.enable(trace_memory=True)
+#table = semtui.reconcile(semtui.getTable(29, 253), 'citta', 'wikidata')
+#instrumentation.disable()
+#print(instrumentation.summary())
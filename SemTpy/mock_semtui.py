@@ -0,0 +1,261 @@
+import json
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Services exposed by the fake backend, in the format of /reconciliators/list and /extenders/list
+RECONCILIATORS = [
+    {'id': 'wikidata', 'relativeUrl': '/wikidata', 'name': 'Wikidata',
+     'uri': 'https://www.wikidata.org/wiki/', 'prefix': 'wd'},
+]
+EXTENDERS = [
+    {'id': 'wikidataSPARQL', 'relativeUrl': '/wikidata/entities', 'name': 'Wikidata SPARQL'},
+]
+
+
+def make_table(idDataset, idTable, nRows, nCols):
+    """
+    Builds a synthetic table in the raw format returned by the backend
+
+    :idDataset: the dataset's ID
+    :idTable: the table's ID
+    :nRows: the number of rows
+    :nCols: the number of columns, named col0, col1, ...
+    :return: the table in raw format
+    """
+    columnNames = [f"col{i}" for i in range(nCols)]
+    columns = {name: {'id': name, 'label': name, 'status': 'empty', 'context': {},
+                      'metadata': [], 'annotationMeta': {}} for name in columnNames}
+    rows = {}
+    for r in range(nRows):
+        rowId = f"r{r}"
+        rows[rowId] = {'id': rowId, 'cells': {
+            name: {'id': f"{rowId}${name}", 'label': f"value {r} {name}", 'metadata': [], 'annotationMeta': {}}
+            for name in columnNames}}
+    table = {'id': idTable, 'idDataset': idDataset, 'name': f"table{idTable}",
+             'nCols': nCols, 'nRows': nRows, 'nCells': nRows * nCols, 'nCellsReconciliated': 0,
+             'lastModifiedDate': '2024-01-01T00:00:00.000Z', 'minMetaScore': 0, 'maxMetaScore': 0}
+    return {'table': table, 'columns': columns, 'rows': rows}
+
+
+def make_candidates(label, nCandidates):
+    """Deterministic fake reconciliation candidates for a cell label"""
+    seed = zlib.crc32(label.encode())
+    candidates = []
+    for i in range(nCandidates):
+        entityId = (seed + i) % 1000000
+        candidates.append({
+            'id': f"wd:Q{entityId}",
+            'name': f"{label} candidate {i}",
+            'score': round(1.0 - i / (nCandidates + 1) - (seed % 7) / 100, 3),
+            # Three cells out of four get a match on their first candidate
+            'match': i == 0 and seed % 4 != 0,
+            'type': [{'id': 'wd:Q33506', 'name': 'museum'}],
+        })
+    return candidates
+
+
+class MockSemtuiServer:
+    """
+    Local fake SemTUI backend for benchmarks and tests. It serves synthetic tables, the
+    service lists, fake reconciliator and extender responses, and accepts table updates.
+    Every response can be delayed by a fixed latency, and the requests are counted by kind.
+
+    :tables: dictionary (idDataset, idTable) -> (nRows, nCols) of the tables to serve
+    :latency: seconds added to each response
+    :candidates: number of candidates returned for each reconciled cell
+    :port: the port to listen on, a free port if 0
+    :maxInFlight: if given, the reconciliation and extension requests beyond this number of concurrent
+                  requests are answered 429 with a Retry-After header, like an overloaded backend
+    :cellLatency: seconds added to a reconciliation or extension response for each cell, so that
+                  large batches are slower
+    """
+
+    def __init__(self, tables=None, latency=0.0, candidates=3, port=0, maxInFlight=None, cellLatency=0.0):
+        self.tables = dict(tables or {})
+        # idDataset -> lastModifiedDate, for the datasets modified since the server started
+        self.modified = {}
+        self.latency = latency
+        self.candidates = candidates
+        self.maxInFlight = maxInFlight
+        self.cellLatency = cellLatency
+        self.inFlight = 0
+        self.requests = {}
+        self.bytesReceived = 0
+        self.bytesSent = 0
+        self._cache = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def uri(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/api/"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def reset_counters(self):
+        with self._lock:
+            self.requests = {}
+            self.bytesReceived = 0
+            self.bytesSent = 0
+
+    def count(self, kind, received, sent):
+        with self._lock:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+            self.bytesReceived += received
+            self.bytesSent += sent
+
+    def table_json(self, idDataset, idTable):
+        # The serialized tables are kept, so that timings do not include building them
+        key = (idDataset, idTable)
+        if key not in self._cache:
+            nRows, nCols = self.tables[key]
+            self._cache[key] = json.dumps(make_table(idDataset, idTable, nRows, nCols)).encode()
+        return self._cache[key]
+
+    def datasets(self):
+        ids = sorted({idDataset for idDataset, _ in self.tables})
+        return [{'id': idDataset, 'name': f"dataset{idDataset}",
+                 'nTables': sum(1 for d, _ in self.tables if d == idDataset),
+                 'lastModifiedDate': self.modified.get(idDataset, '2024-01-01T00:00:00.000Z')}
+                for idDataset in ids]
+
+    def dataset_tables(self, idDataset):
+        return [{'id': idTable, 'idDataset': idDataset, 'name': f"table{idTable}",
+                 'nCols': nCols, 'nRows': nRows, 'lastModifiedDate': '2024-01-01T00:00:00.000Z'}
+                for (d, idTable), (nRows, nCols) in sorted(self.tables.items()) if d == idDataset]
+
+    def reconcile(self, payload):
+        return [{'id': item['id'], 'metadata': make_candidates(str(item['label']), self.candidates)}
+                for item in payload['items']]
+
+    def extend(self, payload):
+        columnName, items = next(iter(payload['items'].items()))
+        columns = {}
+        for prop in payload['property']:
+            cells = {rowId: {'label': f"{prop} of {entityId}", 'metadata': []} for rowId, entityId in items.items()}
+            columns[prop] = {'label': prop, 'kind': 'literal', 'metadata': [], 'cells': cells}
+        return {'columns': columns, 'meta': {prop: columnName for prop in payload['property']}}
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _path(self):
+                # The client builds some URLs with double slashes ('api//reconciliators/list')
+                path = re.sub(r'/+', '/', self.path.split('?')[0])
+                return path[len('/api'):] if path.startswith('/api') else path
+
+            def _query(self):
+                query = self.path.split('?', 1)[1] if '?' in self.path else ''
+                return dict(part.split('=', 1) for part in query.split('&') if '=' in part)
+
+            def _page(self, collection):
+                # The page asked with the 'page' and 'limit' query parameters, everything without them
+                query = self._query()
+                if 'page' in query and 'limit' in query:
+                    start = (int(query['page']) - 1) * int(query['limit'])
+                    collection = collection[start:start + int(query['limit'])]
+                return collection
+
+            def _send(self, kind, body, received=0, status=200, headers=None):
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if not isinstance(body, bytes):
+                    body = json.dumps(body).encode()
+                mock.count(kind, received, len(body))
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _body(self):
+                length = int(self.headers.get('Content-Length', 0))
+                raw = self.rfile.read(length) if length else b''
+                return raw, (json.loads(raw) if raw else None)
+
+            def do_GET(self):
+                path = self._path()
+                if path == '/reconciliators/list':
+                    return self._send('reconciliators', RECONCILIATORS)
+                if path == '/extenders/list':
+                    return self._send('extenders', EXTENDERS)
+                if path in ('/dataset', '/dataset/'):
+                    return self._send('datasets', {'meta': {}, 'collection': self._page(mock.datasets())})
+                match = re.fullmatch(r'/dataset/(\d+)/table/?', path)
+                if match:
+                    collection = self._page(mock.dataset_tables(int(match.group(1))))
+                    return self._send('tables', {'meta': {}, 'collection': collection})
+                match = re.fullmatch(r'/dataset/(\d+)/table/(\d+)', path)
+                if match:
+                    key = (int(match.group(1)), int(match.group(2)))
+                    if key not in mock.tables:
+                        return self._send('getTable', {'error': 'table not found'}, status=404)
+                    return self._send('getTable', mock.table_json(*key))
+                self._send('unknown', {'error': 'not found'}, status=404)
+
+            def do_POST(self):
+                path = self._path()
+                raw, payload = self._body()
+                with mock._lock:
+                    overloaded = mock.maxInFlight is not None and mock.inFlight >= mock.maxInFlight
+                    if not overloaded:
+                        mock.inFlight += 1
+                if overloaded:
+                    return self._send('overloaded', {'error': 'too many requests'}, len(raw), status=429,
+                                      headers={'Retry-After': '0.05'})
+                try:
+                    if mock.cellLatency:
+                        items = payload['items']
+                        nCells = len(items) if isinstance(items, list) else sum(len(rows) for rows in items.values())
+                        time.sleep(mock.cellLatency * nCells)
+                    if path.startswith('/reconciliators/'):
+                        return self._send('reconcile', mock.reconcile(payload), len(raw))
+                    if path.startswith('/extenders/'):
+                        return self._send('extend', mock.extend(payload), len(raw))
+                    self._send('unknown', {'error': 'not found'}, len(raw), status=404)
+                finally:
+                    with mock._lock:
+                        mock.inFlight -= 1
+
+            def do_PUT(self):
+                path = self._path()
+                raw, _ = self._body()
+                match = re.fullmatch(r'/dataset/(\d+)/table/(\d+)', path)
+                if match:
+                    if (int(match.group(1)), int(match.group(2))) not in mock.tables:
+                        return self._send('updateTable', {'error': 'table not found'}, len(raw), status=404)
+                    return self._send('updateTable', {'status': 'ok'}, len(raw))
+                self._send('unknown', {'error': 'not found'}, len(raw), status=404)
+
+        return Handler
+
+
+# Example usage:
+#with MockSemtuiServer({(1, 1): (100, 5)}, latency=0.01) as server:
+#    semtui.SEMTUI_URI = server.uri
+#    table = semtui.getTable(1, 1)
@@ -1,11 +1,26 @@
+import hashlib
+import inspect
+import os
+import pickle
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, wait
+from multiprocessing import shared_memory
+
 import pandas as pd
 import requests
 import yaml
 
+try:
+    import pyarrow as pa
+except ImportError:
+    # Without pyarrow, partitions are sent to the worker processes by pickling
+    pa = None
+
 
-def load_data(path):
+def load_data(path, chunksize=None):
     # Assuming the function reads a CSV file into a pandas DataFrame
-    return pd.read_csv(path)
+    # With a chunksize, an iterator of DataFrames of at most chunksize rows is returned
+    return pd.read_csv(path, chunksize=chunksize)
 
 def clean_data(data, method):
     # Implement the logic for the 'drop_missing' method or other methods
@@ -62,21 +77,29 @@ def get_geocoded_data(df, api_key):
                 })
         else:
             print(f"Failed to geocode address: {address_query}. Status code: {response.status_code}")
+            # Coordinates stay empty so that Latitude/Longitude keep a numeric dtype
             resolved_addresses.append({
                 'Original Address': address_query,
                 'Resolved Address': 'Error',
-                'Latitude': 'Error',
-                'Longitude': 'Error'
+                'Latitude': None,
+                'Longitude': None
             })
 
     # Convert the resolved addresses to a DataFrame
     return pd.DataFrame(resolved_addresses)
 
 
-def enrich_data(data, source, api_key):
-    # Fetch additional data from an external API and merge it with the existing data
-    response = requests.get(source)
-    external_data = response.json()
+def resolve_source(parameters):
+    # Fetch the external data of enrich_data once, before the step runs on every chunk or partition
+    if parameters.get('external_data') is not None:
+        return parameters
+    return dict(parameters, external_data=requests.get(parameters['source']).json())
+
+
+def enrich_data(data, source, api_key, external_data=None):
+    # Fetch additional data from an external API (unless already resolved) and merge it with the existing data
+    if external_data is None:
+        external_data = resolve_source({'source': source})['external_data']
     
     # Call the function to get geocoded data
     geocoded_data = get_geocoded_data(data, api_key)
@@ -84,58 +107,704 @@ def enrich_data(data, source, api_key):
     # Merge the geocoded data with the existing data
     #enriched_data = pd.merge(data, geocoded_data, on='Original Address', how='left')
     # Merge the original DataFrame with the geocoded DataFrame based on their indices
+    # (the geocoded rows follow the order of data, whose index may not start at 0)
+    geocoded_data.index = data.index
     enriched_data = pd.concat([data, geocoded_data], axis=1)
     
     return enriched_data
 
-def save_data(data, path):
-    # Assuming the function writes the pandas DataFrame to a CSV file
-    data.to_csv(path)
+def save_data(data, path, format=None, compression=None, row_group_size=None, partition_cols=None):
+    """
+    Writes the data to a CSV, Parquet or Feather file. In streaming mode the data is an
+    iterator of chunks and each chunk is appended to the output as it arrives
+
+    :data: a DataFrame or an iterator of DataFrame chunks
+    :path: the output file (a directory when partition_cols is given)
+    :format: 'csv', 'parquet' or 'feather', inferred from the extension of path if None
+    :compression: compression codec ('snappy', 'zstd', 'gzip', 'lz4', ...), a sensible
+                  default of the format if None
+    :row_group_size: maximum number of rows per Parquet row group
+    :partition_cols: columns to partition the output by, one directory per value
+                     (Parquet and CSV only)
+    """
+    if format is None:
+        format = infer_file_format(path)
+    chunks = [data] if isinstance(data, pd.DataFrame) else data
+    if format == 'csv':
+        write_csv(chunks, path, compression, partition_cols)
+    elif format == 'parquet':
+        write_parquet(chunks, path, compression, row_group_size, partition_cols)
+    elif format == 'feather':
+        if partition_cols:
+            raise ValueError("Partitioning is not supported for Feather files.")
+        write_feather(chunks, path, compression)
+    else:
+        raise ValueError("Unsupported file format. Please specify format as 'csv', 'parquet' or 'feather'.")
+
+
+# OUTPUT WRITERS
+
+def infer_file_format(path):
+    # Infer the output format from the file extension, CSV by default
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension in ('.feather', '.arrow'):
+        return 'feather'
+    return 'csv'
+
+
+def require_pyarrow(format):
+    if pa is None:
+        raise ImportError(f"pyarrow is required to write {format} files. Install it with 'pip install pyarrow'.")
+
+
+def write_csv(chunks, path, compression=None, partition_cols=None):
+    """
+    Writes chunks to a CSV file, or to one CSV file per partition. The header is
+    written with the first chunk of each file and the following chunks are appended
+
+    :chunks: iterable of DataFrames
+    :path: the output file, or the output directory when partitioning
+    :compression: compression of the CSV files (e.g. 'gzip'), None for plain text
+    :partition_cols: columns to partition the output by
+    """
+    # Files already created by this call: the following chunks are appended to them
+    written = set()
+    for chunk in chunks:
+        if partition_cols:
+            for values, part in chunk.groupby(partition_cols, sort=False, dropna=False):
+                values = values if isinstance(values, tuple) else (values,)
+                directory = os.path.join(path, *[f"{column}={value}" for column, value in zip(partition_cols, values)])
+                os.makedirs(directory, exist_ok=True)
+                file_path = os.path.join(directory, 'part.csv')
+                part = part.drop(columns=partition_cols)
+                part.to_csv(file_path, mode='a' if file_path in written else 'w',
+                            header=file_path not in written, compression=compression)
+                written.add(file_path)
+        else:
+            chunk.to_csv(path, mode='a' if path in written else 'w',
+                         header=path not in written, compression=compression)
+            written.add(path)
+
+
+def arrow_tables(chunks):
+    """
+    Converts chunks to Arrow tables sharing one schema, taken from the first chunk. The index
+    is not written, since the chunks of a stream filtered row by row do not share its kind. A column
+    without any value in the first chunk (Arrow type null) is typed from the first chunk where
+    it has values: the chunks before it are held back until then, and cast to the final schema
+
+    :chunks: iterable of DataFrames
+    :return: generator of pyarrow Tables
+    """
+    schema = None
+    pending = []
+    for chunk in chunks:
+        if schema is not None and not pending:
+            yield pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+            continue
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        pending.append(table)
+        if schema is None:
+            schema = table.schema
+        else:
+            for i, field in enumerate(schema):
+                if pa.types.is_null(field.type) and not pa.types.is_null(table.schema.field(field.name).type):
+                    schema = schema.set(i, field.with_type(table.schema.field(field.name).type))
+        if not any(pa.types.is_null(field.type) for field in schema):
+            yield from (held.cast(schema) for held in pending)
+            pending = []
+    # Columns still without any value at the end stay of type null
+    yield from (held.cast(schema) for held in pending)
+
+
+def write_parquet(chunks, path, compression=None, row_group_size=None, partition_cols=None):
+    """
+    Writes chunks to a Parquet file, each chunk as one or more row groups, or to a
+    partitioned Parquet dataset. Column types are taken from the first chunk (see arrow_tables)
+
+    :chunks: iterable of DataFrames
+    :path: the output file, or the output directory when partitioning (files of a
+           previous run in that directory are left in place, so use a new directory)
+    :compression: compression codec, 'snappy' if None
+    :row_group_size: maximum number of rows per row group
+    :partition_cols: columns to partition the output by
+    """
+    require_pyarrow('Parquet')
+    import pyarrow.parquet as pq
+
+    compression = compression or 'snappy'
+    writer = None
+    try:
+        for i, table in enumerate(arrow_tables(chunks)):
+            if partition_cols:
+                # Every chunk adds its own files to the partition directories
+                pq.write_to_dataset(table, path, partition_cols=partition_cols,
+                                    compression=compression, row_group_size=row_group_size,
+                                    basename_template=f"part-{i}-{{i}}.parquet")
+            else:
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression=compression)
+                writer.write_table(table, row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def write_feather(chunks, path, compression=None):
+    """
+    Writes chunks to a Feather (Arrow IPC) file, each chunk as a record batch.
+    Column types are taken from the first chunk (see arrow_tables)
+
+    :chunks: iterable of DataFrames
+    :path: the output file
+    :compression: 'lz4', 'zstd' or 'uncompressed', 'lz4' if None
+    """
+    require_pyarrow('Feather')
+
+    compression = compression or 'lz4'
+    options = pa.ipc.IpcWriteOptions(compression=None if compression == 'uncompressed' else compression)
+    writer = None
+    try:
+        for table in arrow_tables(chunks):
+            if writer is None:
+                writer = pa.ipc.new_file(path, table.schema, options=options)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
 
+# Streaming capabilities of the steps:
+# - chunked_source: the step accepts a 'chunksize' parameter and then returns an iterator of chunks
+# - row_wise: the step works row by row, so it can be applied to each chunk independently
+# - chunked_sink: the step consumes an iterator of chunks itself
+# - prepare: function of the parameters run once before the step, to resolve what every call would repeat
+load_data.chunked_source = True
+clean_data.row_wise = True
+enrich_data.row_wise = True
+enrich_data.prepare = resolve_source
+save_data.chunked_sink = True
 
-# Paste all the provided functions here
 
-# Define the path to your data file and API key
-#path = 'C:\\Users\\user\\Documents\\BICOCCA\SEMNOTE--\\SemTpy\\Museums.csv'
-path = 'C:\\Users\\user\\Documents\\BICOCCA\\SEMNOTE--\\SemTpy\\Museums.csv'
-api_key = 'xxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxxx'
+def convert_dates(data, column):
+    # Convert a date column to ISO 8601 using semtui's converter
+    import semtui
+    return semtui.convert_to_iso8601_pandas(data, column)
+
+convert_dates.row_wise = True
+
+
+# SEMTUI STEPS
+
+class SemtuiServices:
+    """
+    Service registry of the SemTUI backend, shared by the SemTUI steps of a pipeline run.
+    The reconciliator and extender lists are fetched once, on first use, and the backend
+    calls go through semtui's shared HTTP session
+    """
+
+    def __init__(self, uri=None):
+        import semtui
+        self.semtui = semtui
+        if uri is not None:
+            semtui.SEMTUI_URI = uri
+        self._reconciliators = None
+        self._extenders = None
+
+    @property
+    def reconciliators(self):
+        if self._reconciliators is None:
+            self._reconciliators = self.semtui.getReconciliatorData()
+        return self._reconciliators
+
+    @property
+    def extenders(self):
+        if self._extenders is None:
+            self._extenders = self.semtui.getExtenderData()
+        return self._extenders
+
+
+def get_table(dataset, table, services):
+    # Retrieve a table from the SemTUI backend
+    return services.semtui.getTable(dataset, table)
+
+def reconcile(table, column, reconciliator, services, batch_size=None, processes=None,
+              top_k=None, min_score=None, compact=False, checkpoint=None, adaptive=None):
+    # Reconcile a column of a SemTUI table, sending at most batch_size cells per request
+    # and post-processing the response across processes workers. top_k and min_score prune
+    # the candidates kept in each cell, compact stores them without their URI. With a
+    # checkpoint directory, a rerun after a failure only requests the unfinished batches.
+    # adaptive: true adapts the batch size and concurrency to the reconciliator instead of batch_size
+    return services.semtui.reconcile(table, column, reconciliator,
+                                     reconciliatorResponse=services.reconciliators,
+                                     batchSize=batch_size, processes=processes,
+                                     topK=top_k, minScore=min_score, compact=compact,
+                                     checkpoint=checkpoint, adaptive=adaptive)
+
+def extend(table, column, extender, properties, new_columns, services, adaptive=None):
+    # Extend a reconciled column of a SemTUI table with properties from the KG
+    return services.semtui.extendColumn(table, column, extender, properties, new_columns,
+                                        reconciliatorResponse=services.reconciliators,
+                                        extenderResponse=services.extenders, adaptive=adaptive)
+
+def update_table(table, services):
+    # Upload the table to the SemTUI backend, and pass it on to the next steps
+    services.semtui.updateTable(table)
+    return table
+
+# The SemTUI steps receive the SemtuiServices of the run as 'services' parameter
+get_table.uses_services = True
+reconcile.uses_services = True
+extend.uses_services = True
+update_table.uses_services = True
+# The backend table can change between runs, and uploading is a side effect: never cache
+get_table.cacheable = False
+update_table.cacheable = False
 
-# Load data
-df = load_data(path)
-df = df.head()
 
 # Define step functions mapping
 step_functions = {
     'load_data': load_data,
     'clean_data': clean_data,
+    'convert_dates': convert_dates,
     'enrich_data': enrich_data,
-    'save_data': save_data
+    'save_data': save_data,
+    'get_table': get_table,
+    'reconcile': reconcile,
+    'extend': extend,
+    'update_table': update_table
 }
 
 
-# Read pipeline configuration from YAML file
-with open('pipeline.yaml', 'r') as file:
-    pipeline_config = yaml.safe_load(file)
+# STEP CACHE
 
-# Dictionary to store the output of each step
-data_store = {}
+def hash_data(data):
+    """
+    Computes a content hash of a step's input data
 
-# Iterate through each step in the pipeline
-for step in pipeline_config['pipeline']:
-    step_name = step['step']
-    parameters = step['parameters']
-    
-    # Fetch the input data if an 'input' is specified
-    input_data = data_store.get(step.get('input')) if 'input' in step else None
-    
-    # Call the corresponding function
-    if input_data is not None:
-        # Pass input_data if it's available
-        result = step_functions[step_name](input_data, **parameters)
+    :data: the input data of a step (usually a DataFrame)
+    :return: hex digest identifying the content of the data
+    """
+    digest = hashlib.sha256()
+    if isinstance(data, pd.DataFrame):
+        # Hash the values row by row in a single vectorized pass, plus the layout
+        digest.update(pd.util.hash_pandas_object(data, index=True).values.tobytes())
+        digest.update(repr(list(data.columns)).encode())
+        digest.update(repr(list(data.dtypes.astype(str))).encode())
     else:
-        # Pass only parameters (excluding input_data) to the function
-        result = step_functions[step_name](**parameters)
-    
-    # Store the output for use in subsequent steps
-    if 'output' in step:
-        data_store[step['output']] = result
+        digest.update(pickle.dumps(data))
+    return digest.hexdigest()
+
+
+def hash_parameters(parameters):
+    """
+    Computes a hash of a step's parameters. Parameters pointing to an existing
+    file also contribute the file's size and modification time, so that a step
+    reading a file is re-run when the file changes
+
+    :parameters: the parameters of the step as read from the YAML file
+    :return: hex digest identifying the parameters
+    """
+    digest = hashlib.sha256()
+    for name in sorted(parameters):
+        value = parameters[name]
+        digest.update(f"{name}={value!r};".encode())
+        if isinstance(value, str) and os.path.isfile(value):
+            stat = os.stat(value)
+            digest.update(f"{stat.st_size}:{stat.st_mtime_ns};".encode())
+    return digest.hexdigest()
+
+
+def function_version(function):
+    """
+    Returns the version of a step function: the 'version' attribute if the
+    function defines one, otherwise a hash of its source code
+
+    :function: the step function
+    :return: a string identifying the version of the function
+    """
+    if hasattr(function, 'version'):
+        return str(function.version)
+    try:
+        source = inspect.getsource(function)
+    except (OSError, TypeError):
+        source = function.__code__.co_code
+    if isinstance(source, str):
+        source = source.encode()
+    return hashlib.sha256(source).hexdigest()
+
+
+def step_cache_key(step_name, function, input_data, parameters):
+    """
+    Builds the cache key of a step from its input data hash, its parameters
+    and its function version
+
+    :step_name: the name of the step
+    :function: the function implementing the step
+    :input_data: the input data of the step, or None
+    :parameters: the parameters of the step
+    :return: the cache key
+    """
+    digest = hashlib.sha256()
+    digest.update(step_name.encode())
+    digest.update(function_version(function).encode())
+    digest.update(hash_parameters(parameters).encode())
+    if input_data is not None:
+        digest.update(hash_data(input_data).encode())
+    return digest.hexdigest()
+
+
+def load_cached_result(cache_dir, key):
+    """
+    Loads the cached output of a step
+
+    :cache_dir: the directory containing the cached outputs
+    :key: the cache key of the step
+    :return: a tuple (found, result)
+    """
+    path = os.path.join(cache_dir, key + '.pkl')
+    if not os.path.exists(path):
+        return False, None
+    with open(path, 'rb') as file:
+        return True, pickle.load(file)
+
+
+def store_cached_result(cache_dir, key, result):
+    """
+    Stores the output of a step in the cache
+
+    :cache_dir: the directory containing the cached outputs
+    :key: the cache key of the step
+    :result: the output of the step
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, key + '.pkl')
+    # Write to a temporary file first so an interrupted run never leaves a truncated entry
+    with open(path + '.tmp', 'wb') as file:
+        pickle.dump(result, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+
+
+# PARTITIONED EXECUTION
+
+def share_frame(df):
+    """
+    Prepares a DataFrame to be transferred to another process. With pyarrow, the
+    DataFrame is written in Arrow IPC format into a shared memory block, so only the
+    name of the block crosses the process boundary; otherwise the DataFrame is pickled
+
+    :df: the DataFrame to transfer
+    :return: a tuple describing the transfer, to be passed to receive_frame
+    """
+    if pa is None:
+        return ('pickle', df)
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError):
+        # Mixed-type object columns cannot be represented in Arrow
+        return ('pickle', df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    buffer = sink.getvalue()
+    block = shared_memory.SharedMemory(create=True, size=max(buffer.size, 1))
+    try:
+        # Arrow buffers are viewed as signed bytes, the shared memory as unsigned bytes
+        block.buf[:buffer.size] = memoryview(buffer).cast('B')
+    except BaseException:
+        block.close()
+        block.unlink()
+        raise
+    name = block.name
+    block.close()
+    return ('arrow', name, buffer.size)
+
+
+def receive_frame(transfer):
+    """
+    Rebuilds a DataFrame prepared with share_frame and releases its shared memory block
+
+    :transfer: the tuple returned by share_frame
+    :return: the DataFrame
+    """
+    if transfer[0] == 'pickle':
+        return transfer[1]
+    _, name, size = transfer
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        # Copied out of the block, which can then be closed: the Arrow columns converted
+        # without copy would otherwise keep the shared memory exported
+        data = bytes(block.buf[:size])
+    finally:
+        block.close()
+        block.unlink()
+    return pa.ipc.open_stream(pa.py_buffer(data)).read_all().to_pandas()
+
+
+def release_frame(transfer):
+    """
+    Releases the shared memory block of a DataFrame prepared with share_frame without reading it
+
+    :transfer: the tuple returned by share_frame
+    """
+    if transfer[0] != 'arrow':
+        return
+    try:
+        block = shared_memory.SharedMemory(name=transfer[1])
+    except FileNotFoundError:
+        # Already released by receive_frame
+        return
+    block.close()
+    block.unlink()
+
+
+def run_partition(function, transfer, parameters):
+    """
+    Runs a step on one partition inside a worker process
+
+    :function: the step function
+    :transfer: the partition, as returned by share_frame
+    :parameters: the parameters of the step
+    :return: the result of the step, as returned by share_frame
+    """
+    result = function(receive_frame(transfer), **parameters)
+    return share_frame(result)
+
+
+def run_partitioned(function, data, parameters, partitions, executor=None):
+    """
+    Splits a DataFrame by rows, runs the step on each partition in a process pool
+    and concatenates the results in the original order. Only meaningful for steps
+    that work row by row
+
+    :function: the step function, it must be importable by the worker processes
+    :data: the input DataFrame
+    :parameters: the parameters of the step
+    :partitions: the number of partitions
+    :executor: a ProcessPoolExecutor to reuse, a new one is created if None
+    :return: the concatenated result
+    """
+    partitions = max(1, min(int(partitions), len(data)))
+    if partitions == 1:
+        return function(data, **parameters)
+    bounds = [len(data) * i // partitions for i in range(partitions + 1)]
+    transfers = [share_frame(data.iloc[bounds[i]:bounds[i + 1]]) for i in range(partitions)]
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=partitions)
+    futures = []
+    try:
+        futures = [executor.submit(run_partition, function, transfer, parameters) for transfer in transfers]
+        # The results follow the order of the partitions
+        results = [future.result() for future in futures]
+    except BaseException:
+        for future in futures:
+            future.cancel()
+        wait(futures)
+        # Release the results of the partitions that succeeded, and the partitions not received
+        for future in futures:
+            if not future.cancelled() and future.exception() is None:
+                release_frame(future.result())
+        for transfer in transfers:
+            release_frame(transfer)
+        raise
+    finally:
+        if own_executor:
+            executor.shutdown()
+    frames = []
+    try:
+        for result in results:
+            frames.append(receive_frame(result))
+    finally:
+        for result in results[len(frames):]:
+            release_frame(result)
+    return pd.concat(frames)
+
+
+# PIPELINE RUNNER
+
+def is_chunk_stream(data):
+    """
+    Tells whether the output of a step is a stream of DataFrame chunks
+
+    :data: the output of a step
+    :return: True if data is an iterator of chunks
+    """
+    return isinstance(data, Iterator)
+
+
+def stream_step(function, chunks, parameters, partitions=None):
+    """
+    Applies a row-wise step to each chunk as it arrives
+
+    :function: the row-wise step function
+    :chunks: iterator of DataFrame chunks
+    :parameters: the parameters of the step
+    :partitions: if given, each chunk is processed in partitions across a process pool
+    :return: a generator of processed chunks. Empty results are skipped, but if every chunk
+             is filtered out a single empty chunk is yielded, so the sinks still write the
+             header (or schema) and the next steps receive the columns
+    """
+    executor = ProcessPoolExecutor(max_workers=partitions) if partitions else None
+    empty = None
+    yielded = False
+    try:
+        for chunk in chunks:
+            if executor is not None:
+                result = run_partitioned(function, chunk, parameters, partitions, executor)
+            else:
+                result = function(chunk, **parameters)
+            if result is not None and len(result) > 0:
+                yielded = True
+                yield result
+            elif empty is None:
+                empty = (result if result is not None else chunk).iloc[:0]
+        if not yielded and empty is not None:
+            yield empty
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def run_pipeline(pipeline_config, functions=None, cache_dir=None, force=None, chunksize=None):
+    """
+    Runs the steps of a pipeline configuration in order.
+
+    When a cache directory is given (as argument or with the 'cache_dir' key of the
+    configuration), the output of each step with an 'output' is cached on disk under a
+    key derived from its input data, its parameters and its function version. Unchanged
+    steps are loaded from the cache instead of being executed. Steps without an 'output'
+    (like save_data) always run, and a step can opt out with 'cache: false'.
+
+    When a chunksize is given (as argument or with 'streaming: {chunksize: N}' in the
+    configuration), the pipeline runs in streaming mode: source steps yield chunks, row-wise
+    steps process each chunk as it arrives and sinks like save_data write incrementally, so
+    peak memory is bounded by the chunk size. Other steps receive the concatenated chunks.
+    Streamed outputs are lazy and can be consumed by a single downstream step, and they are
+    never cached.
+
+    The SemTUI steps (get_table, reconcile, extend, update_table) share one SemtuiServices
+    per run, so the service registry is fetched once; 'semtui_uri' in the configuration
+    sets the backend address.
+
+    A step with 'parallel: {partitions: N}' has its input DataFrame (or each chunk, in
+    streaming mode) split by rows into N partitions processed by a process pool, and the
+    results concatenated in order. It is meant for CPU-heavy row-wise steps.
+
+    :pipeline_config: the pipeline configuration read from the YAML file
+    :functions: mapping from step names to functions, defaults to step_functions
+    :cache_dir: directory where step outputs are cached, None disables caching
+    :force: step names or output names to invalidate; every step downstream of
+            them is invalidated too
+    :chunksize: number of rows per chunk in streaming mode, None disables streaming
+    :return: dictionary with the output of each step
+    """
+    functions = functions or step_functions
+    cache_dir = cache_dir or pipeline_config.get('cache_dir')
+    chunksize = chunksize or (pipeline_config.get('streaming') or {}).get('chunksize')
+    forced = set(force or [])
+    # Outputs recomputed because of a forced step, used to propagate the invalidation
+    invalidated = set()
+
+    services = None
+
+    # Dictionary to store the output of each step
+    data_store = {}
+
+    # Iterate through each step in the pipeline
+    for step in pipeline_config['pipeline']:
+        step_name = step['step']
+        parameters = step.get('parameters') or {}
+        function = functions[step_name]
+
+        # Fetch the input data if an 'input' is specified
+        input_data = data_store.get(step.get('input')) if 'input' in step else None
+
+        streamed = False
+        if chunksize is not None and getattr(function, 'chunked_source', False):
+            parameters = dict(parameters, chunksize=chunksize)
+            streamed = True
+        elif is_chunk_stream(input_data):
+            if getattr(function, 'row_wise', False):
+                streamed = True
+            elif not getattr(function, 'chunked_sink', False):
+                # The step needs the whole data: materialize the stream
+                chunks = list(input_data)
+                input_data = pd.concat(chunks) if chunks else pd.DataFrame()
+
+        if getattr(function, 'uses_services', False):
+            if services is None:
+                services = SemtuiServices(pipeline_config.get('semtui_uri'))
+            call_parameters = dict(parameters, services=services)
+        else:
+            call_parameters = parameters
+
+        is_forced = (step_name in forced or step.get('output') in forced
+                     or step.get('input') in invalidated)
+        if is_forced and 'output' in step:
+            invalidated.add(step['output'])
+
+        use_cache = (cache_dir is not None and 'output' in step and step.get('cache', True)
+                     and getattr(function, 'cacheable', True)
+                     and not streamed and not is_chunk_stream(input_data))
+        if use_cache:
+            key = step_cache_key(step_name, function, input_data, parameters)
+            if not is_forced:
+                found, result = load_cached_result(cache_dir, key)
+                if found:
+                    data_store[step['output']] = result
+                    continue
+
+        parallel = step.get('parallel')
+        partitions = None
+        if parallel:
+            partitions = parallel.get('partitions') if isinstance(parallel, dict) else None
+            partitions = partitions or os.cpu_count()
+
+        prepare = getattr(function, 'prepare', None)
+        if prepare is not None:
+            call_parameters = prepare(call_parameters)
+
+        # Call the corresponding function
+        if streamed and input_data is not None:
+            result = stream_step(function, input_data, call_parameters, partitions)
+        elif partitions and isinstance(input_data, pd.DataFrame):
+            result = run_partitioned(function, input_data, call_parameters, partitions)
+        elif input_data is not None:
+            # Pass input_data if it's available
+            result = function(input_data, **call_parameters)
+        else:
+            # Pass only parameters (excluding input_data) to the function
+            result = function(**call_parameters)
+
+        if use_cache:
+            store_cached_result(cache_dir, key, result)
+
+        # Store the output for use in subsequent steps
+        if 'output' in step:
+            data_store[step['output']] = result
+
+    return data_store
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the pipeline described in a YAML file.')
+    parser.add_argument('config', nargs='?', default='pipeline.yaml')
+    parser.add_argument('--cache-dir', default=None,
+                        help='directory where step outputs are cached')
+    parser.add_argument('--force', action='append', default=[],
+                        help='step or output to recompute together with everything downstream of it')
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help='run in streaming mode with chunks of this many rows')
+    args = parser.parse_args()
+
+    # Read pipeline configuration from YAML file
+    with open(args.config, 'r') as file:
+        pipeline_config = yaml.safe_load(file)
+
+    run_pipeline(pipeline_config, cache_dir=args.cache_dir, force=args.force,
+                 chunksize=args.chunksize)
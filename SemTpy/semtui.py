@@ -1,22 +1,67 @@
 import requests
 import json
 import utils
+import instrumentation
+import backpressure
 import os 
 import pandas as pd 
+import numpy as np
 import zipfile
-from ipyaggrid import Grid
+import pickle
+import tempfile
+import time
+import importlib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
 
 SEMTUI_URI = ""
+# Shared HTTP session, so that calls to the backend reuse the same connections
+SESSION = requests.Session()
+# Records network time and payload sizes of every backend call when instrumentation is enabled
+SESSION.hooks['response'].append(instrumentation.record_response)
+
+# Optional integrations, in their own modules so that importing semtui does not import
+# ipyaggrid or the LLM clients: name -> module imported on first access (semtui.df_chat, ...)
+LAZY_ATTRIBUTES = {
+    'MAX_GRID_ROWS': 'semtui_grid',
+    'display_csv_in_grid': 'semtui_grid',
+    'grid_options_for': 'semtui_grid',
+    'display_reconciled_table': 'semtui_grid',
+    'PagedGrid': 'semtui_grid',
+    'PROFILE_PROMPT': 'semtui_llm',
+    'RECOMMENDATIONS_PROMPT': 'semtui_llm',
+    'dataframe_fingerprint': 'semtui_llm',
+    'profile_dataframe': 'semtui_llm',
+    'LLMSession': 'semtui_llm',
+    'get_llm_session': 'semtui_llm',
+    'get_transformation_recommendations_from_df': 'semtui_llm',
+    'df_chat': 'semtui_llm',
+    'get_geocoded_data': 'semtui_geocoding',
+}
+
+
+def __getattr__(name):
+    if name not in LAZY_ATTRIBUTES:
+        raise AttributeError(f"module 'semtui' has no attribute '{name}'")
+    value = getattr(importlib.import_module(LAZY_ATTRIBUTES[name]), name)
+    # Cached in the module, next accesses do not go through __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(LAZY_ATTRIBUTES))
 
 
 def load_local_data(file_path_or_link, file_type='auto', load_as='DataFrame'):
     """
-    Load data from a local file path or a link. Supports loading CSV and JSON files,
+    Load data from a local file path or a link. Supports loading CSV, JSON, Parquet and Feather files,
     and ZIP archives containing multiple CSV or JSON files.
 
     Parameters:
         file_path_or_link (str): Path to the file or the link to load data from.
-        file_type (str, optional): Type of file ('csv', 'json', or 'zip'). If 'auto', the function will infer the type from the file extension. Default is 'auto'.
+        file_type (str, optional): Type of file ('csv', 'json', 'parquet', 'feather' or 'zip'). If 'auto', the function will infer the type from the file extension. Default is 'auto'.
         load_as (str, optional): Load data as a single DataFrame ('DataFrame') or a list of DataFrames ('List'). Default is 'DataFrame'.
 
     Returns:
@@ -31,11 +76,20 @@ def load_local_data(file_path_or_link, file_type='auto', load_as='DataFrame'):
             file_type = 'json'
         elif file_path_or_link.endswith('.zip'):
             file_type = 'zip'
+        elif file_path_or_link.endswith(('.parquet', '.pq')):
+            file_type = 'parquet'
+        elif file_path_or_link.endswith(('.feather', '.arrow')):
+            file_type = 'feather'
         else:
-            raise ValueError("Unsupported file type. Please specify file_type as 'csv', 'json', or 'zip'.")
+            raise ValueError("Unsupported file type. Please specify file_type as 'csv', 'json', 'parquet', 'feather' or 'zip'.")
 
     if file_type == 'csv':
         data = pd.read_csv(file_path_or_link)
+    elif file_type == 'parquet':
+        # Also reads partitioned Parquet directories written by save_data
+        data = pd.read_parquet(file_path_or_link)
+    elif file_type == 'feather':
+        data = pd.read_feather(file_path_or_link)
     elif file_type == 'json':
         with open(file_path_or_link, 'r') as file:
             data_json = json.load(file)
@@ -83,41 +137,6 @@ def load_local_data(file_path_or_link, file_type='auto', load_as='DataFrame'):
 # dfs = load_local_data("path_to_zip_file.zip", file_type='csv', load_as='List')
 
 
-def display_csv_in_grid(csv_file_path):
-    """
-    Displays the contents of a CSV file in an interactive grid using ipyaggrid.
-
-    Parameters:
-        csv_file_path (str): The path to the CSV file to be displayed.
-    """
-    # Load the CSV file into a Pandas DataFrame
-    df = pd.read_csv(csv_file_path)
-    
-    # Define grid options for displaying the DataFrame
-    grid_options = {
-        'columnDefs': [{'field': c} for c in df.columns],
-        'enableSorting': True,
-        'enableFilter': True,
-        'enableColResize': True,
-        'enableRangeSelection': True,
-    }
-    
-    # Create and display the grid
-    grid = Grid(grid_data=df,
-                grid_options=grid_options,
-                quick_filter=True,
-                show_toggle_edit=True,
-                export_mode="buttons",
-                theme='ag-theme-balham')
-    
-    return grid
-
-# Example usage
-# Assuming you have a path to a CSV file
-# csv_file_path = "path/to/your/file.csv"
-# display_csv_in_grid(csv_file_path)
-
-
 def addDataset(datasetInput, datasetName, inputType='file'):
     """
     Adds a new dataset to the T-Rich backend. Supports uploading a dataset by providing
@@ -137,13 +156,13 @@ def addDataset(datasetInput, datasetName, inputType='file'):
         
         with open(datasetInput, 'rb') as file:
             files = {'file': (os.path.basename(datasetInput), file, 'application/zip')}
-            response = requests.post(SEMTUI_URI + 'dataset/upload', headers=headers, files=files, data=data)
+            response = SESSION.post(SEMTUI_URI + 'dataset/upload', headers=headers, files=files, data=data)
     elif inputType == 'url':
         if not datasetInput.lower().endswith('.zip'):
             return "Invalid URL. Please ensure the URL points to a .zip file."
         
         data['url'] = datasetInput
-        response = requests.post(SEMTUI_URI + 'dataset/from_url', headers=headers, data=data)
+        response = SESSION.post(SEMTUI_URI + 'dataset/from_url', headers=headers, data=data)
     else:
         return "Invalid input type specified. Use 'file' for local zip files or 'url' for URLs to zip files."
 
@@ -198,31 +217,169 @@ def load_tables(zip_file_path):
 
 
 
-def merge_tables(tables):
+def merge_tables(tables, report=False, infer=False):
     """
     Merge tables based on PK-FK relationships. This function assumes a simple case where FKs in one table
     match PKs in another. More complex relationships will require additional logic.
+    The relationships are turned into a schema and merged with merge_tables_based_on_schema.
+    With infer=True, the keys are discovered from the data with infer_schema instead of the
+    '<tablename>_id' naming convention.
     """
-    # Example: For simplification, assuming 'id' as PK and '<table_name>_id' as FK
-    merged_table = None
+    if infer:
+        schema = infer_schema(tables)
+    else:
+        schema = schema_from_naming_convention({name: table.columns for name, table in tables.items()})
+    return merge_tables_based_on_schema(tables, schema, report=report)
+
+
+def schema_from_naming_convention(columns):
+    """
+    Builds a merge schema assuming 'id' as PK and '<tablename>_id' as FK.
+
+    :param columns: dictionary mapping each table name (file name) to its columns.
+    :return: the schema expected by merge_tables_based_on_schema.
+    """
+    schema = {"tables": {}}
+    for name, table_columns in columns.items():
+        relationships = {}
+        for related_name in columns:
+            fk_name = f'{related_name[:-4].lower()}_id'  # Assuming table name in FK is formatted as <tablename>_id
+            if related_name != name and fk_name in table_columns and 'id' in columns[related_name]:
+                relationships[fk_name] = related_name
+        schema["tables"][name] = {"primaryKey": 'id', "relationships": relationships}
+    return schema
+
+class ColumnSketch:
+    """
+    Bottom-k MinHash sketch of the distinct values of a column: it keeps the k smallest
+    64-bit hashes of the values. The sketch estimates the number of distinct values and the
+    Jaccard similarity/containment between two columns with memory independent of the
+    column size, and is exact when the column has at most k values.
+    """
+
+    def __init__(self, values, k=1024):
+        values = values.dropna()
+        if pd.api.types.is_numeric_dtype(values):
+            # Same hash for 1 and 1.0, integer keys often become floats because of missing values
+            values = values.astype('float64')
+        hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+        self.count = len(hashes)
+        self.k = k
+        # Duplicates removed first, the k smallest hashes are those of k distinct values
+        hashes = np.unique(hashes)
+        self.exact = len(hashes) <= k
+        self.hashes = hashes if self.exact else hashes[:k]
+
+    def distinct(self):
+        """Estimated number of distinct values."""
+        if self.exact or len(self.hashes) < 2:
+            return len(self.hashes)
+        # The m-th smallest of n uniform hashes is about m / n of the hash space
+        return int((len(self.hashes) - 1) / (float(self.hashes[-1]) / 2.0 ** 64))
+
+    def jaccard(self, other):
+        """Estimated Jaccard similarity between the distinct values of two columns."""
+        union = np.union1d(self.hashes, other.hashes)
+        thresholds = [sketch.hashes[-1] for sketch in (self, other)
+                      if not sketch.exact and len(sketch.hashes)]
+        if thresholds:
+            union = union[union <= min(thresholds)]
+        union = union[:self.k]
+        if len(union) == 0:
+            return 0.0
+        both = np.intersect1d(np.intersect1d(union, self.hashes, assume_unique=True),
+                              other.hashes, assume_unique=True)
+        return len(both) / len(union)
+
+    def containment(self, other):
+        """Estimated share of the distinct values of this column found in the other column."""
+        distinct = self.distinct()
+        if distinct == 0:
+            return 0.0
+        jaccard = self.jaccard(other)
+        intersection = jaccard * (distinct + other.distinct()) / (1 + jaccard)
+        return min(1.0, intersection / distinct)
+
+
+def is_key_candidate(values):
+    """Tells whether a column may hold keys: no booleans, no fractional numbers."""
+    if pd.api.types.is_bool_dtype(values):
+        return False
+    if pd.api.types.is_float_dtype(values):
+        values = values.dropna()
+        return bool((values % 1 == 0).all())
+    return True
+
+
+def infer_schema(tables, sketch_size=1024, containment_threshold=0.9):
+    """
+    Infers the primary keys and the PK-FK relationships of the tables from their data.
+    Every candidate column is profiled once with a ColumnSketch: a primary key is a column
+    without missing values whose values are unique (preferring 'id', then names ending with
+    'id'); a foreign key is a column whose distinct values are contained in the primary key
+    of another table. Ties between tables are broken by the table name appearing in the
+    column name.
+
+    :param tables: dictionary of DataFrames, as returned by load_tables.
+    :param sketch_size: number of hashes kept per column, higher is more accurate.
+    :param containment_threshold: minimum share of the foreign key values found in the primary key.
+    :return: the schema expected by merge_tables_based_on_schema.
+    """
+    sketches = {}
+    schema = {"tables": {}}
     for name, table in tables.items():
-        if merged_table is None:
-            merged_table = table
-        else:
-            fk_name = f'{name[:-4].lower()}_id'  # Assuming table name in FK is formatted as <tablename>_id
-            if fk_name in merged_table.columns:
-                merged_table = pd.merge(merged_table, table, left_on=fk_name, right_on='id', how='left')
-            elif 'id' in table.columns:
-                merged_table = pd.merge(merged_table, table, left_on='id', right_on=fk_name, how='left')
-    
-    return merged_table
+        sketches[name] = {column: ColumnSketch(table[column], sketch_size)
+                          for column in table.columns if is_key_candidate(table[column])}
+        candidates = [column for column, sketch in sketches[name].items()
+                      if sketch.count == len(table) and sketch.distinct() >= 0.95 * len(table)]
+        candidates.sort(key=lambda column: (str(column).lower() != 'id',
+                                            not str(column).lower().endswith('id'),
+                                            list(table.columns).index(column)))
+        # The sketch only shortlists the candidates, uniqueness is checked exactly
+        primary_key = next((column for column in candidates if table[column].is_unique), None)
+        schema["tables"][name] = {"primaryKey": primary_key, "relationships": {}}
+
+    for name in tables:
+        own_key = schema["tables"][name]["primaryKey"]
+        for column, sketch in sketches[name].items():
+            if column == own_key or sketch.distinct() < 2:
+                continue
+            best = None
+            for related, info in schema["tables"].items():
+                if related == name or info["primaryKey"] is None:
+                    continue
+                key_sketch = sketches[related][info["primaryKey"]]
+                stem = os.path.splitext(os.path.basename(related))[0].lower()
+                name_match = bool(stem) and stem in str(column).lower()
+                # Without a name hint, a handful of small codes is contained in any integer key
+                if not name_match and sketch.distinct() < 0.01 * key_sketch.distinct():
+                    continue
+                if sketch.distinct() > 1.05 * key_sketch.distinct():
+                    continue
+                containment = sketch.containment(key_sketch)
+                if containment >= containment_threshold:
+                    score = (name_match, containment)
+                    if best is None or score > best[0]:
+                        best = (score, related)
+            if best is not None:
+                schema["tables"][name]["relationships"][column] = best[1]
+    return schema
+
+def automate_merging(zip_file_path, out_of_core=False, output_path=None, chunksize=100000, partitions=64):
+    """
+    Automates the process of loading and merging tables from a zip file.
 
-def automate_merging(zip_file_path):
-    """Automates the process of loading and merging tables from a zip file."""
+    With out_of_core=True the tables are never fully loaded: see merge_out_of_core.
+    The merged rows are then written to output_path (CSV) or, if no path is given,
+    returned as an iterator of DataFrame chunks.
+    """
     if not os.path.exists(zip_file_path) or not zip_file_path.endswith('.zip'):
         print("Zip file not found or invalid file type. Please check the path and ensure it is a .zip file.")
         return
 
+    if out_of_core:
+        return merge_out_of_core(zip_file_path, output_path, chunksize=chunksize, partitions=partitions)
+
     tables = load_tables(zip_file_path)
     merged_table = merge_tables(tables)
     return merged_table
@@ -232,21 +389,290 @@ def automate_merging(zip_file_path):
 #merged_table = automate_merging(zip_file_path)
 #print(merged_table)
 
+# Discover the keys from the data instead of the naming convention
+#tables = load_tables(zip_file_path)
+#schema = infer_schema(tables)
+#merged_table = merge_tables_based_on_schema(tables, schema)
 
-def merge_tables_based_on_schema(tables, schema):
-    merged_table = None
-    for table_name, table_info in schema["tables"].items():
-        if table_name in tables:
-            if merged_table is None:
-                merged_table = tables[table_name]
-            else:
-                for fk, related_table_name in table_info["relationships"].items():
-                    if related_table_name in tables:
-                        pk = schema["tables"][related_table_name]["primaryKey"]
-                        merged_table = pd.merge(merged_table, tables[related_table_name], 
-                                                left_on=fk, right_on=pk, 
-                                                how='left', suffixes=('', '_'+related_table_name))
-    return merged_table
+# For archives larger than memory, merge out of core into a CSV file
+#automate_merging(zip_file_path, out_of_core=True, output_path='merged.csv')
+
+
+def plan_merge(tables, schema, sizes=None):
+    """
+    Plans the joins needed to merge the tables described by a schema. The base table is the
+    one with the most relationships (the fact table of a star schema, the largest one on ties);
+    the related tables are then joined following the relationships, smallest table first among
+    those whose foreign key is already available. A table referenced by several foreign keys of
+    the same table (role-playing dimension) is joined once per foreign key, under the alias
+    '<table>_<foreign key>'. The tables left that reference a joined table are then joined the
+    other way round (inbound joins, one-to-many: the number of rows may change).
+
+    :param tables: dictionary of DataFrames, as returned by load_tables.
+    :param schema: dictionary {"tables": {name: {"primaryKey": pk, "relationships": {fk: related_name}}}}.
+    :param sizes: estimated size of each table, used instead of the number of rows when the tables
+                  are not loaded (only their columns are needed then).
+    :return: a tuple (base table name, list of joins, list of tables that cannot be joined). Each join
+             names the joined table ('right') and its instance in the output ('alias').
+    """
+    def size(name):
+        return sizes[name] if sizes is not None else len(tables[name])
+
+    infos = {name: info for name, info in schema["tables"].items() if name in tables}
+    if not infos:
+        return None, [], []
+
+    def relationships(name):
+        return {fk: related for fk, related in infos[name].get("relationships", {}).items()
+                if related in infos and fk in tables[name].columns}
+
+    base = max(infos, key=lambda name: (len(relationships(name)), size(name)))
+    joined = [base]
+    # Instances whose foreign keys are followed: the tables joined under their own name
+    expanded = [base]
+    done = set()
+    joins = []
+    while True:
+        # Outbound joins: a foreign key of a joined table, to a table not joined yet or, for
+        # role-playing dimensions, to a table already joined through another key of the same table
+        candidates = [(left, fk, related) for left in expanded
+                      for fk, related in relationships(left).items()
+                      if (left, fk) not in done and (related not in joined or any(
+                          join['left'] == left and join['right'] == related for join in joins))]
+        if candidates:
+            # Left joins on a primary key keep the number of rows: join the cheapest tables first
+            left, fk, related = min(candidates, key=lambda candidate: size(candidate[2]))
+            done.add((left, fk))
+            alias = related if related not in joined else f"{related}_{fk}"
+            joins.append({'left': left, 'leftOn': fk,
+                          'right': related, 'rightOn': infos[related]["primaryKey"], 'alias': alias,
+                          'rightRows': size(related), 'estimatedRows': size(base)})
+            if related not in joined:
+                joined.append(related)
+                expanded.append(related)
+            continue
+        # Inbound joins: a table not joined yet whose foreign key references a joined table
+        inbound = [(name, fk, related) for name in infos if name not in joined
+                   for fk, related in relationships(name).items()
+                   if related in expanded and infos[related]["primaryKey"] in tables[related].columns]
+        if not inbound:
+            break
+        name, fk, related = min(inbound, key=lambda candidate: size(candidate[0]))
+        done.add((name, fk))
+        joins.append({'left': related, 'leftOn': infos[related]["primaryKey"],
+                      'right': name, 'rightOn': fk, 'alias': name, 'direction': 'inbound',
+                      'rightRows': size(name), 'estimatedRows': None})
+        joined.append(name)
+        expanded.append(name)
+    unjoined = [name for name in infos if name not in joined]
+    return base, joins, unjoined
+
+
+def merge_tables_based_on_schema(tables, schema, report=False):
+    """
+    Merges the tables following the primary keys and relationships of the schema (see plan_merge).
+    Joins on a unique primary key are hash joins: the foreign key values are looked up in an index
+    of the primary key, and the matching rows of every related table are concatenated to the base
+    table once at the end, without intermediate merged copies. Joins on a non-unique key fall back
+    to pd.merge.
+
+    :param tables: dictionary of DataFrames, as returned by load_tables.
+    :param schema: dictionary {"tables": {name: {"primaryKey": pk, "relationships": {fk: related_name}}}}.
+    :param report: if True, also return the merge plan with the row counts of each join.
+    :return: the merged DataFrame, or a tuple (merged DataFrame, report) if report is True.
+    """
+    base, joins, unjoined = plan_merge(tables, schema)
+    merge_report = {'base': base, 'baseRows': len(tables[base]) if base else 0,
+                    'joins': joins, 'unjoined': unjoined}
+    if base is None:
+        return (None, merge_report) if report else None
+
+    parts = [tables[base].reset_index(drop=True)]
+    # Output column name of each (table, column) pair, to find the keys of chained joins
+    output_names = {(base, column): column for column in parts[0].columns}
+    used_names = set(parts[0].columns)
+
+    def column_values(name):
+        for part in reversed(parts):
+            if name in part.columns:
+                return part[name]
+
+    for join in joins:
+        right = tables[join['right']]
+        renames = join_column_names(join['alias'], right.columns, used_names, output_names)
+        keys = column_values(output_names[(join['left'], join['leftOn'])])
+        right_keys = right[join['rightOn']]
+
+        if right_keys.is_unique and not right_keys.isna().any():
+            # Hash join: position of each foreign key in the primary key, -1 when missing
+            positions = pd.Index(right_keys).get_indexer(keys)
+            part = right.reset_index(drop=True).reindex(positions).reset_index(drop=True)
+            parts.append(part.rename(columns=renames))
+            join['strategy'] = 'hash'
+            join['matchedRows'] = int((positions >= 0).sum())
+            join['rows'] = len(keys)
+        else:
+            # Many-to-many join: the number of rows changes, merge what was joined so far
+            merged = pd.concat(parts, axis=1) if len(parts) > 1 else parts[0]
+            merged = pd.merge(merged, right.rename(columns=renames),
+                              left_on=keys.name, right_on=renames[join['rightOn']],
+                              how='left', indicator='_merge_matched')
+            join['strategy'] = 'merge'
+            join['matchedRows'] = int((merged.pop('_merge_matched') == 'both').sum())
+            join['rows'] = len(merged)
+            parts = [merged]
+
+    merged_table = pd.concat(parts, axis=1) if len(parts) > 1 else parts[0]
+    return (merged_table, merge_report) if report else merged_table
+
+
+def join_column_names(table_name, columns, used_names, output_names):
+    """
+    Names the columns of a joined table in the merged output: columns clashing with
+    an existing column get the '_<table name>' suffix.
+
+    :param table_name: name of the table being joined.
+    :param columns: columns of the table being joined.
+    :param used_names: names already used in the merged output, updated in place.
+    :param output_names: mapping (table, column) -> output name, updated in place.
+    :return: mapping from the columns of the table to their output names.
+    """
+    renames = {}
+    for column in columns:
+        name = column if column not in used_names else f"{column}_{table_name}"
+        renames[column] = name
+        output_names[(table_name, column)] = name
+    used_names.update(renames.values())
+    return renames
+
+
+# OUT-OF-CORE MERGE
+
+def read_zip_table_chunks(zip_file_path, member, chunksize):
+    """Reads a tab-separated table of a zip file chunk by chunk."""
+    with zipfile.ZipFile(zip_file_path, 'r') as z:
+        with z.open(member) as file:
+            for chunk in pd.read_csv(file, sep='\t', chunksize=chunksize, on_bad_lines='skip'):
+                yield chunk
+
+
+def partition_ids(keys, partitions):
+    """
+    Assigns each key to a partition by hashing it. Numeric keys are hashed as floats, so
+    that an integer primary key and a foreign key turned into floats by missing values
+    land in the same partition.
+    """
+    if pd.api.types.is_numeric_dtype(keys):
+        keys = keys.astype('float64')
+    return pd.util.hash_pandas_object(keys, index=False).to_numpy() % partitions
+
+
+def spill_partitions(chunks, key, partitions, directory, prefix):
+    """
+    Writes chunks to disk split into hash partitions of the key column.
+
+    :param chunks: iterable of DataFrames.
+    :param key: the column to partition on.
+    :param partitions: the number of partitions.
+    :param directory: the directory where the partition files are written.
+    :param prefix: prefix of the partition file names.
+    :return: the list of partition file paths.
+    """
+    paths = [os.path.join(directory, f"{prefix}-{i}.pkl") for i in range(partitions)]
+    files = [open(path, 'wb') for path in paths]
+    try:
+        for chunk in chunks:
+            for partition, part in chunk.groupby(partition_ids(chunk[key], partitions), sort=False):
+                pickle.dump(part, files[partition], protocol=pickle.HIGHEST_PROTOCOL)
+    finally:
+        for file in files:
+            file.close()
+    return paths
+
+
+def read_spilled_partition(path, columns):
+    """Loads a partition written by spill_partitions and deletes its file."""
+    parts = []
+    with open(path, 'rb') as file:
+        while True:
+            try:
+                parts.append(pickle.load(file))
+            except EOFError:
+                break
+    os.remove(path)
+    return pd.concat(parts) if parts else pd.DataFrame(columns=columns)
+
+
+def join_spilled_partitions(left_paths, right_paths, left_key, right_key, left_columns, right_columns):
+    """Left-joins the spilled partitions pairwise, yielding one joined DataFrame per partition."""
+    for left_path, right_path in zip(left_paths, right_paths):
+        left = read_spilled_partition(left_path, left_columns)
+        right = read_spilled_partition(right_path, right_columns)
+        if len(left):
+            yield pd.merge(left, right, left_on=left_key, right_on=right_key, how='left')
+
+
+def merge_out_of_core(zip_file_path, output_path=None, chunksize=100000, partitions=64, tmp_dir=None):
+    """
+    Merges the tables of a zip file without loading them in memory (grace hash join).
+    The joins are planned like merge_tables (naming convention, sizes taken from the
+    uncompressed file sizes). For each join, both sides are read in chunks and spilled
+    to disk in hash partitions of the join key, then joined partition by partition, so
+    memory holds one partition pair at a time. The output of a join is streamed into the
+    partitioning of the next one. The order of the rows is not preserved.
+
+    :param zip_file_path: path to the zip file with tab-separated tables.
+    :param output_path: CSV file where the merged rows are written; if None, an iterator of
+                        DataFrame chunks is returned instead.
+    :param chunksize: number of rows read at a time from each table.
+    :param partitions: number of hash partitions; more partitions mean less memory per join.
+    :param tmp_dir: directory for the spilled partitions, the system default if None.
+    :return: output_path, or an iterator of the merged chunks.
+    """
+    columns = {}
+    sizes = {}
+    with zipfile.ZipFile(zip_file_path, 'r') as z:
+        for info in z.infolist():
+            if info.filename.endswith('.csv'):
+                try:
+                    columns[info.filename] = list(pd.read_csv(z.open(info.filename), sep='\t', nrows=0).columns)
+                except pd.errors.EmptyDataError:
+                    print(f"Warning: {info.filename} is empty and will be skipped.")
+                    continue
+                sizes[info.filename] = info.file_size
+    schema = schema_from_naming_convention(columns)
+    headers = {name: pd.DataFrame(columns=table_columns) for name, table_columns in columns.items()}
+    base, joins, _ = plan_merge(headers, schema, sizes)
+
+    def merged_chunks():
+        if base is None:
+            return
+        with tempfile.TemporaryDirectory(dir=tmp_dir) as directory:
+            current = read_zip_table_chunks(zip_file_path, base, chunksize)
+            current_columns = list(columns[base])
+            output_names = {(base, column): column for column in current_columns}
+            used_names = set(current_columns)
+            for stage, join in enumerate(joins):
+                renames = join_column_names(join['alias'], columns[join['right']], used_names, output_names)
+                left_key = output_names[(join['left'], join['leftOn'])]
+                right_key = renames[join['rightOn']]
+                right_columns = list(renames.values())
+                left_paths = spill_partitions(current, left_key, partitions, directory, f"left-{stage}")
+                right_chunks = (chunk.rename(columns=renames) for chunk in
+                                read_zip_table_chunks(zip_file_path, join['right'], chunksize))
+                right_paths = spill_partitions(right_chunks, right_key, partitions, directory, f"right-{stage}")
+                current = join_spilled_partitions(left_paths, right_paths, left_key, right_key,
+                                                  current_columns, right_columns)
+                current_columns = current_columns + right_columns
+            yield from current
+
+    if output_path is None:
+        return merged_chunks()
+    header = True
+    for chunk in merged_chunks():
+        chunk.to_csv(output_path, mode='w' if header else 'a', header=header, index=False)
+        header = False
+    return output_path
 
 # Load schema
 #with open('schema.json', 'r') as f:
@@ -256,6 +682,10 @@ def merge_tables_based_on_schema(tables, schema):
 #merged_table = merge_tables_based_on_schema(tables, schema)
 #print(merged_table)
 
+# Perform merging and inspect the join plan with the row counts of each join
+#merged_table, merge_report = merge_tables_based_on_schema(tables, schema, report=True)
+#print(merge_report)
+
 def getDatasetsList():
     """
     Show the datasets available in the backend.
@@ -264,7 +694,7 @@ def getDatasetsList():
              an empty JSON object is returned.
     """
     try:
-        response = requests.get(SEMTUI_URI+'/dataset/')
+        response = SESSION.get(SEMTUI_URI+'/dataset/')
         response.raise_for_status()  # Check if the request was successful
         
         # Directly return the JSON data from the response
@@ -278,253 +708,360 @@ def getDatasetsList():
     # Return an empty JSON object as a fallback in case of errors
     return {}
 
-import pandas as pd
-import json
-import requests  # This is placeholder for actual Groq client usage
 
-import pandas as pd
-import requests
-import json
-import os
-from groq import Groq
-
-import pandas as pd
-import requests
-import json
-import os
-from groq import Groq
-import pandas as pd
-import requests
-import json
-import os
-from groq import Groq
+# Date formats tried when inferring the formats of a date column
+DATE_FORMATS = [
+    '%Y-%m-%d', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S%z',
+    '%Y/%m/%d', '%d/%m/%Y', '%m/%d/%Y', '%d-%m-%Y', '%d.%m.%Y', '%Y%m%d',
+    '%d %B %Y', '%B %d, %Y', '%d %b %Y', '%b %d, %Y', '%Y',
+]
 
-from pandasai import SmartDataframe
+ISO8601_FORMAT = '%Y-%m-%dT%H:%M:%S%z'
 
 
-def get_transformation_recommendations_from_df(df_csv, api_key):
+def _parse_dates(strings, **kwargs):
+    """
+    pd.to_datetime with errors='coerce'. Dates with mixed UTC offsets (e.g. +02:00 and -05:00)
+    cannot share a timezone, they are converted to UTC.
+    """
     try:
-        # Extract the feature names from the DataFrame
-        feature_names = df_csv.columns.tolist()
-        print(f"Feature Names:\n{feature_names}\n")
-
-        # Format the feature names as a JSON object
-        feature_json = json.dumps({feature: 'float' for feature in feature_names})
-
-        client = Groq(
-            api_key=api_key,
-        )
-
-        stream = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "you are a helpful assistant. Your job is to return recommendations for data transformations that involve external available on the internet or external APIs."
-                },
-                {
-                    "role": "user",
-                    "content": f"{feature_json}",
-                }
-            ],
-            model="mixtral-8x7b-32768",
-            temperature=0.0,
-            max_tokens=1024,
-            top_p=1,
-            stop=None,
-            stream=True,
-        )
-        # Print the incremental deltas returned by the LLM.
-        for chunk in stream:
-            print(chunk.choices[0].delta.content, end="")
-
-
-    except requests.exceptions.RequestException as e:
-        print("Error making the request:", e)
-    except json.JSONDecodeError as e:
-        print("Error decoding JSON response:", e)
-    except Exception as e:
-        print("An error occurred:", e)
+        parsed = pd.to_datetime(strings, errors='coerce', **kwargs)
+    except ValueError:
+        # pandas 3 raises on mixed offsets
+        return pd.to_datetime(strings, errors='coerce', utc=True, **kwargs)
+    if parsed.dtype == object:
+        # pandas 2 returns the datetimes with mixed offsets as objects
+        return pd.to_datetime(strings, errors='coerce', utc=True, **kwargs)
+    return parsed
 
-# Example usage:
-#my_api_key = os.getenv("GROQ_API_KEY")
-#df_csv = pd.read_csv('your_dataset.csv')
-#recommendations = get_transformation_recommendations_from_df(df_csv, my_api_key)
-#print(recommendations)
-
-
-import os
-from langchain_groq import ChatGroq
-#from smart_dataframe_module import SmartDataFrame  # Import or define SmartDataFrame
 
-def df_chat(df_csv, question, api_key=None):
-    """
-    Given a DataFrame and a question, use a ChatGroq instance to process the question
-    and return the answer based on the data in the DataFrame.
-    
-    Parameters:
-        df_csv (DataFrame): The DataFrame to analyze.
-        question (str): The question to ask about the data in the DataFrame.
-        api_key (str, optional): The API key for the Groq service. If not provided,
-                                 it tries to fetch from the environment variable "GROQ_API_KEY".
-    
-    Returns:
-        str: The answer to the question based on the DataFrame data.
+def infer_date_formats(values, sample_size=1000):
     """
-    # If the API key is not provided as an argument, try to get it from the environment variable
-    if api_key is None:
-        api_key = os.getenv("GROQ_API_KEY")
-        if api_key is None:
-            return "API key is not provided. Please provide an API key."
+    Infers the dominant date formats of a set of date strings from a sample.
 
+    :param values: Index or array of unique date strings.
+    :param sample_size: The number of values to test the formats on.
+    :return: The formats matching at least one sampled value, most frequent first.
+    """
+    sample = pd.Series(values)
+    if len(sample) > sample_size:
+        sample = sample.sample(sample_size, random_state=0)
+    hits = {}
+    for date_format in DATE_FORMATS:
+        parsed = _parse_dates(sample, format=date_format)
+        # Values out of the pandas range (before 1677) fail here but still match the format
+        matched = int(parsed.notna().sum())
+        if matched == 0:
+            matched = int(sample.head(20).map(lambda value: _strptime_or_none(value, date_format) is not None).sum())
+        if matched:
+            hits[date_format] = matched
+    return sorted(hits, key=lambda date_format: -hits[date_format])
+
+
+def _strptime_or_none(value, date_format):
     try:
-        # Initialize the ChatGroq instance with the model name and API key
-        llm = ChatGroq(
-            model_name="mixtral-8x7b-32768", 
-            api_key=api_key
-        )
-
-        # Initialize the SmartDataFrame with the DataFrame and configuration for the LLM
-        df = SmartDataFrame(df_csv, config={"llm": llm})
+        return datetime.strptime(value, date_format)
+    except (ValueError, TypeError):
+        return None
 
-        # Use the chat method of SmartDataFrame to ask the question and get the answer
-        answer = df.chat(question)
-        return answer
 
-    except requests.exceptions.RequestException as e:
-        return f"Request error: {e}"
-    except Exception as e:
-        return f"An error occurred: {e}"
-
-# Example usage:
-# Assuming 'df_csv' is your DataFrame and you want to ask a question
-# answer = df_chat(df_csv, 'What are the top 5 countries?')
-# print(f"Answer:\n{answer}")
+def _format_dates(values, formats):
+    """
+    Parses unique date strings format by format and returns them in ISO 8601, None
+    for the values that cannot be parsed.
+    """
+    result = pd.Series([None] * len(values), dtype=object)
+    remaining = np.ones(len(values), dtype=bool)
+    strings = pd.Series(values, dtype=object)
+    for date_format in formats:
+        if not remaining.any():
+            break
+        positions = np.flatnonzero(remaining)
+        parsed = _parse_dates(strings.iloc[positions], format=date_format)
+        ok = parsed.notna().to_numpy()
+        result.iloc[positions[ok]] = parsed[ok].dt.strftime(ISO8601_FORMAT).to_numpy()
+        remaining[positions[ok]] = False
+    if remaining.any():
+        # Per element inference for the values matching none of the dominant formats
+        positions = np.flatnonzero(remaining)
+        try:
+            parsed = _parse_dates(strings.iloc[positions], format='mixed')
+        except (TypeError, ValueError):
+            parsed = _parse_dates(strings.iloc[positions])
+        ok = parsed.notna().to_numpy()
+        if ok.any():
+            result.iloc[positions[ok]] = parsed[ok].map(lambda date: date.strftime(ISO8601_FORMAT)).to_numpy()
+            remaining[positions[ok]] = False
+    for position in np.flatnonzero(remaining):
+        # Dates outside the range of pandas timestamps (e.g. year 1200)
+        for date_format in formats:
+            date = _strptime_or_none(strings.iloc[position], date_format)
+            if date is not None:
+                result.iloc[position] = date.strftime(ISO8601_FORMAT)
+                break
+    return result
+
+
+def _year_strings(values):
+    """
+    Writes a numeric column as date strings: integral numbers are years ('2020', also for the
+    2020.0 of a float column with missing values), the other numbers keep their text and fail.
+    """
+    text = pd.Series(None, index=values.index, dtype=object)
+    present = values.notna().to_numpy()
+    integral = present & (values.fillna(0) % 1 == 0).to_numpy()
+    text[integral] = values[integral].astype('int64').astype(str).str.zfill(4).to_numpy(dtype=object)
+    text[present & ~integral] = values[present & ~integral].astype(str).to_numpy(dtype=object)
+    return text
 
 
-def convert_to_iso8601_pandas(df: pd.DataFrame, date_col_name: str) -> pd.DataFrame:
+def convert_to_iso8601_pandas(df: pd.DataFrame, date_col_name, report: bool = False, sample_size: int = 1000,
+                              format_cache: dict = None):
     """
     Convert date column in a DataFrame to ISO 8601 format using pandas.
 
+    The dominant formats of each column are inferred from a sample of its values, then each
+    format group is parsed in one vectorized pass. Only the unique
+    values are parsed and the results are mapped back to the rows. Values that cannot be parsed
+    become missing values (None) instead of failing the whole column. Numeric columns hold years.
+
     :param df: The DataFrame containing the date information.
-    :param date_col_name: The name of the column with date strings to be converted.
-    :return: A DataFrame with the date column converted to ISO 8601 format.
+    :param date_col_name: The name of the column with date strings to be converted, or a list of names.
+    :param report: If True, also return a dictionary with, for each column, the formats used,
+                   the number of parsed and failed values and a sample of the failed values.
+    :param sample_size: The number of unique values used to infer the formats.
+    :param format_cache: Optional dictionary of the formats inferred for each column name, filled and
+                         reused by the calls it is passed to. Only share it between calls converting
+                         the same data, e.g. the chunks of one file.
+    :return: A DataFrame with the date column converted to ISO 8601 format, and the report if requested.
     """
+    columns = [date_col_name] if isinstance(date_col_name, str) else list(date_col_name)
     # Check if the date column exists in the DataFrame
-    if date_col_name not in df.columns:
-        raise ValueError(f"The specified column '{date_col_name}' does not exist in the DataFrame.")
-    
-    try:
-        # Convert each date in the column to ISO 8601 format
-        df[date_col_name] = pd.to_datetime(df[date_col_name]).dt.strftime('%Y-%m-%dT%H:%M:%S%z')
-    except Exception as e:
-        # Instead of printing, it's usually better to handle exceptions in a way that the calling code can manage
-        raise Exception(f"An error occurred while converting dates: {e}")
-    
-    return df
+    for column in columns:
+        if column not in df.columns:
+            raise ValueError(f"The specified column '{column}' does not exist in the DataFrame.")
+
+    conversion_report = {}
+    for column in columns:
+        values = df[column]
+        if pd.api.types.is_datetime64_any_dtype(values):
+            formatted = values.dt.strftime(ISO8601_FORMAT).to_numpy(dtype=object)
+            formatted[values.isna().to_numpy()] = None
+            df[column] = pd.Series(formatted, index=df.index, dtype=object)
+            conversion_report[column] = {'formats': [], 'parsed': int(values.notna().sum()),
+                                         'failed': 0, 'failedSamples': []}
+            continue
+        if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+            values = _year_strings(values)
+        # Parse each distinct value once, codes map them back to the rows
+        codes, uniques = pd.factorize(values.astype(str).where(values.notna()))
+        uniques = uniques.astype(str)
+        if len(uniques) == 0:
+            df[column] = pd.Series(None, index=df.index, dtype=object)
+            conversion_report[column] = {'formats': [], 'parsed': 0, 'failed': 0, 'failedSamples': []}
+            continue
+        formats = format_cache.get(column) if format_cache is not None else None
+        if formats is None:
+            formats = infer_date_formats(uniques, sample_size)
+            if format_cache is not None:
+                format_cache[column] = formats
+        converted = _format_dates(uniques, formats)
+        failed = converted.isna().to_numpy()
+        output = converted.to_numpy()[codes]
+        output[codes == -1] = None
+        # An object column, pandas 3 would infer its str dtype and turn the None into NaN
+        df[column] = pd.Series(output, index=df.index, dtype=object)
+        conversion_report[column] = {
+            'formats': formats,
+            'parsed': int(((codes != -1) & ~failed[codes]).sum()),
+            'failed': int(((codes != -1) & failed[codes]).sum()),
+            'failedSamples': list(uniques[failed][:10]),
+        }
 
+    return (df, conversion_report) if report else df
 
-def get_geocoded_data(df: pd.DataFrame, address_columns: list, api_key: str) -> pd.DataFrame:
-    """
-    Retrieves geocoded data for a given DataFrame using the HERE Geocoding API.
 
-    :param df: The DataFrame containing address data to geocode.
-    :param address_columns: List of column names in df to use for constructing the address query.
-    :param api_key: The API key for the HERE Geocoding service.
-    :return: A DataFrame with original data and added geocoded information.
+def getDataset(idDataset):
     """
-    base_url = "https://geocode.search.hereapi.com/v1/geocode"
-    resolved_addresses = []
+    Show general information about the dataset
 
-    for index, row in df.iterrows():
-        # Construct the address query using the specified columns
-        address_parts = [str(row[col]) for col in address_columns if col in df.columns]
-        address_query = ', '.join(address_parts)
-        params = {
-            'q': address_query,
-            'apiKey': api_key
-        }
+    :idDataset: the dataset's ID in the backend
+    :return: dataframe containing general information about the dataset
+    """
+    response = SESSION.get(SEMTUI_URI + 'dataset/' + str(idDataset))
+    return utils.cleanDatasetsData(response.text)
 
-        # Make the GET request to the HERE Geocoding API
-        response = requests.get(base_url, params=params)
 
-        if response.status_code == 200:
-            data = response.json()
-            items = data.get('items', [])
-            
-            if items:
-                # Extract resolved address and coordinates
-                resolved_address = items[0]['address']['label']
-                lat = items[0]['position']['lat']
-                lng = items[0]['position']['lng']
-                
-                # Append the resolved data
-                resolved_addresses.append({
-                    'Original Address': address_query,
-                    'Resolved Address': resolved_address,
-                    'Latitude': lat,
-                    'Longitude': lng
-                })
-            else:
-                # Handle cases where no items were found
-                resolved_addresses.append({
-                    'Original Address': address_query,
-                    'Resolved Address': 'Not found',
-                    'Latitude': None,
-                    'Longitude': None
-                })
-        else:
-            # Handle API response errors
-            print(f"Failed to geocode address: {address_query}. Status code: {response.status_code}")
-            resolved_addresses.append({
-                'Original Address': address_query,
-                'Resolved Address': 'Error',
-                'Latitude': 'Error',
-                'Longitude': 'Error'
-            })
+def getDatasetTables(idDataset):
+    """
+    Show a list of tables contained in the dataset
 
-    # Create a DataFrame from the resolved addresses
-    geocoded_df = pd.DataFrame(resolved_addresses)
+    :idDataset: the dataset's ID in the backend
+    :return: dataframe containing the list of tables and their respective information
+    """
+    response = SESSION.get(SEMTUI_URI + 'dataset/' + str(idDataset) + '/table')
+    return utils.cleanDatasetsTables(response.text)
 
-    # Merge the original DataFrame with the geocoded data
-    merged_df = pd.merge(df, geocoded_df, left_on=address_columns[0], right_on='Original Address', how='left')
 
-    # Drop the duplicate 'Original Address' column resulting from the merge
-    merged_df.drop('Original Address', axis=1, inplace=True)
+# CATALOG
 
-    return merged_df
+def iterCollection(path, pageSize=100, params=None):
+    """
+    Iterates lazily over a collection of the backend (datasets or tables), one page at a time.
+    Pages are requested with the 'page' and 'limit' query parameters; a backend that ignores
+    them returns the whole collection in the first response, which is then used as is.
+    Request errors are raised (requests.HTTPError)
+
+    :path: the path of the collection in the backend
+    :pageSize: the number of items requested per page
+    :params: additional query parameters (e.g. server-side filters)
+    :return: generator of the items of the collection (dictionaries)
+    """
+    page = 1
+    seen = set()
+    while True:
+        response = SESSION.get(SEMTUI_URI + path, params=dict(params or {}, page=page, limit=pageSize))
+        response.raise_for_status()
+        collection = response.json().get("collection", [])
+        newItems = [item for item in collection if item.get("id") not in seen]
+        yield from newItems
+        seen.update(item.get("id") for item in newItems)
+        # Last page, or a backend without pagination returning everything (or the same page again)
+        if len(collection) < pageSize or len(collection) > pageSize or not newItems:
+            return
+        page += 1
+
+
+def filterCollection(items, name=None, modifiedSince=None):
+    """
+    Filters collection items by name (case insensitive substring) and modification date
 
-# Example usage:
-# Assuming your original DataFrame is named 'df' and you have an API key
-#api_key = 'YOUR_ACTUAL_API_KEY'
-#address_columns = ['Point of Interest', 'Place', 'Adm1', 'Country']
-# Get the merged DataFrame with geocoded information
-#merged_geocoded_df = get_geocoded_data(df, address_columns, api_key)
-#print(merged_geocoded_df)
+    :items: iterable of collection items (dictionaries)
+    :name: substring the name must contain, None to keep all names
+    :modifiedSince: keep only items modified at or after this date (string or datetime), None to keep all
+    :return: generator of the matching items
+    """
+    since = pd.Timestamp(modifiedSince) if modifiedSince is not None else None
+    for item in items:
+        if name is not None and name.lower() not in str(item.get("name", "")).lower():
+            continue
+        if since is not None:
+            modified = utils.parseDates(pd.Series([item.get("lastModifiedDate")]))[0]
+            if pd.isna(modified) or modified.tz_localize(None) < since.tz_localize(None):
+                continue
+        yield item
+
+
+def iterDatasets(name=None, modifiedSince=None, pageSize=100):
+    """
+    Iterates lazily over the datasets of the backend, optionally filtered by name and modification date.
+    The filters are sent to the backend and applied locally as well
 
+    :name: substring the dataset name must contain
+    :modifiedSince: keep only datasets modified at or after this date
+    :pageSize: the number of datasets requested per page
+    :return: generator of datasets (dictionaries)
+    """
+    params = {key: value for key, value in (("name", name), ("modifiedSince", modifiedSince)) if value is not None}
+    return filterCollection(iterCollection('dataset/', pageSize, params), name, modifiedSince)
 
 
-def getDataset(idDataset):
+def iterDatasetTables(idDataset, name=None, modifiedSince=None, pageSize=100):
     """
-    Show general information about the dataset
+    Iterates lazily over the tables of a dataset, optionally filtered by name and modification date
 
     :idDataset: the dataset's ID in the backend
-    :return: dataframe containing general information about the dataset
+    :name: substring the table name must contain
+    :modifiedSince: keep only tables modified at or after this date
+    :pageSize: the number of tables requested per page
+    :return: generator of tables (dictionaries)
     """
-    response = requests.get(SEMTUI_URI + 'dataset/' + str(idDataset))
-    return utils.cleanDatasetsData(response.text)
+    params = {key: value for key, value in (("name", name), ("modifiedSince", modifiedSince)) if value is not None}
+    path = 'dataset/' + str(idDataset) + '/table'
+    return filterCollection(iterCollection(path, pageSize, params), name, modifiedSince)
 
 
-def getDatasetTables(idDataset):
+class Catalog:
     """
-    Show a list of tables contained in the dataset
+    Local cache of the datasets and tables of the backend. refresh() pages through the
+    datasets and only fetches again the tables of the datasets whose lastModifiedDate
+    changed since the previous refresh. The cache can be saved to a JSON file to be
+    reused across sessions.
 
-    :idDataset: the dataset's ID in the backend
-    :return: dataframe containing the list of tables and their respective information
+    :path: JSON file where the catalog is kept, in memory only if None
     """
-    response = requests.get(SEMTUI_URI + 'dataset/' + str(idDataset) + '/table')
-    return utils.cleanDatasetsTables(response.text)
 
-def getTable(idDataset, idTable):
+    def __init__(self, path=None):
+        self.path = path
+        self.uri = SEMTUI_URI
+        self.datasets_by_id = {}
+        self.tables_by_dataset = {}
+        if path is not None and os.path.exists(path):
+            with open(path, 'r') as file:
+                saved = json.load(file)
+            # A catalog saved for another backend is not reused
+            if saved.get("uri") == self.uri:
+                self.datasets_by_id = {str(key): value for key, value in saved["datasets"].items()}
+                self.tables_by_dataset = {str(key): value for key, value in saved["tables"].items()}
+
+    def refresh(self, pageSize=100):
+        """
+        Updates the catalog from the backend
+
+        :pageSize: the number of items requested per page
+        :return: the IDs of the datasets whose tables were fetched again
+        """
+        current = {str(dataset["id"]): dataset for dataset in iterDatasets(pageSize=pageSize)}
+        changed = [idDataset for idDataset, dataset in current.items()
+                   if idDataset not in self.tables_by_dataset
+                   or self.datasets_by_id.get(idDataset, {}).get("lastModifiedDate") != dataset.get("lastModifiedDate")]
+        for idDataset in changed:
+            self.tables_by_dataset[idDataset] = list(iterDatasetTables(idDataset, pageSize=pageSize))
+        for idDataset in set(self.tables_by_dataset) - set(current):
+            del self.tables_by_dataset[idDataset]
+        self.datasets_by_id = current
+        self.save()
+        return changed
+
+    def save(self):
+        """Writes the catalog to its JSON file, if it has one."""
+        if self.path is None:
+            return
+        with open(self.path, 'w') as file:
+            json.dump({"uri": self.uri, "datasets": self.datasets_by_id, "tables": self.tables_by_dataset}, file)
+
+    def datasets(self, name=None, modifiedSince=None):
+        """
+        Lists the cached datasets, filtered by name and modification date
+
+        :return: dataframe with the columns of utils.cleanDatasetsData
+        """
+        items = filterCollection(self.datasets_by_id.values(), name, modifiedSince)
+        return utils.normalizeCollection(items, utils.DATASET_COLUMNS,
+                                         intColumns=["nTables"], dateColumns=["lastModifiedDate"])
+
+    def tables(self, idDataset=None, name=None, modifiedSince=None):
+        """
+        Lists the cached tables of a dataset (of all datasets if idDataset is None),
+        filtered by name and modification date
+
+        :return: dataframe with the columns of utils.cleanDatasetsTables
+        """
+        if idDataset is None:
+            items = [table for tables in self.tables_by_dataset.values() for table in tables]
+        else:
+            items = self.tables_by_dataset.get(str(idDataset), [])
+        items = filterCollection(items, name, modifiedSince)
+        return utils.normalizeCollection(items, utils.TABLE_COLUMNS,
+                                         intColumns=["nCols", "nRows"], dateColumns=["lastModifiedDate"])
+
+# Example usage:
+#catalog = Catalog('catalog.json')
+#catalog.refresh()
+#print(catalog.tables(name='museum', modifiedSince='2024-01-01'))
+
+@instrumentation.traced('semtui.getTable')
+def getTable(idDataset, idTable, raiseErrors=False):
     """
     Retrieve a table from the backend in two different formats:
         - raw: the table in JSON format
@@ -532,27 +1069,33 @@ def getTable(idDataset, idTable):
 
     :idDataset: the dataset's ID in the backend
     :idTable: the ID of the table to retrieve
+    :raiseErrors: if True, an error status of the backend is raised (requests.HTTPError)
     :return: the table in the two described formats
     """
-    response = requests.get(SEMTUI_URI + 'dataset/' + str(idDataset)+'/table/'+str(idTable))
-    return {'raw': json.loads(response.text)}
+    response = SESSION.get(SEMTUI_URI + 'dataset/' + str(idDataset)+'/table/'+str(idTable))
+    if raiseErrors:
+        response.raise_for_status()
+    with instrumentation.span('semtui.getTable.decode'):
+        return {'raw': json.loads(response.text)}
 
-def getExtendersList():
+def getExtendersList(maxAge=None):
     """
     Provides a list of available extenders with their main information
 
+    :maxAge: if given, reuse the extender data fetched less than maxAge seconds ago
     :return: a dataframe containing extenders and their information
     """
-    response = getExtenderData()
+    response = getExtenderData(maxAge)
     return utils.cleanServiceList(response)
 
-def getReconciliatorsList():
+def getReconciliatorsList(maxAge=None):
     """
     Provides a list of available reconciliators with their main information
 
+    :maxAge: if given, reuse the reconciliator data fetched less than maxAge seconds ago
     :return: a dataframe containing reconciliators and their information
     """
-    response = getReconciliatorData()
+    response = getReconciliatorData(maxAge)
     return utils.cleanServiceList(response)
 
 def addTable(idDataset, filePath, tableName):
@@ -566,46 +1109,190 @@ def addTable(idDataset, filePath, tableName):
     """
     url = SEMTUI_URI + 'dataset/' + str(idDataset) + '/table'
     files = {'file': open(filePath, 'rb')}
-    response = requests.post(url, files=files, data={'name': tableName})
+    response = SESSION.post(url, files=files, data={'name': tableName})
     return response.status_code
 
-def reconcile(table, columnName, idReconciliator):
+# Batch size of the checkpointed reconciliations when none is given
+CHECKPOINT_BATCH_SIZE = 1000
+
+
+class ReconciliationCheckpoint:
+    """
+    Keeps the responses of the batches of a reconciliation on local disk, one file per batch,
+    so that a reconciliation interrupted by a crash or a network failure resumes where it
+    stopped. The checkpoint is tied to the request: if the table, the column, the reconciliator
+    or the batch size change, the batches saved before are discarded
+
+    :directory: the directory of the checkpoint, created if needed
+    :url: the URL of the reconciliator
+    :payload: the full reconciliation payload (utils.createReconciliationPayload)
+    :batchSize: the number of cells of each batch
+    """
+
+    def __init__(self, directory, url, payload, batchSize):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        digest.update(json.dumps([url, batchSize, payload], sort_keys=True).encode())
+        self.key = digest.hexdigest()
+        manifest = os.path.join(directory, 'manifest.json')
+        if os.path.exists(manifest):
+            with open(manifest, 'r') as file:
+                if json.load(file).get('key') != self.key:
+                    clearCheckpoint(directory, removeDirectory=False)
+        self._write(manifest, json.dumps({'key': self.key, 'batchSize': batchSize}))
+
+    def path(self, index):
+        return os.path.join(self.directory, f"batch_{index:06d}.json")
+
+    def load(self, index):
+        """Returns the saved response text of a batch, or None if the batch is not done"""
+        path = self.path(index)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+
+    def save(self, index, text):
+        """Saves the response text of a batch"""
+        self._write(self.path(index), text)
+
+    def _write(self, path, text):
+        # Written next to the file then renamed, a crash never leaves a partial batch
+        with open(path + '.tmp', 'w', encoding='utf-8') as file:
+            file.write(text)
+        os.replace(path + '.tmp', path)
+
+
+def clearCheckpoint(directory, removeDirectory=True):
+    """
+    Deletes the batches saved by a checkpointed reconciliation, e.g. once the table has been updated
+
+    :directory: the directory of the checkpoint
+    :removeDirectory: if True, the directory is removed as well when it is left empty
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith('batch_') or name.startswith('manifest.json'):
+            os.remove(os.path.join(directory, name))
+    if removeDirectory and not os.listdir(directory):
+        os.rmdir(directory)
+
+
+@instrumentation.traced('semtui.reconcile')
+def reconcile(table, columnName, idReconciliator, reconciliatorResponse=None, batchSize=None, processes=None,
+              topK=None, minScore=None, compact=False, checkpoint=None, adaptive=None):
     """
     Reconciles a column with the chosen reconciliator
 
     :table: the table with the column to reconcile 
     :columnName: the name of the column to reconcile 
     :idReconciliator: ID of the reconciliator to use 
-    :return: table with reconciled column
+    :reconciliatorResponse: reconciliator data from getReconciliatorData, fetched if not provided
+    :batchSize: maximum number of cells sent in a single request, all at once if None
+    :processes: number of worker processes decoding and post-processing the batch responses,
+                worth it for millions of cells (see utils.postProcessReconciliation). Without
+                batchSize, the cells are sent in one batch per process
+    :topK: if given, only the topK best candidates of each cell are kept (and the matched one)
+    :minScore: if given, the candidates scoring less are dropped (except the matched one)
+    :compact: if True, the candidates are stored without their URI, which is built by updateTable
+    :checkpoint: directory where the response of each batch is saved as soon as it is received
+                 (see ReconciliationCheckpoint). Run again after a failure, reconcile only requests
+                 the batches not saved yet. Without batchSize, batches of CHECKPOINT_BATCH_SIZE cells are sent
+    :adaptive: True, or a backpressure.AdaptiveController, to adapt the batch size and the number of
+               concurrent requests to the latency and overload answers of the reconciliator (see
+               backpressure.sendAdaptive). With True, the controller of the reconciliator is kept
+               across calls. Not compatible with batchSize and checkpoint
+    :return: table with reconciled column, and under 'errors' the summary of the cells
+             that could not be processed (see utils.ErrorCollector). With a checkpoint, under
+             'checkpoint' the number of batches and of batches read from the checkpoint
     """
     table = table['raw']
-    reconciliatorResponse = getReconciliatorData()
+    if reconciliatorResponse is None:
+        reconciliatorResponse = getReconciliatorData()
     # creating the request
     url = SEMTUI_URI + '/reconciliators' + str(utils.getReconciliator(idReconciliator, reconciliatorResponse)['relativeUrl'])
     payload = utils.createReconciliationPayload(table, columnName, idReconciliator)
-    response = requests.post(url, json=payload)
-    response = json.loads(response.text)
+    parallel = processes is not None and processes > 1
+    if adaptive and (batchSize is not None or checkpoint is not None):
+        raise ValueError("adaptive batches cannot be combined with batchSize or checkpoint")
+    if checkpoint is not None and batchSize is None:
+        # Small batches so that little is lost on a failure, whatever the number of processes
+        batchSize = CHECKPOINT_BATCH_SIZE
+    elif parallel and batchSize is None and not adaptive:
+        # One batch per worker, each batch response being a range of rows
+        batchSize = max(1, -(-len(payload["items"]) // processes))
+    store = ReconciliationCheckpoint(checkpoint, url, payload, batchSize) if checkpoint is not None else None
+    shards = []
+    resumed = 0
+    batches = utils.splitReconciliationPayload(payload, batchSize)
+    if adaptive:
+        controller = backpressure.getController(url, f'reconcile.{idReconciliator}') if adaptive is True else adaptive
+        columnItems = [item for item in payload["items"] if item["id"] == 'column$index']
+        cellItems = [item for item in payload["items"] if item["id"] != 'column$index']
+        # The column item is only sent with the first batch (alone if the column has no cells)
+        firstItems = columnItems if cellItems else []
+        texts = backpressure.sendAdaptive(
+            SESSION, url, cellItems or columnItems,
+            lambda items, start: {"serviceId": payload["serviceId"], "items": (firstItems if start == 0 else []) + items},
+            controller)
+        shards = texts if parallel else [json.loads(text) for text in texts]
+        batches = []
+    for index, batch in enumerate(batches):
+        text = store.load(index) if store is not None else None
+        if text is not None:
+            resumed += 1
+        else:
+            batchResponse = SESSION.post(url, json=batch)
+            text = batchResponse.text
+            if store is not None:
+                # An error response must not be saved as a done batch
+                batchResponse.raise_for_status()
+                store.save(index, text)
+        if parallel:
+            # decoded by the worker processes
+            shards.append(text)
+            continue
+        with instrumentation.span('semtui.reconcile.decode'):
+            shards.append(json.loads(text))
     # inserting data into the table
-    metadata = utils.createCellMetadataNameField(response, idReconciliator, reconciliatorResponse)
-    table = utils.updateMetadataCells(table, metadata)
-    table = utils.updateMetadataColumn(table, columnName, idReconciliator, metadata, reconciliatorResponse)
-    table = utils.updateMetadataTable(table)
-    return {'raw': table}
+    errors = utils.ErrorCollector()
+    table, metadata = utils.postProcessReconciliation(
+        table, shards, idReconciliator, reconciliatorResponse, processes, errors,
+        topK=topK, minScore=minScore, compact=compact)
+    table = utils.updateMetadataColumn(table, columnName, idReconciliator, metadata, reconciliatorResponse, errors)
+    table = utils.updateMetadataTable(table, errors)
+    if store is not None:
+        return {'raw': table, 'errors': errors.summary(),
+                'checkpoint': {'directory': checkpoint, 'batches': len(shards), 'resumed': resumed}}
+    return {'raw': table, 'errors': errors.summary()}
+
+# Example usage:
+#table = reconcile(getTable(29, 253), 'citta', 'wikidata', checkpoint='checkpoints/29_253_citta')
+#updateTable(table)
+#clearCheckpoint('checkpoints/29_253_citta')
 
-def updateTable(table):
+@instrumentation.traced('semtui.updateTable')
+def updateTable(table, raiseErrors=False):
     """
     Allows updating the table in the backend by inserting the table with the new information
 
     :table: the table to be updated within the backend
+    :raiseErrors: if True, an error status of the backend is raised (requests.HTTPError)
     :return: update status
     """
     table = table['raw']
-    url = SEMTUI_URI + 'dataset/' + str(table["table"]["id"])+'/table/'+str(table["table"]["idDataset"])
+    url = SEMTUI_URI + 'dataset/' + str(table["table"]["idDataset"])+'/table/'+str(table["table"]["id"])
     payload = utils.createUpdatePayload(table)
-    response = requests.put(url, json=payload)
+    response = SESSION.put(url, json=payload)
+    if raiseErrors:
+        response.raise_for_status()
     return response.text
 
-def extendColumn(table, reconciliatedColumnName, idExtender, properties, newColumnsName):
+@instrumentation.traced('semtui.extendColumn')
+def extendColumn(table, reconciliatedColumnName, idExtender, properties, newColumnsName,
+                 reconciliatorResponse=None, extenderResponse=None, adaptive=None):
     """
     Allows extending specified properties present in the Knowledge Graph as a new column
 
@@ -614,32 +1301,192 @@ def extendColumn(table, reconciliatedColumnName, idExtender, properties, newColu
     :idExtender: the extender to use for extension
     :properties: the properties to extend in the table
     :newColumnsName: the name of the new column to add
-    :return: the extended table
+    :reconciliatorResponse: reconciliator data from getReconciliatorData, fetched if not provided
+    :extenderResponse: extender data from getExtenderData, fetched if not provided
+    :adaptive: True, or a backpressure.AdaptiveController, to send the rows in batches whose size and
+               concurrency adapt to the extender (see reconcile). All the rows at once if None
+    :return: the extended table, and under 'errors' the summary of the cells
+             that could not be processed (see utils.ErrorCollector)
     """
-    reconciliatorResponse = getReconciliatorData()
+    if reconciliatorResponse is None:
+        reconciliatorResponse = getReconciliatorData()
+    if extenderResponse is None:
+        extenderResponse = getExtenderData()
     table = table["raw"]
     url = SEMTUI_URI + "extenders/" + \
-        str(utils.getExtender(idExtender, getExtenderData())['relativeUrl'])
+        str(utils.getExtender(idExtender, extenderResponse)['relativeUrl'])
     payload = utils.createExensionPayload(table, reconciliatedColumnName, idExtender, properties)
-    response = requests.post(url, json=payload)
-    table = utils.addExtendedColumns(table, json.loads(response.text), newColumnsName, reconciliatorResponse)
-    return {'raw': table}
+    if adaptive:
+        controller = backpressure.getController(url, f'extend.{idExtender}') if adaptive is True else adaptive
+        column = str(reconciliatedColumnName)
+        texts = backpressure.sendAdaptive(
+            SESSION, url, list(payload["items"][column].items()),
+            lambda items, start: dict(payload, items={column: dict(items)}), controller)
+        with instrumentation.span('semtui.extendColumn.decode'):
+            extensionData = utils.mergeExtensionResponses([json.loads(text) for text in texts])
+    else:
+        response = SESSION.post(url, json=payload)
+        with instrumentation.span('semtui.extendColumn.decode'):
+            extensionData = json.loads(response.text)
+    errors = utils.ErrorCollector()
+    table = utils.addExtendedColumns(table, extensionData, newColumnsName, reconciliatorResponse, errors)
+    return {'raw': table, 'errors': errors.summary()}
+
+# Service lists fetched by getServiceData: (backend URI, path) -> (fetch time, data)
+_service_cache = {}
+
+
+@instrumentation.traced('semtui.getServiceData')
+def getServiceData(path, maxAge=None):
+    """
+    Retrieves a service list from the backend. The service lists rarely change: with maxAge,
+    the data fetched less than maxAge seconds ago from the same backend is reused
+
+    :path: the path of the service list in the backend
+    :maxAge: maximum age in seconds of the reused data, None to always fetch
+    :return: the service list in JSON format
+    """
+    key = (SEMTUI_URI, path)
+    if maxAge is not None and key in _service_cache:
+        fetched, data = _service_cache[key]
+        if time.monotonic() - fetched < maxAge:
+            return data
+    response = SESSION.get(SEMTUI_URI + path)
+    data = json.loads(response.text)
+    _service_cache[key] = (time.monotonic(), data)
+    return data
 
-def getExtenderData():
+def getExtenderData(maxAge=None):
     """
     Retrieves extender data from the backend
 
+    :maxAge: if given, reuse the data fetched less than maxAge seconds ago
     :return: data of extension services in JSON format
     """
-    response = requests.get(SEMTUI_URI + '/extenders/list')
-    return json.loads(response.text)
+    return getServiceData('/extenders/list', maxAge)
 
-def getReconciliatorData():
+def getReconciliatorData(maxAge=None):
     """
     Retrieves reconciliator data from the backend
 
+    :maxAge: if given, reuse the data fetched less than maxAge seconds ago
     :return: data of reconciliator services in JSON format
     """
-    response = requests.get(SEMTUI_URI + '/reconciliators/list')
-    return json.loads(response.text)
+    return getServiceData('/reconciliators/list', maxAge)
+
+
+
+# BATCH JOBS
+
+def applyOperation(table, operation, reconciliatorResponse, extenderResponse):
+    """
+    Applies a column operation of a batch job to a table
+
+    :table: the table, as returned by getTable
+    :operation: dictionary with 'op' ('reconcile' or 'extend') and the arguments of the operation:
+                - reconcile: 'column', 'reconciliator', and optionally 'batchSize', 'processes',
+                  'topK', 'minScore', 'compact', and 'checkpoint', a directory holding the
+                  checkpoint of each table (see reconcile), and 'adaptive'
+                - extend: 'column', 'extender', 'properties', 'newColumns', and optionally 'adaptive'.
+                  With 'adaptive': True, the tables processed at the same time share the controller of
+                  the service: an overload met by one table slows all of them down
+    :reconciliatorResponse: reconciliator data from getReconciliatorData
+    :extenderResponse: extender data from getExtenderData
+    :return: the table with the operation applied, and under 'errors' the summary of the cells
+             that could not be processed
+    """
+    if operation['op'] == 'reconcile':
+        options = {key: operation[key] for key in ('batchSize', 'processes', 'topK', 'minScore', 'compact', 'adaptive')
+                   if key in operation}
+        if operation.get('checkpoint') is not None:
+            info = table['raw']['table']
+            options['checkpoint'] = os.path.join(
+                operation['checkpoint'], f"{info['idDataset']}_{info['id']}_{operation['column']}")
+        return reconcile(table, operation['column'], operation['reconciliator'],
+                         reconciliatorResponse=reconciliatorResponse, **options)
+    if operation['op'] == 'extend':
+        return extendColumn(table, operation['column'], operation['extender'], operation['properties'],
+                            operation['newColumns'], reconciliatorResponse=reconciliatorResponse,
+                            extenderResponse=extenderResponse, adaptive=operation.get('adaptive'))
+    raise ValueError(f"Unknown operation: {operation['op']}")
+
+
+def processTable(idDataset, idTable, operations, reconciliatorResponse, extenderResponse, update=True):
+    """
+    Runs the operations of a batch job on a table: the table is fetched once, the operations
+    are applied in order on the table in memory, and the table is updated once at the end.
+    The reconciliation checkpoints of the table are deleted once the update succeeded
+
+    :return: the report of the table (see processDataset)
+    """
+    start = time.perf_counter()
+    report = {'idTable': idTable, 'status': 'done', 'cells': 0, 'errors': []}
+    checkpoints = []
+    try:
+        # HTTP errors are raised, so that a missing table or a failed update is reported as failed
+        table = getTable(idDataset, idTable, raiseErrors=True)
+        report['cells'] = table['raw']['table'].get('nCells', 0)
+        for operation in operations:
+            table = applyOperation(table, operation, reconciliatorResponse, extenderResponse)
+            report['errors'].append({'op': operation['op'], **table['errors']})
+            if 'checkpoint' in table:
+                checkpoints.append(table['checkpoint']['directory'])
+        if update:
+            updateTable(table, raiseErrors=True)
+            for directory in checkpoints:
+                clearCheckpoint(directory)
+    except Exception as e:
+        report['status'] = 'failed'
+        report['error'] = f"{type(e).__name__}: {e}"
+    report['seconds'] = time.perf_counter() - start
+    return report
+
+
+@instrumentation.traced('semtui.processDataset')
+def processDataset(idDataset, operations, tables=None, workers=4, update=True, progress=None):
+    """
+    Runs the same column operations on all the tables of a dataset, several tables at a time.
+    The service lists are fetched once and shared by all the tables. A table whose processing
+    fails is reported, the other tables are processed anyway
+
+    Example: processDataset(29, [{'op': 'reconcile', 'column': 'citta', 'reconciliator': 'wikidata'},
+                                 {'op': 'extend', 'column': 'citta', 'extender': 'wikidataGeoPropertiesSPARQL',
+                                  'properties': ['wdt:P625'], 'newColumns': ['geocoordinates']}])
 
+    :idDataset: the dataset's ID in the backend
+    :operations: list of column operations, see applyOperation
+    :tables: the IDs of the tables to process, all the tables of the dataset if None
+    :workers: the number of tables processed at the same time
+    :update: if True, each table is updated in the backend after its operations
+    :progress: function called with the report of each table when it is done, and the number
+               of tables done and to do
+    :return: the report of the job: for each table, its status, number of cells, seconds and
+             errors; in total, the tables done and failed, the cells, the seconds and the cells per second
+    """
+    start = time.perf_counter()
+    if tables is None:
+        tables = [table['id'] for table in iterDatasetTables(idDataset)]
+    reconciliatorResponse = getReconciliatorData()
+    extenderResponse = getExtenderData() if any(operation['op'] == 'extend' for operation in operations) else None
+    reports = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = [executor.submit(processTable, idDataset, idTable, operations,
+                                   reconciliatorResponse, extenderResponse, update) for idTable in tables]
+        for future in as_completed(futures):
+            reports.append(future.result())
+            if progress is not None:
+                progress(reports[-1], len(reports), len(tables))
+    seconds = time.perf_counter() - start
+    cells = sum(report['cells'] for report in reports if report['status'] == 'done')
+    return {'idDataset': idDataset,
+            'tables': sorted(reports, key=lambda report: str(report['idTable'])),
+            'done': sum(1 for report in reports if report['status'] == 'done'),
+            'failed': sum(1 for report in reports if report['status'] == 'failed'),
+            'cells': cells,
+            'seconds': seconds,
+            'cellsPerSecond': cells / seconds if seconds > 0 else None}
+
+# Example usage:
+#job = processDataset(29, [{'op': 'reconcile', 'column': 'citta', 'reconciliator': 'wikidata'}],
+#                     progress=lambda report, done, total: print(f"{done}/{total} table {report['idTable']} {report['status']}"))
+#print(job['done'], job['failed'], job['cellsPerSecond'])
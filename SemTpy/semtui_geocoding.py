@@ -0,0 +1,85 @@
+"""
+Geocoding of address columns with the HERE Geocoding API; semtui imports this module
+on first use of get_geocoded_data.
+"""
+import pandas as pd
+import requests
+
+
+def get_geocoded_data(df: pd.DataFrame, address_columns: list, api_key: str) -> pd.DataFrame:
+    """
+    Retrieves geocoded data for a given DataFrame using the HERE Geocoding API.
+
+    :param df: The DataFrame containing address data to geocode.
+    :param address_columns: List of column names in df to use for constructing the address query.
+    :param api_key: The API key for the HERE Geocoding service.
+    :return: A DataFrame with original data and added geocoded information.
+    """
+    base_url = "https://geocode.search.hereapi.com/v1/geocode"
+    resolved_addresses = []
+
+    for index, row in df.iterrows():
+        # Construct the address query using the specified columns
+        address_parts = [str(row[col]) for col in address_columns if col in df.columns]
+        address_query = ', '.join(address_parts)
+        params = {
+            'q': address_query,
+            'apiKey': api_key
+        }
+
+        # Make the GET request to the HERE Geocoding API
+        response = requests.get(base_url, params=params)
+
+        if response.status_code == 200:
+            data = response.json()
+            items = data.get('items', [])
+            
+            if items:
+                # Extract resolved address and coordinates
+                resolved_address = items[0]['address']['label']
+                lat = items[0]['position']['lat']
+                lng = items[0]['position']['lng']
+                
+                # Append the resolved data
+                resolved_addresses.append({
+                    'Original Address': address_query,
+                    'Resolved Address': resolved_address,
+                    'Latitude': lat,
+                    'Longitude': lng
+                })
+            else:
+                # Handle cases where no items were found
+                resolved_addresses.append({
+                    'Original Address': address_query,
+                    'Resolved Address': 'Not found',
+                    'Latitude': None,
+                    'Longitude': None
+                })
+        else:
+            # Handle API response errors
+            print(f"Failed to geocode address: {address_query}. Status code: {response.status_code}")
+            resolved_addresses.append({
+                'Original Address': address_query,
+                'Resolved Address': 'Error',
+                'Latitude': None,
+                'Longitude': None
+            })
+
+    # Create a DataFrame from the resolved addresses
+    geocoded_df = pd.DataFrame(resolved_addresses)
+
+    # Merge the original DataFrame with the geocoded data
+    merged_df = pd.merge(df, geocoded_df, left_on=address_columns[0], right_on='Original Address', how='left')
+
+    # Drop the duplicate 'Original Address' column resulting from the merge
+    merged_df.drop('Original Address', axis=1, inplace=True)
+
+    return merged_df
+
+# Example usage:
+# Assuming your original DataFrame is named 'df' and you have an API key
+#api_key = 'YOUR_ACTUAL_API_KEY'
+#address_columns = ['Point of Interest', 'Place', 'Adm1', 'Country']
+# Get the merged DataFrame with geocoded information
+#merged_geocoded_df = get_geocoded_data(df, address_columns, api_key)
+#print(merged_geocoded_df)
@@ -0,0 +1,196 @@
+"""
+Interactive grids for Jupyter. Needs the optional ipyaggrid and ipywidgets packages;
+semtui imports this module on first use of one of its functions.
+"""
+import numpy as np
+import pandas as pd
+from ipyaggrid import Grid
+
+import utils
+
+
+# Tables with more rows than this are displayed one page at a time
+MAX_GRID_ROWS = 10000
+
+
+def display_csv_in_grid(data, page_size=None):
+    """
+    Displays the contents of a CSV file in an interactive grid using ipyaggrid.
+
+    Small tables are sent to the browser at once. Tables with more than MAX_GRID_ROWS rows,
+    or any table when page_size is given, are displayed with a PagedGrid: the data stays in
+    the kernel and only the current page of rows is sent to the browser.
+
+    Parameters:
+        data (str or DataFrame): The path to the CSV file to be displayed, or an already loaded
+            DataFrame (for instance the result of utils.parseTable).
+        page_size (int, optional): Number of rows per page; forces the paged grid.
+    """
+    # Load the CSV file into a Pandas DataFrame
+    df = data if isinstance(data, pd.DataFrame) else pd.read_csv(data)
+
+    if page_size is not None or len(df) > MAX_GRID_ROWS:
+        return PagedGrid(df, page_size=page_size or 1000).widget
+
+    # Create and display the grid
+    grid = Grid(grid_data=df,
+                grid_options=grid_options_for(df),
+                quick_filter=True,
+                show_toggle_edit=True,
+                export_mode="buttons",
+                theme='ag-theme-balham')
+    
+    return grid
+
+
+def grid_options_for(df):
+    # Define grid options for displaying the DataFrame
+    return {
+        'columnDefs': [{'field': c} for c in df.columns],
+        'enableSorting': True,
+        'enableFilter': True,
+        'enableColResize': True,
+        'enableRangeSelection': True,
+    }
+
+
+def display_reconciled_table(table, page_size=1000):
+    """
+    Displays a SemTUI table with its reconciliation results in an interactive grid.
+    Next to each reconciled column, the matched entity, its URI, the score and the match flag
+    are shown (see utils.parseReconciledTable); they are computed once, the rows are paged
+    from the kernel and the score cells are coloured from red (lowest) to green (highest).
+
+    Parameters:
+        table (dict): The table as returned by getTable or reconcile ({'raw': ...}), or the raw table.
+        page_size (int, optional): Number of rows per page.
+    """
+    raw = table['raw'] if 'raw' in table else table
+    df = utils.parseReconciledTable(raw).reset_index()
+    grid_options = grid_options_for(df)
+    for column_def in grid_options['columnDefs']:
+        field = column_def['field']
+        if field.endswith(' score'):
+            scores = df[field].dropna()
+            lowest = float(scores.min()) if len(scores) else 0.0
+            highest = float(scores.max()) if len(scores) else 0.0
+            span = (highest - lowest) or 1.0
+            column_def['cellStyle'] = (
+                "function(params) { if (params.value === null || params.value === undefined) { return null; } "
+                f"var hue = Math.round(120 * (params.value - {lowest}) / {span}); "
+                "return {'background-color': 'hsl(' + hue + ', 70%, 80%)'}; }")
+    return PagedGrid(df, page_size=page_size, grid_options=grid_options).widget
+
+
+class PagedGrid:
+    """
+    Grid for large DataFrames: the DataFrame stays in the kernel and the browser only
+    receives the rows of the current page. Sorting and filtering are computed in the
+    kernel over the whole DataFrame, and only the resulting window is sent.
+
+    The sort order of each column is computed once and cached; a filter is a case
+    insensitive substring match on one column.
+    """
+
+    def __init__(self, df, page_size=1000, grid_options=None):
+        import ipywidgets as widgets
+
+        self.df = df
+        self.page_size = page_size
+        # Positions of the visible rows, in display order
+        self.view = np.arange(len(df))
+        self.page = 0
+        self.sort_column = None
+        self.ascending = True
+        self.filter_column = None
+        self.filter_text = ''
+        self._sort_orders = {}
+
+        self.grid = Grid(grid_data=self.window(),
+                         grid_options=grid_options or grid_options_for(df),
+                         quick_filter=False,
+                         export_mode="buttons",
+                         theme='ag-theme-balham')
+
+        columns = [None] + list(df.columns)
+        self._previous = widgets.Button(description='Previous')
+        self._next = widgets.Button(description='Next')
+        self._status = widgets.Label()
+        self._sort = widgets.Dropdown(options=columns, description='Sort by')
+        self._order = widgets.ToggleButton(value=False, description='Descending')
+        self._filter_column = widgets.Dropdown(options=columns, description='Filter')
+        self._filter_text = widgets.Text(placeholder='contains...', continuous_update=False)
+
+        self._previous.on_click(lambda _: self.show_page(self.page - 1))
+        self._next.on_click(lambda _: self.show_page(self.page + 1))
+        self._sort.observe(lambda change: self.sort(change['new'], not self._order.value), names='value')
+        self._order.observe(lambda change: self.sort(self._sort.value, not change['new']), names='value')
+        self._filter_column.observe(lambda change: self.filter(change['new'], self._filter_text.value), names='value')
+        self._filter_text.observe(lambda change: self.filter(self._filter_column.value, change['new']), names='value')
+
+        self.widget = widgets.VBox([
+            widgets.HBox([self._sort, self._order, self._filter_column, self._filter_text]),
+            self.grid,
+            widgets.HBox([self._previous, self._status, self._next]),
+        ])
+        self._update_status()
+
+    @property
+    def n_pages(self):
+        return max(1, -(-len(self.view) // self.page_size))
+
+    def window(self):
+        """Returns the rows of the current page."""
+        start = self.page * self.page_size
+        return self.df.iloc[self.view[start:start + self.page_size]]
+
+    def show_page(self, page):
+        """Sends the rows of the given page to the browser."""
+        self.page = min(max(page, 0), self.n_pages - 1)
+        self.grid.update_grid_data(self.window())
+        self._update_status()
+
+    def sort(self, column, ascending=True):
+        """Sorts the whole DataFrame by a column (None for the original order)."""
+        self.sort_column = column
+        self.ascending = ascending
+        self._refresh_view()
+
+    def filter(self, column, text):
+        """Keeps the rows whose column contains the text (None or '' removes the filter)."""
+        self.filter_column = column
+        self.filter_text = text
+        self._refresh_view()
+
+    def _refresh_view(self):
+        if self.sort_column is None:
+            order = np.arange(len(self.df))
+        else:
+            if self.sort_column not in self._sort_orders:
+                # Positions of the rows sorted by the column, missing values last
+                values = self.df[self.sort_column].reset_index(drop=True)
+                self._sort_orders[self.sort_column] = values.sort_values(kind='stable').index.to_numpy()
+            order = self._sort_orders[self.sort_column]
+            if not self.ascending:
+                order = order[::-1]
+        if self.filter_column is not None and self.filter_text:
+            mask = self.df[self.filter_column].astype(str).str.contains(
+                self.filter_text, case=False, regex=False).to_numpy()
+            order = order[mask[order]]
+        self.view = order
+        self.show_page(0)
+
+    def _update_status(self):
+        self._status.value = f"Page {self.page + 1} of {self.n_pages} ({len(self.view)} rows)"
+
+# Example usage
+# Assuming you have a path to a CSV file
+# csv_file_path = "path/to/your/file.csv"
+# display_csv_in_grid(csv_file_path)
+
+# Large tables, or tables already loaded, are paged from the kernel
+# display_csv_in_grid(df, page_size=500)
+
+# Browse the results of a reconciliation
+# table = semtui.reconcile(semtui.getTable(29, 253), 'citta', 'wikidata')
+# display_reconciled_table(table)
@@ -0,0 +1,294 @@
+"""
+LLM helpers (transformation recommendations, questions about a DataFrame). The Groq clients
+come from the optional groq, langchain_groq and pandasai packages, imported when a session
+first needs them; semtui imports this module on first use of one of its functions.
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+import requests
+
+
+PROFILE_PROMPT = "you are a helpful data analyst. Answer the question about a dataset using only the profile of the dataset given in JSON: its columns with their types, missing values, number of distinct values, most frequent values, numeric summaries and a few sample rows."
+
+RECOMMENDATIONS_PROMPT = "you are a helpful assistant. Your job is to return recommendations for data transformations that involve external available on the internet or external APIs."
+
+
+def dataframe_fingerprint(df):
+    """Hash of the schema and content of a DataFrame, computed in one vectorized pass."""
+    digest = hashlib.sha256(json.dumps([[str(c), str(t)] for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+# Profiles computed by profile_dataframe, by DataFrame fingerprint
+_profile_cache = {}
+
+
+def profile_dataframe(df, sample_rows=5, top_values=5):
+    """
+    Summarizes a DataFrame for an LLM: for each column its type, the number of missing and
+    distinct values and the most frequent values, the numeric summaries, and a few sample rows.
+    The profile is cached and only recomputed when the content of the DataFrame changes.
+
+    :df: the DataFrame to profile
+    :sample_rows: the number of sample rows included
+    :top_values: the number of most frequent values included for non-numeric columns
+    :return: the profile as a dictionary
+    """
+    fingerprint = dataframe_fingerprint(df)
+    if fingerprint in _profile_cache:
+        return _profile_cache[fingerprint]
+
+    missing = df.isna().sum()
+    distinct = df.nunique()
+    numeric = df.select_dtypes(include='number')
+    summaries = numeric.describe().to_dict() if len(numeric.columns) else {}
+    columns = {}
+    for column in df.columns:
+        info = {'type': str(df[column].dtype),
+                'missing': int(missing[column]),
+                'distinct': int(distinct[column])}
+        if column in summaries:
+            info['summary'] = {name: float(value) for name, value in summaries[column].items()}
+        else:
+            counts = df[column].value_counts().head(top_values)
+            info['top'] = {str(value): int(count) for value, count in counts.items()}
+        columns[str(column)] = info
+    profile = {'rows': len(df), 'columns': columns,
+               'sample': json.loads(df.head(sample_rows).to_json(orient='records', date_format='iso'))}
+    if len(_profile_cache) >= 32:
+        # Keep the cache small: the profiles of DataFrames that changed are never used again
+        _profile_cache.clear()
+    _profile_cache[fingerprint] = profile
+    return profile
+
+
+class LLMSession:
+    """
+    Reusable connection to the Groq LLM service. The clients are created once per session,
+    and every response is stored in a persistent cache (a SQLite file) keyed on a hash of the
+    question and of the DataFrame it is about, so repeated questions are answered without
+    calling the service. Several questions can be sent concurrently with chat_many.
+
+    :api_key: the API key for the Groq service, taken from the GROQ_API_KEY environment variable if None
+    :model: the model to use
+    :cache_path: SQLite file where the responses are cached, in memory only if None
+    :base_url: base URL of the completion service, to use a proxy or a local fake server
+    :max_workers: maximum number of concurrent requests in chat_many
+    """
+
+    def __init__(self, api_key=None, model="mixtral-8x7b-32768", cache_path=None, base_url=None, max_workers=4):
+        import sqlite3
+        import threading
+
+        self.api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY")
+        self.model = model
+        self.base_url = base_url
+        self.max_workers = max_workers
+        self._client = None
+        self._chat_llm = None
+        self._memory = {}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(cache_path or ':memory:', check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT)")
+        self._db.commit()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from groq import Groq
+            self._client = Groq(api_key=self.api_key, base_url=self.base_url)
+        return self._client
+
+    @property
+    def chat_llm(self):
+        if self._chat_llm is None:
+            from langchain_groq import ChatGroq
+            self._chat_llm = ChatGroq(model_name=self.model, api_key=self.api_key, base_url=self.base_url)
+        return self._chat_llm
+
+    def cache_key(self, kind, question, df=None):
+        """Hash of the request: its kind, the model, the question and the DataFrame schema and content."""
+        digest = hashlib.sha256(json.dumps([kind, self.model, question]).encode())
+        if df is not None:
+            digest.update(dataframe_fingerprint(df).encode())
+        return digest.hexdigest()
+
+    def cached(self, key):
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            response = json.loads(row[0])
+            self._memory[key] = response
+            return response
+
+    def store(self, key, response):
+        try:
+            serialized = json.dumps(response)
+        except TypeError:
+            # Answers like DataFrames or plots are not cached
+            return
+        with self._lock:
+            self._memory[key] = response
+            self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, serialized))
+            self._db.commit()
+
+    def complete(self, messages, kind='completion', df=None):
+        """Returns the (cached) text of a chat completion."""
+        key = self.cache_key(kind, messages, df)
+        response = self.cached(key)
+        if response is None:
+            completion = self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                temperature=0.0,
+                max_tokens=1024,
+                top_p=1,
+                stop=None,
+            )
+            response = completion.choices[0].message.content
+            self.store(key, response)
+        return response
+
+    def recommendations(self, df):
+        """Returns the (cached) transformation recommendations for the columns of a DataFrame."""
+        # Format the feature names as a JSON object
+        feature_json = json.dumps({feature: 'float' for feature in df.columns.tolist()})
+        return self.complete([
+            {"role": "system", "content": RECOMMENDATIONS_PROMPT},
+            {"role": "user", "content": feature_json},
+        ], kind='recommendations')
+
+    def ask(self, df, question):
+        """
+        Returns the (cached) answer to a question about a DataFrame, sending the profile
+        of the DataFrame (see profile_dataframe) instead of the data.
+        """
+        profile = profile_dataframe(df)
+        return self.complete([
+            {"role": "system", "content": PROFILE_PROMPT},
+            {"role": "user", "content": json.dumps(profile, default=str) + "\n\nQuestion: " + question},
+        ], kind='ask')
+
+    def chat(self, df, question):
+        """Returns the (cached) answer of SmartDataframe to a question about a DataFrame."""
+        key = self.cache_key('chat', question, df)
+        response = self.cached(key)
+        if response is None:
+            from pandasai import SmartDataframe
+            response = SmartDataframe(df, config={"llm": self.chat_llm}).chat(question)
+            self.store(key, response)
+        return response
+
+    def chat_many(self, df, questions, context='profile'):
+        """Answers several questions about a DataFrame concurrently, in the order of the questions."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        answer = self.ask if context == 'profile' else self.chat
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(lambda question: answer(df, question), questions))
+
+    def close(self):
+        self._db.close()
+
+
+# Cache file of the shared sessions, so that the answers are kept between runs
+DEFAULT_CACHE_PATH = os.getenv("SEMTPY_LLM_CACHE", os.path.join(os.path.expanduser("~"), ".semtpy_llm_cache.db"))
+
+# One session per API key and cache file, shared by the functions below
+_llm_sessions = {}
+
+
+def get_llm_session(api_key=None, cache_path=DEFAULT_CACHE_PATH):
+    """
+    Returns the shared LLMSession of an API key, creating it on first use.
+
+    :api_key: the API key for the Groq service, taken from the GROQ_API_KEY environment variable if None
+    :cache_path: SQLite file where the responses are cached, in memory only if None
+    """
+    api_key = api_key if api_key is not None else os.getenv("GROQ_API_KEY")
+    if (api_key, cache_path) not in _llm_sessions:
+        _llm_sessions[api_key, cache_path] = LLMSession(api_key, cache_path=cache_path)
+    return _llm_sessions[api_key, cache_path]
+
+
+def get_transformation_recommendations_from_df(df_csv, api_key, session=None, cache_path=DEFAULT_CACHE_PATH):
+    try:
+        # Extract the feature names from the DataFrame
+        feature_names = df_csv.columns.tolist()
+        print(f"Feature Names:\n{feature_names}\n")
+
+        session = session or get_llm_session(api_key, cache_path)
+        recommendations = session.recommendations(df_csv)
+        print(recommendations)
+        return recommendations
+
+    except requests.exceptions.RequestException as e:
+        print("Error making the request:", e)
+    except json.JSONDecodeError as e:
+        print("Error decoding JSON response:", e)
+    except Exception as e:
+        print("An error occurred:", e)
+
+# Example usage:
+#my_api_key = os.getenv("GROQ_API_KEY")
+#df_csv = pd.read_csv('your_dataset.csv')
+#recommendations = get_transformation_recommendations_from_df(df_csv, my_api_key)
+#print(recommendations)
+
+
+def df_chat(df_csv, question, api_key=None, session=None, context='profile', cache_path=DEFAULT_CACHE_PATH):
+    """
+    Given a DataFrame and a question, use a ChatGroq instance to process the question
+    and return the answer based on the data in the DataFrame.
+    
+    Parameters:
+        df_csv (DataFrame): The DataFrame to analyze.
+        question (str): The question to ask about the data in the DataFrame.
+        api_key (str, optional): The API key for the Groq service. If not provided,
+                                 it tries to fetch from the environment variable "GROQ_API_KEY".
+        session (LLMSession, optional): The session to use; by default the shared session of
+                                 the API key, which caches the answers.
+        context (str, optional): 'profile' sends a cached summary of the DataFrame (see
+                                 profile_dataframe) so the prompt does not grow with the data;
+                                 'data' lets SmartDataframe work on the full DataFrame.
+        cache_path (str, optional): The SQLite file caching the answers of the shared session,
+                                 in memory only if None.
+    
+    Returns:
+        str: The answer to the question based on the DataFrame data.
+    """
+    # If the API key is not provided as an argument, try to get it from the environment variable
+    if api_key is None and session is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if api_key is None:
+            return "API key is not provided. Please provide an API key."
+
+    try:
+        # The session reuses its ChatGroq instance and answers repeated questions from its cache
+        session = session or get_llm_session(api_key, cache_path)
+        if context == 'profile':
+            answer = session.ask(df_csv, question)
+        else:
+            answer = session.chat(df_csv, question)
+        return answer
+
+    except requests.exceptions.RequestException as e:
+        return f"Request error: {e}"
+    except Exception as e:
+        return f"An error occurred: {e}"
+
+# Example usage:
+# Assuming 'df_csv' is your DataFrame and you want to ask a question
+# answer = df_chat(df_csv, 'What are the top 5 countries?')
+# print(f"Answer:\n{answer}")
+
+# Ask many questions with a persistent cache, or against a local fake completion server
+# session = LLMSession(cache_path='llm_cache.db', base_url='http://localhost:8000')
+# answers = session.chat_many(df_csv, ['What are the top 5 countries?', 'How many museums are there?'])
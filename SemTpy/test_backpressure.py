@@ -0,0 +1,71 @@
+import time
+
+import backpressure
+import semtui
+from mock_semtui import MockSemtuiServer
+
+
+class Response:
+    def __init__(self, status_code=200, text='[]', headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class Session:
+    """Fake requests session answering the given statuses in order, then 200"""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.times = []
+
+    def post(self, url, json=None):
+        self.times.append(time.monotonic())
+        return self.responses.pop(0) if self.responses else Response(text=str(len(json['items'])))
+
+
+def test_window_grows_on_fast_answers():
+    controller = backpressure.AdaptiveController(batchSize=100, minBatchSize=10, concurrency=1, maxConcurrency=3)
+    for _ in range(4):
+        controller.success(100, 0.1)
+    assert controller.batchSize == 140
+    assert controller.concurrency == 3
+
+
+def test_window_halves_on_429():
+    controller = backpressure.AdaptiveController(batchSize=100, concurrency=4, maxConcurrency=4)
+    texts = backpressure.sendAdaptive(Session(Response(429)), 'url', list(range(100)),
+                                      lambda items, start: {'items': items}, controller)
+    assert controller.overloads == 1
+    # Halved by the 429, then grown by one step for each of the two batches of 50 sent again
+    assert controller.batchSize == 50 + 2 * controller.step
+    assert texts == ['50', '50']
+
+
+def test_retry_after_is_honoured():
+    assert backpressure.retryAfterSeconds(Response(headers={'Retry-After': '3'})) == 3.0
+    assert backpressure.retryAfterSeconds(Response(headers={'Retry-After': 'soon'}), default=1.5) == 1.5
+    session = Session(Response(429, headers={'Retry-After': '0.3'}))
+    controller = backpressure.AdaptiveController(batchSize=10, minBatchSize=10)
+    backpressure.sendAdaptive(session, 'url', list(range(10)), lambda items, start: {'items': items}, controller)
+    assert session.times[1] - session.times[0] >= 0.3
+
+
+def test_adaptive_extension_equals_single_request(monkeypatch):
+    with MockSemtuiServer({(1, 1): (60, 2)}) as server:
+        monkeypatch.setattr(semtui, 'SEMTUI_URI', server.uri)
+        table = semtui.reconcile(semtui.getTable(1, 1), 'col0', 'wikidata')
+        expected = semtui.extendColumn(table, 'col0', 'wikidataSPARQL', ['wdt:P625'], ['coordinates'])
+        # One request at a time, the concurrent requests are answered 429
+        server.maxInFlight = 1
+        server.reset_counters()
+        controller = backpressure.AdaptiveController('extend', batchSize=4, minBatchSize=2, concurrency=4)
+        extended = semtui.extendColumn(table, 'col0', 'wikidataSPARQL', ['wdt:P625'], ['coordinates'],
+                                       adaptive=controller)
+    assert server.requests.get('overloaded', 0) > 0
+    assert controller.overloads == server.requests['overloaded']
+    assert extended['raw']['rows'] == expected['raw']['rows']
+    assert extended['raw']['columns'] == expected['raw']['columns']
@@ -0,0 +1,62 @@
+import sys
+
+import pytest
+
+import instrumentation
+import semtui
+from mock_semtui import MockSemtuiServer
+
+
+@pytest.fixture
+def enabled():
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+@instrumentation.traced('test.outer')
+def outer():
+    with instrumentation.span('test.inner', rows=3) as inner:
+        inner.set(cells=6)
+    return 'done'
+
+
+def test_spans_record_names_timing_and_parent_links(enabled):
+    assert outer() == 'done'
+    inner, parent = instrumentation.spans()
+    assert (parent['name'], inner['name']) == ('test.outer', 'test.inner')
+    assert parent['parentId'] is None
+    assert inner['parentId'] == parent['spanId']
+    assert inner['attributes'] == {'rows': 3, 'cells': 6}
+    assert 0 < inner['duration'] <= parent['duration']
+    assert instrumentation.summary()['spans']['test.inner']['count'] == 1
+
+
+def test_http_calls_are_children_of_the_traced_operation(enabled, monkeypatch):
+    with MockSemtuiServer({(1, 1): (5, 2)}) as server:
+        monkeypatch.setattr(semtui, 'SEMTUI_URI', server.uri)
+        semtui.getTable(1, 1)
+    spans = {entry['name']: entry for entry in instrumentation.spans()}
+    assert spans['http.GET']['parentId'] == spans['semtui.getTable']['spanId']
+    assert spans['semtui.getTable.decode']['parentId'] == spans['semtui.getTable']['spanId']
+    assert instrumentation.summary()['counters']['http.requests'] == 1
+
+
+def test_disabled_instrumentation_records_nothing():
+    assert not instrumentation.ENABLED
+    assert instrumentation.span('test.inner') is instrumentation.NOOP_SPAN
+    assert outer() == 'done'
+    instrumentation.add('test.counter')
+    assert instrumentation.spans() == []
+    assert instrumentation.summary() == {'spans': {}, 'counters': {}, 'gauges': {}}
+
+
+def test_otel_export_needs_no_opentelemetry_package(enabled, monkeypatch):
+    # The export is plain OTLP/JSON: it works with the opentelemetry package unavailable
+    monkeypatch.setitem(sys.modules, 'opentelemetry', None)
+    outer()
+    exported = instrumentation.to_otel()['resourceSpans'][0]['scopeSpans'][0]['spans']
+    inner, parent = exported
+    assert inner['parentSpanId'] == parent['spanId']
+    assert 'parentSpanId' not in parent
@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import pipeline_test
+
+
+def frame_with_missing(rows=1000):
+    values = np.arange(rows, dtype=float)
+    values[::7] = np.nan
+    return pd.DataFrame({'id': np.arange(rows), 'value': values, 'label': [f"row {i}" for i in range(rows)]})
+
+
+def test_run_partitioned_through_shared_memory_equals_serial_run():
+    assert pipeline_test.pa is not None
+    data = frame_with_missing()
+    parameters = {'method': 'drop_missing'}
+    parallel = pipeline_test.run_partitioned(pipeline_test.clean_data, data, parameters, 3)
+    pd.testing.assert_frame_equal(parallel, pipeline_test.clean_data(data, **parameters))
+
+
+def read_output(path, format):
+    return pd.read_parquet(path) if format == 'parquet' else pd.read_feather(path)
+
+
+@pytest.mark.parametrize('format', ['parquet', 'feather'])
+@pytest.mark.parametrize('missing_in_first_chunk', [True, False])
+def test_streamed_filtered_chunks_round_trip_through_arrow_files(tmp_path, format, missing_in_first_chunk):
+    data = frame_with_missing(100)
+    # Only one of the two chunks loses rows, so one keeps a RangeIndex and the other not
+    data['value'] = np.arange(100, dtype=float)
+    data.loc[10 if missing_in_first_chunk else 60, 'value'] = np.nan
+    source = tmp_path / 'input.csv'
+    data.to_csv(source, index=False)
+    path = str(tmp_path / f"output.{format}")
+    chunks = pipeline_test.stream_step(pipeline_test.clean_data, pipeline_test.load_data(source, chunksize=50),
+                                       {'method': 'drop_missing'})
+    pipeline_test.save_data(chunks, path)
+    expected = pipeline_test.clean_data(data, 'drop_missing').reset_index(drop=True)
+    pd.testing.assert_frame_equal(read_output(path, format), expected)
+
+
+def counting_steps(calls):
+    """Pipeline steps that count their calls by step name"""
+    def load(path):
+        calls['load'] = calls.get('load', 0) + 1
+        return pd.read_csv(path)
+
+    def clean(data, method):
+        calls['clean'] = calls.get('clean', 0) + 1
+        return pipeline_test.clean_data(data, method)
+
+    return {'load': load, 'clean': clean}
+
+
+def cached_pipeline(path, method='drop_missing'):
+    return {'pipeline': [{'step': 'load', 'parameters': {'path': str(path)}, 'output': 'raw'},
+                         {'step': 'clean', 'input': 'raw', 'parameters': {'method': method}, 'output': 'clean'}]}
+
+
+def test_step_cache_serves_unchanged_steps_and_reruns_changed_ones(tmp_path):
+    source = tmp_path / 'input.csv'
+    frame_with_missing(100).to_csv(source, index=False)
+    cache_dir = str(tmp_path / 'cache')
+    calls = {}
+    steps = counting_steps(calls)
+
+    first = pipeline_test.run_pipeline(cached_pipeline(source), steps, cache_dir)
+    second = pipeline_test.run_pipeline(cached_pipeline(source), steps, cache_dir)
+    assert calls == {'load': 1, 'clean': 1}
+    pd.testing.assert_frame_equal(second['clean'], first['clean'])
+
+    # A changed parameter only reruns its step
+    pipeline_test.run_pipeline(cached_pipeline(source, method='keep'), steps, cache_dir)
+    assert calls == {'load': 1, 'clean': 2}
+
+    # A changed input file reruns the step reading it and the steps downstream of it
+    frame_with_missing(120).to_csv(source, index=False)
+    pipeline_test.run_pipeline(cached_pipeline(source), steps, cache_dir)
+    assert calls == {'load': 2, 'clean': 3}
+
+    # A forced step reruns together with everything downstream of it
+    pipeline_test.run_pipeline(cached_pipeline(source), steps, cache_dir, force=['load'])
+    assert calls == {'load': 3, 'clean': 4}
+
+
+def streaming_pipeline(source, output):
+    return {'pipeline': [{'step': 'load_data', 'parameters': {'path': str(source)}, 'output': 'raw'},
+                         {'step': 'clean_data', 'input': 'raw', 'parameters': {'method': 'drop_missing'},
+                          'output': 'clean'},
+                         {'step': 'save_data', 'input': 'clean', 'parameters': {'path': str(output)}}]}
+
+
+@pytest.mark.parametrize('format', ['csv', 'parquet', 'feather'])
+def test_streamed_pipeline_writes_the_in_memory_output(tmp_path, format):
+    source = tmp_path / 'input.csv'
+    frame_with_missing(1000).to_csv(source, index=False)
+    streamed = tmp_path / f"streamed.{format}"
+    in_memory = tmp_path / f"in_memory.{format}"
+    pipeline_test.run_pipeline(streaming_pipeline(source, streamed), chunksize=64)
+    pipeline_test.run_pipeline(streaming_pipeline(source, in_memory))
+    if format == 'csv':
+        assert streamed.read_text() == in_memory.read_text()
+    else:
+        pd.testing.assert_frame_equal(read_output(streamed, format), read_output(in_memory, format))
+
+
+def test_streamed_pipeline_with_every_row_filtered_out_writes_the_header(tmp_path):
+    source = tmp_path / 'input.csv'
+    data = frame_with_missing(100)
+    data['value'] = np.nan
+    data.to_csv(source, index=False)
+    output = tmp_path / 'output.csv'
+    pipeline_test.run_pipeline(streaming_pipeline(source, output), chunksize=30)
+    assert output.read_text().strip() == ',id,value,label'
+
+
+def test_streamed_enrich_data_fetches_its_source_once(tmp_path, monkeypatch):
+    requested = []
+
+    class Response:
+        status_code = 404
+
+        def json(self):
+            return {}
+
+    def get(url, params=None):
+        requested.append(url)
+        return Response()
+
+    monkeypatch.setattr(pipeline_test.requests, 'get', get)
+    places = pd.DataFrame({'Point of Interest': [f"museum {i}" for i in range(10)], 'Place': 'Milan',
+                           'Adm1': 'Lombardy', 'Country': 'Italy'})
+    source = tmp_path / 'places.csv'
+    places.to_csv(source, index=False)
+    config = {'pipeline': [{'step': 'load_data', 'parameters': {'path': str(source)}, 'output': 'raw'},
+                           {'step': 'enrich_data', 'input': 'raw',
+                            'parameters': {'source': 'http://example.org/source', 'api_key': 'key'},
+                            'output': 'enriched'}]}
+    result = pipeline_test.run_pipeline(config, chunksize=3)
+    assert len(pd.concat(list(result['enriched']))) == 10
+    assert requested.count('http://example.org/source') == 1
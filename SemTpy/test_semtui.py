@@ -0,0 +1,139 @@
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+import semtui
+from mock_semtui import MockSemtuiServer
+
+
+def test_column_sketch_counts_distinct_values_of_a_low_cardinality_column():
+    values = pd.Series(np.arange(200000) % 50)
+    sketch = semtui.ColumnSketch(values, k=1024)
+    assert sketch.exact
+    assert sketch.distinct() == 50
+
+
+def test_infer_schema_finds_a_low_cardinality_foreign_key():
+    stores = pd.DataFrame({'id': np.arange(1, 51), 'city': [f"city {i}" for i in range(50)]})
+    sales = pd.DataFrame({'id': np.arange(200000),
+                          'store_id': np.arange(200000) % 50 + 1,
+                          'amount': np.arange(200000) * 0.5})
+    schema = semtui.infer_schema({'store.csv': stores, 'sales.csv': sales})
+    assert schema['tables']['store.csv']['primaryKey'] == 'id'
+    assert schema['tables']['sales.csv']['relationships'] == {'store_id': 'store.csv'}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with MockSemtuiServer({(1, 1): (24, 2)}) as server:
+        monkeypatch.setattr(semtui, 'SEMTUI_URI', server.uri)
+        yield server
+
+
+def test_reconcile_resumes_from_its_checkpoint(server, tmp_path, monkeypatch):
+    full = semtui.reconcile(semtui.getTable(1, 1), 'col0', 'wikidata')
+    checkpoint = str(tmp_path / 'checkpoint')
+    post = semtui.SESSION.post
+    sent = []
+
+    def failing_post(url, **kwargs):
+        # The network fails after the first two batches
+        if len(sent) == 2:
+            raise requests.ConnectionError('connection lost')
+        sent.append(url)
+        return post(url, **kwargs)
+
+    monkeypatch.setattr(semtui.SESSION, 'post', failing_post)
+    with pytest.raises(requests.ConnectionError):
+        semtui.reconcile(semtui.getTable(1, 1), 'col0', 'wikidata', batchSize=5, checkpoint=checkpoint)
+    monkeypatch.setattr(semtui.SESSION, 'post', post)
+
+    server.reset_counters()
+    resumed = semtui.reconcile(semtui.getTable(1, 1), 'col0', 'wikidata', batchSize=5, checkpoint=checkpoint)
+    assert server.requests['reconcile'] == 3
+    assert resumed['checkpoint'] == {'directory': checkpoint, 'batches': 5, 'resumed': 2}
+    assert resumed['raw']['rows'] == full['raw']['rows']
+    assert resumed['raw']['columns'] == full['raw']['columns']
+
+
+def test_catalog_pages_and_refreshes_only_the_changed_datasets(monkeypatch):
+    tables = {(idDataset, idTable): (10, 2) for idDataset in range(1, 6) for idTable in range(1, 4)}
+    with MockSemtuiServer(tables) as server:
+        monkeypatch.setattr(semtui, 'SEMTUI_URI', server.uri)
+        catalog = semtui.Catalog()
+        assert sorted(catalog.refresh(pageSize=2)) == ['1', '2', '3', '4', '5']
+        # 5 datasets in pages of 2, and 3 tables in pages of 2 for each dataset
+        assert server.requests == {'datasets': 3, 'tables': 10}
+        assert len(catalog.tables()) == 15
+
+        server.reset_counters()
+        assert catalog.refresh(pageSize=2) == []
+        assert server.requests == {'datasets': 3}
+
+        server.modified[4] = '2024-06-01T00:00:00.000Z'
+        server.reset_counters()
+        assert catalog.refresh(pageSize=2) == ['4']
+        assert server.requests == {'datasets': 3, 'tables': 2}
+        assert list(catalog.datasets(modifiedSince='2024-05-01')['id']) == [4]
+
+
+def test_service_data_is_reused_within_its_max_age(server):
+    semtui.getReconciliatorData(maxAge=60)
+    semtui.getReconciliatorData(maxAge=60)
+    assert server.requests['reconciliators'] == 1
+    semtui.getReconciliatorData(maxAge=0)
+    assert server.requests['reconciliators'] == 2
+
+
+def test_get_table_raises_backend_errors_only_when_asked(server):
+    assert semtui.getTable(1, 2)['raw'] == {'error': 'table not found'}
+    with pytest.raises(requests.HTTPError):
+        semtui.getTable(1, 2, raiseErrors=True)
+    assert semtui.getTable(1, 1, raiseErrors=True)['raw']['table']['id'] == 1
+
+
+def test_process_dataset_reports_a_failed_table_and_clears_the_checkpoints(server, tmp_path):
+    server.tables[(1, 2)] = (30, 2)
+    checkpoints = tmp_path / 'checkpoints'
+    operations = [{'op': 'reconcile', 'column': 'col0', 'reconciliator': 'wikidata',
+                   'batchSize': 10, 'checkpoint': str(checkpoints)}]
+    job = semtui.processDataset(1, operations, tables=[1, 2, 3], workers=2)
+    assert (job['done'], job['failed']) == (2, 1)
+    assert [report['status'] for report in job['tables']] == ['done', 'done', 'failed']
+    assert job['tables'][2]['error'].startswith('HTTPError')
+    assert job['cells'] == 24 * 2 + 30 * 2
+    assert server.requests['updateTable'] == 2
+    # The tables updated leave no checkpoint behind
+    assert list(checkpoints.iterdir()) == []
+
+
+def test_convert_to_iso8601_parses_mixed_formats_and_keeps_none_for_failures():
+    df = pd.DataFrame({'date': ['2020-01-05', '2020-01-05', '05/02/2021', 'March 3, 2019', None, 'garbage']})
+    df, report = semtui.convert_to_iso8601_pandas(df, 'date', report=True)
+    assert list(df['date']) == ['2020-01-05T00:00:00', '2020-01-05T00:00:00', '2021-02-05T00:00:00',
+                                '2019-03-03T00:00:00', None, None]
+    assert (report['date']['parsed'], report['date']['failed']) == (4, 1)
+    assert report['date']['failedSamples'] == ['garbage']
+
+
+def test_convert_to_iso8601_reads_numeric_columns_as_years():
+    df = pd.DataFrame({'int': [2020, 1999], 'float': [2020.0, np.nan]})
+    df = semtui.convert_to_iso8601_pandas(df, ['int', 'float'])
+    assert list(df['int']) == ['2020-01-01T00:00:00', '1999-01-01T00:00:00']
+    assert list(df['float']) == ['2020-01-01T00:00:00', None]
+
+
+def test_convert_to_iso8601_returns_none_for_nat():
+    df = pd.DataFrame({'date': pd.to_datetime(['2020-01-01 10:30', None])})
+    df = semtui.convert_to_iso8601_pandas(df, 'date')
+    assert list(df['date']) == ['2020-01-01T10:30:00', None]
+
+
+def test_update_table_puts_the_table_of_its_dataset(server):
+    server.tables[(1, 2)] = (5, 2)
+    table = semtui.getTable(1, 2)
+    assert semtui.updateTable(table, raiseErrors=True) == '{"status": "ok"}'
+    table['raw']['table']['idDataset'] = 3
+    with pytest.raises(requests.HTTPError):
+        semtui.updateTable(table, raiseErrors=True)
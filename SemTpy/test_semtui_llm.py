@@ -0,0 +1,94 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pandas as pd
+import pytest
+
+pytest.importorskip('groq')
+
+import semtui_llm
+
+
+class CompletionServer:
+    """Local fake chat completion service: answers each question with 'answer to <question>'"""
+
+    def __init__(self):
+        self.hits = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                with server.lock:
+                    server.hits += 1
+                question = payload['messages'][-1]['content'].rsplit('Question: ', 1)[-1]
+                body = json.dumps({
+                    'id': 'completion', 'object': 'chat.completion', 'created': 0, 'model': payload['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop',
+                                 'message': {'role': 'assistant', 'content': f"answer to {question}"}}],
+                }).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.uri = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    server = CompletionServer()
+    yield server
+    server.close()
+
+
+def museums():
+    return pd.DataFrame({'name': ['Louvre', 'Uffizi', 'Prado'], 'visitors': [8.7, 2.2, 3.2]})
+
+
+def session(server, cache_path=None):
+    return semtui_llm.LLMSession(api_key='test', cache_path=cache_path, base_url=server.uri, max_workers=3)
+
+
+def test_repeated_question_is_answered_from_the_cache(server):
+    llm = session(server)
+    assert llm.ask(museums(), 'How many museums?') == 'answer to How many museums?'
+    assert llm.ask(museums(), 'How many museums?') == 'answer to How many museums?'
+    assert server.hits == 1
+
+
+def test_answers_persist_across_sessions_sharing_a_cache_file(server, tmp_path):
+    cache_path = str(tmp_path / 'llm_cache.db')
+    first = session(server, cache_path)
+    first.ask(museums(), 'How many museums?')
+    first.close()
+    second = session(server, cache_path)
+    assert second.ask(museums(), 'How many museums?') == 'answer to How many museums?'
+    assert server.hits == 1
+
+
+def test_chat_many_answers_in_the_order_of_the_questions(server):
+    questions = [f"question {i}" for i in range(6)]
+    answers = session(server).chat_many(museums(), questions)
+    assert answers == [f"answer to {question}" for question in questions]
+
+
+def test_changed_dataframe_misses_the_cache(server):
+    llm = session(server)
+    df = museums()
+    llm.ask(df, 'How many museums?')
+    df.loc[0, 'visitors'] = 9.0
+    llm.ask(df, 'How many museums?')
+    assert server.hits == 2
@@ -0,0 +1,71 @@
+import copy
+
+import utils
+
+
+def reconciled_table():
+    # Two rows, column 'c' reconciled: the first cell matched, the second not
+    cells = [
+        {'id': 'r1$c', 'label': 'Rome', 'metadata': [
+            {'id': 'wd:Q220', 'name': {'value': 'Rome', 'uri': 'https://www.wikidata.org/wiki/Q220'},
+             'score': 0.9, 'match': True}],
+         'annotationMeta': {'annotated': True, 'match': {'value': True}, 'lowestScore': 0.9, 'highestScore': 0.9}},
+        {'id': 'r2$c', 'label': 'Paris', 'metadata': [
+            {'id': 'wd:Q90', 'name': {'value': 'Paris', 'uri': 'https://www.wikidata.org/wiki/Q90'},
+             'score': 0.4, 'match': False}],
+         'annotationMeta': {'annotated': True, 'match': {'value': False}, 'lowestScore': 0.4, 'highestScore': 0.4}},
+    ]
+    return {'table': {}, 'columns': {'c': {'id': 'c', 'label': 'c', 'status': 'reconciliated',
+                                           'context': {'wd': {'uri': 'https://www.wikidata.org/wiki/'}}}},
+            'rows': {f"r{i}": {'id': f"r{i}", 'cells': {'c': cell}} for i, cell in enumerate(cells, start=1)}}
+
+
+def test_parse_reconciled_table_values():
+    df = utils.parseReconciledTable(reconciled_table())
+    assert list(df.index) == ['r1', 'r2']
+    assert list(df['c']) == ['Rome', 'Paris']
+    assert list(df['c entity']) == ['Rome', None]
+    assert list(df['c uri']) == ['https://www.wikidata.org/wiki/Q220', None]
+    assert list(df['c score']) == [0.9, 0.4]
+    assert list(df['c match']) == [True, False]
+
+
+def test_create_cell_metadata_name_field_leaves_response_untouched():
+    reconciliators = [{'id': 'wikidata', 'relativeUrl': '/wikidata', 'name': 'Wikidata',
+                       'uri': 'https://www.wikidata.org/wiki/', 'prefix': 'wd'}]
+    response = [{'id': 'r1$c', 'metadata': [{'id': 'wd:Q220', 'name': 'Rome', 'score': 0.9, 'match': True},
+                                           {'id': 'wd:Q1', 'name': 'Other', 'score': 0.1, 'match': False}]}]
+    before = copy.deepcopy(response)
+    metadata = utils.createCellMetadataNameField(response, 'wikidata', reconciliators, topK=1)
+    assert response == before
+    assert metadata[0]['metadata'] == [{'id': 'wd:Q220', 'score': 0.9, 'match': True,
+                                        'name': {'value': 'Rome', 'uri': 'https://www.wikidata.org/wiki/Q220'}}]
+
+
+def test_error_collector_groups_problems_by_kind_with_a_few_samples():
+    errors = utils.ErrorCollector(maxSamples=2)
+    for row in range(3):
+        errors.add('missingCell', f"r{row}$c")
+    errors.add('invalidCandidates')
+    other = utils.ErrorCollector(maxSamples=2)
+    other.add('missingCell', 'r9$c')
+    other.add('missingRow', 'r10$c')
+    assert errors.merge(other).summary() == {
+        'count': 6,
+        'byKind': {'missingCell': {'count': 4, 'sampleIds': ['r0$c', 'r1$c']},
+                   'invalidCandidates': {'count': 1, 'sampleIds': []},
+                   'missingRow': {'count': 1, 'sampleIds': ['r10$c']}}}
+
+
+def test_malformed_candidates_are_collected_instead_of_raised():
+    reconciliators = [{'id': 'wikidata', 'relativeUrl': '/wikidata', 'name': 'Wikidata',
+                       'uri': 'https://www.wikidata.org/wiki/', 'prefix': 'wd'}]
+    response = [{'id': 'r1$c', 'metadata': [{'id': 'wd:Q220', 'name': 'Rome'}]},
+                {'id': 'r2$c', 'metadata': [{'id': 'no prefix', 'name': 'Paris'}]},
+                {'id': 'r3$c', 'metadata': None}]
+    errors = utils.ErrorCollector()
+    metadata = utils.createCellMetadataNameField(response, 'wikidata', reconciliators, errors)
+    assert [row['id'] for row in metadata] == ['r1$c']
+    assert errors.summary()['byKind'] == {'invalidCandidates': {'count': 2, 'sampleIds': ['r2$c', 'r3$c']}}
+    # Without a collector the problems are discarded
+    assert len(utils.createCellMetadataNameField(response, 'wikidata', reconciliators)) == 1
@@ -1,54 +1,88 @@
+import gc
 import json
+import pickle
+import sys
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from itertools import repeat
+
+import instrumentation
 
 import json
 
+# NORMALIZATION
+
+DATASET_COLUMNS = ["id", "name", "nTables", "lastModifiedDate"]
+TABLE_COLUMNS = ["id", "idDataset", "name", "nCols", "nRows", "lastModifiedDate"]
+SERVICE_COLUMNS = ["id", "relativeUrl", "name"]
+
+
+def parseDates(values):
+    """
+    Parses the dates of a collection column, missing or invalid dates become NaT
+
+    :values: series of date strings
+    :return: series of datetimes
+    """
+    try:
+        return pd.to_datetime(values, errors='coerce', format='mixed')
+    except (TypeError, ValueError):
+        return pd.to_datetime(values, errors='coerce')
+
+
+def normalizeCollection(records, columns, defaults=None, intColumns=(), dateColumns=()):
+    """
+    Builds a dataframe from a list of JSON objects in a single constructor call
+
+    :records: list of dictionaries (a JSON collection)
+    :columns: the columns to keep, keys missing from a record become missing values
+    :defaults: values used for the missing values of some columns
+    :intColumns: columns converted to (nullable) integers
+    :dateColumns: columns parsed as dates
+    :return: a dataframe with typed columns
+    """
+    df = pd.DataFrame.from_records(list(records), columns=columns)
+    if defaults:
+        df = df.fillna({column: value for column, value in defaults.items() if column in df.columns})
+    for column in intColumns:
+        df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+    for column in dateColumns:
+        df[column] = parseDates(df[column])
+    return df
+
+
 def cleanDatasetsData(datasetsList):
     """
     Cleans and formats data related to datasets. It ensures that missing data is handled gracefully
-    and constructs a list of dictionaries with the expected structure.
+    and constructs a dataframe with the same structure as the other collections.
 
     :param datasetsList: JSON string data regarding datasets.
-    :return: A list of dictionaries containing dataset information with keys ["id", "name", "nTables", "lastModifiedDate"].
-             If any key is missing in a dataset entry, a default value is used.
+    :return: A dataframe containing dataset information with columns ["id", "name", "nTables", "lastModifiedDate"].
+             A missing name becomes "Unnamed", a missing number of tables 0 and a missing date NaT.
+             If the data cannot be read, an empty dataframe is returned.
     """
     try:
         # Attempt to parse the JSON string into a Python dictionary
         datasetsList = json.loads(datasetsList)
         
-        # Prepare a list to hold dataset entries
-        data_entries = []
-        
         # Ensure datasetsList is structured as expected
         if "collection" not in datasetsList:
             raise ValueError("Expected 'collection' key not found in datasets list.")
         
-        for dataset in datasetsList["collection"]:
-            # Construct the dataset entry dictionary
-            data_entry = {
-                "id": dataset.get("id", "N/A"),
-                "name": dataset.get("name", "Unnamed"),
-                "nTables": dataset.get("nTables", 0),
-                "lastModifiedDate": dataset.get("lastModifiedDate", "Unknown")
-            }
-            
-            # Append the dataset information as a new entry in the list
-            data_entries.append(data_entry)
-        
-        return data_entries
+        return normalizeCollection(datasetsList["collection"], DATASET_COLUMNS,
+                                   defaults={"name": "Unnamed", "nTables": 0},
+                                   intColumns=["nTables"], dateColumns=["lastModifiedDate"])
     except json.JSONDecodeError:
         # Handle JSON parsing errors
         print("Error parsing JSON from datasets list. Please check the input format.")
-        return []  # Return an empty list as a fallback
     except ValueError as e:
         # Handle other value errors (like missing 'collection' key)
         print(f"Value error: {e}")
-        return []  # Return an empty list as a fallback
     except Exception as e:
         # Handle unexpected errors
         print(f"An unexpected error occurred: {e}")
-        return []  # Return an empty list as a fallback
+    return pd.DataFrame(columns=DATASET_COLUMNS)  # Return an empty dataframe as a fallback
 
 
 # DATASET_TABLE
@@ -61,12 +95,8 @@ def cleanDatasetsTables(tableList):
     :return: a dataframe containing tables information
     """
     tableList = json.loads(tableList)
-    tables = pd.DataFrame(
-        columns=["id", "idDataset", "name", "nCols", "nRows", "lastModifiedDate"])
-    for table in tableList["collection"]:
-        tables.loc[len(tables)] = [table["id"], table["idDataset"], table["name"],
-                                   table["nCols"], table["nRows"], table["lastModifiedDate"]]
-    return tables
+    return normalizeCollection(tableList["collection"], TABLE_COLUMNS,
+                               intColumns=["nCols", "nRows"], dateColumns=["lastModifiedDate"])
 
 
 # SERVICE FUNCTIONS
@@ -78,12 +108,7 @@ def cleanServiceList(serviceList):
     :serviceList: data regarding available services
     :return: dataframe containing reconciliators information
     """
-    serviceList = serviceList
-    reconciliators = pd.DataFrame(columns=["id", "relativeUrl", "name"])
-    for reconciliator in serviceList:
-        reconciliators.loc[len(reconciliators)] = [
-            reconciliator["id"], reconciliator["relativeUrl"], reconciliator["name"]]
-    return reconciliators
+    return normalizeCollection(serviceList, SERVICE_COLUMNS)
 
 
 def getExtender(idExtender, response):
@@ -143,6 +168,57 @@ def getReconciliatorFromPrefix(prefixReconciliator, response):
     return None
 
 
+# ERROR COLLECTION
+
+class ErrorCollector:
+    """
+    Collects the problems met while processing the cells of a table (missing cells,
+    missing annotation metadata, ...) instead of printing them one by one. Each kind of
+    problem is counted and a few sample cell ids are kept
+
+    :maxSamples: the number of sample ids kept for each kind of problem
+    """
+
+    def __init__(self, maxSamples=10):
+        self.maxSamples = maxSamples
+        self.counts = {}
+        self.samples = {}
+
+    def add(self, kind, cellId=None):
+        """Records a problem of the given kind, for the given cell"""
+        count = self.counts.get(kind, 0)
+        self.counts[kind] = count + 1
+        if count < self.maxSamples and cellId is not None:
+            self.samples.setdefault(kind, []).append(cellId)
+
+    def __bool__(self):
+        return bool(self.counts)
+
+    def merge(self, other):
+        """Adds the problems recorded by another collector, e.g. by a worker process"""
+        for kind, count in other.counts.items():
+            self.counts[kind] = self.counts.get(kind, 0) + count
+            samples = self.samples.get(kind, [])
+            free = self.maxSamples - len(samples)
+            if free > 0 and other.samples.get(kind):
+                self.samples[kind] = samples + other.samples[kind][:free]
+        return self
+
+    def summary(self):
+        """
+        :return: dictionary with the total number of problems and, for each kind,
+                 the count and the sample cell ids
+        """
+        return {'count': sum(self.counts.values()),
+                'byKind': {kind: {'count': count, 'sampleIds': self.samples.get(kind, [])}
+                           for kind, count in self.counts.items()}}
+
+
+def errorsOrDiscard(errors):
+    """Returns the given collector, or a new one whose content will be discarded"""
+    return errors if errors is not None else ErrorCollector(maxSamples=0)
+
+
 # CELL OPERATIONS
 
 def calculateScoreBoundCell(metadata):
@@ -153,11 +229,10 @@ def calculateScoreBoundCell(metadata):
     :metadata: metadata of a single cell
     :return: a dictionary containing the two values
     """
-    try:
-        scoreList = [item['score'] for item in metadata]
-        return {'lowestScore': min(scoreList), 'highestScore': max(scoreList)}
-    except:
+    scoreList = [item['score'] for item in metadata or [] if item.get('score') is not None]
+    if not scoreList:
         return {'lowestScore': 0, 'highestScore': 0}
+    return {'lowestScore': min(scoreList), 'highestScore': max(scoreList)}
 
 
 def createAnnotationMetaCell(metadata):
@@ -168,11 +243,25 @@ def createAnnotationMetaCell(metadata):
     :metadata: cell-level metadata
     :return: the dictionary with data regarding annotationMeta
     """
-    scoreBound = calculateScoreBoundCell(metadata)
+    # Scores and match in a single pass over the candidates
+    lowest = highest = None
+    match = False
+    for item in metadata or ():
+        if item.get('match') == True:
+            match = True
+        score = item.get('score')
+        if score is None:
+            continue
+        if lowest is None:
+            lowest = highest = score
+        elif score < lowest:
+            lowest = score
+        elif score > highest:
+            highest = score
     return {'annotated': True,
-            'match': {'value': valueMatchCell(metadata)},
-            'lowestScore': scoreBound['lowestScore'],
-            'highestScore': scoreBound['highestScore']}
+            'match': {'value': match},
+            'lowestScore': lowest if lowest is not None else 0,
+            'highestScore': highest if highest is not None else 0}
 
 
 def valueMatchCell(metadata):
@@ -188,7 +277,30 @@ def valueMatchCell(metadata):
     return False
 
 
-def createCellMetadataNameField(metadata, idReconciliator, reconciliatorResponse):
+def pruneCandidates(candidates, topK=None, minScore=None):
+    """
+    Keeps the best candidates of a cell: the candidates scoring at least minScore, at most
+    topK of them by decreasing score. A matched candidate is always kept
+
+    :candidates: the candidates of a cell, as returned by the reconciliator
+    :topK: the maximum number of candidates kept, all if None
+    :minScore: the minimum score of the candidates kept, no minimum if None
+    :return: the list of the candidates kept, in decreasing score order
+    """
+    if minScore is not None:
+        candidates = [item for item in candidates
+                      if item.get('match') == True or (item.get('score') is not None and item['score'] >= minScore)]
+    if topK is not None and len(candidates) > topK:
+        ranked = sorted(candidates, key=lambda item: item.get('score') or 0, reverse=True)
+        kept = ranked[:topK]
+        kept.extend(item for item in ranked[topK:] if item.get('match') == True)
+        candidates = kept
+    return candidates
+
+
+@instrumentation.traced('utils.createCellMetadataNameField')
+def createCellMetadataNameField(metadata, idReconciliator, reconciliatorResponse, errors=None,
+                                topK=None, minScore=None, compact=False):
     """
     Refactor of the name field within cell-level metadata
     necessary for visualization within SEMTUI
@@ -196,40 +308,241 @@ def createCellMetadataNameField(metadata, idReconciliator, reconciliatorResponse
     :metadata: column-level metadata
     :idReconciliator: ID of the reconciliator performed in the operation
     :reconciliatorResponse: response containing reconciliator information
-    :return: metadata containing the name field in the new format
+    :errors: ErrorCollector receiving the cells whose candidates are malformed
+    :topK: the maximum number of candidates kept for each cell, see pruneCandidates
+    :minScore: the minimum score of the candidates kept for each cell, see pruneCandidates
+    :compact: if True, the names of the cell candidates are left as plain strings and their
+              'prefix:id' ids are interned, the URIs are built when the table is exported
+              (see expandCellMetadata)
+    :return: metadata containing the name field in the new format, without the malformed cells.
+             New rows and candidates are built, the response is left untouched
+    """
+    errors = errorsOrDiscard(errors)
+    uriReconciliator = getReconciliator(idReconciliator, reconciliatorResponse)['uri']
+    prune = topK is not None or minScore is not None
+    valid = []
+    for row in metadata:
+        candidates = row.get("metadata")
+        if not isinstance(candidates, list) or not all(
+                isinstance(item, dict) and 'name' in item and ':' in str(item.get('id', '')) for item in candidates):
+            errors.add('invalidCandidates', row.get("id"))
+            continue
+        # The column entity is kept whole
+        isColumn = row.get("id") == 'column$index'
+        if prune and not isColumn:
+            candidates = pruneCandidates(candidates, topK, minScore)
+        if compact and not isColumn:
+            candidates = [{**item, 'id': sys.intern(item['id'])} for item in candidates]
+        else:
+            candidates = parseNameEntities(candidates, uriReconciliator)
+        valid.append({**row, 'metadata': candidates})
+    return valid
+
+
+def entityUri(idEntity, context):
     """
-    for row in range(len(metadata)):
-        try:
-            for item in range(len(metadata[row]["metadata"])):
-                value = metadata[row]["metadata"][item]['name']
-                uri = metadata[row]["metadata"][item]['id']
-                metadata[row]["metadata"][item]['name'] = parseNameField(value, getReconciliator(
-                    idReconciliator, reconciliatorResponse)['uri'], uri.split(':')[1])
-        except:
-            return []
-    return metadata
+    Builds the URI of an entity from its 'prefix:id' id
+
+    :idEntity: the entity ID, e.g. 'wd:Q42'
+    :context: the context field of the column, mapping the prefixes to their URI
+    :return: the URI, or None if the prefix is not in the context
+    """
+    prefix, _, localId = idEntity.partition(':')
+    knowledgeGraph = context.get(prefix)
+    return knowledgeGraph['uri'] + localId if knowledgeGraph else None
+
+
+def expandCellMetadata(metadata, context):
+    """
+    Returns the candidates of a cell with their name in the {'value', 'uri'} format,
+    expanding the compact candidates (see createCellMetadataNameField). The candidates
+    already expanded are returned as they are, the others are copied
+
+    :metadata: cell-level metadata
+    :context: the context field of the column
+    :return: the cell-level metadata in the SEMTUI format
+    """
+    if not any(isinstance(item.get('name'), str) for item in metadata):
+        return metadata
+    return [dict(item, name={'value': item['name'], 'uri': entityUri(item['id'], context)})
+            if isinstance(item.get('name'), str) else item
+            for item in metadata]
+
+
+def expandRows(table):
+    """
+    Rows of the table with the compact cell metadata expanded, for the export. Only the
+    rows holding compact candidates are copied, the others are shared with the table
+
+    :table: table in raw format
+    :return: the rows, by id
+    """
+    contexts = {name: column.get('context') or {} for name, column in table['columns'].items()}
+    rows = {}
+    for rowId, row in table['rows'].items():
+        cells = None
+        for columnName, cell in row['cells'].items():
+            metadata = cell.get('metadata')
+            if not metadata:
+                continue
+            expanded = expandCellMetadata(metadata, contexts.get(columnName, {}))
+            if expanded is not metadata:
+                if cells is None:
+                    cells = dict(row['cells'])
+                cells[columnName] = dict(cell, metadata=expanded)
+        rows[rowId] = row if cells is None else dict(row, cells=cells)
+    return rows
+
+
+def iterCellResults(metadata):
+    """
+    Resolves the row and column of each cell result of a reconciliator response,
+    without modifying the response. The column result ('column$index') is skipped
+
+    :metadata: cell-level metadata, as returned by createCellMetadataNameField
+    :return: generator of (rowId, columnName, metadata) triples
+    """
+    for item in metadata:
+        itemId = item["id"]
+        if itemId == 'column$index':
+            continue
+        rowId, _, columnName = itemId.partition("$")
+        yield rowId, columnName, item["metadata"]
 
 
-def updateMetadataCells(table, metadata):
+@instrumentation.traced('utils.mergeCellMetadata')
+def mergeCellMetadata(table, cellMetadata, errors=None, annotationMetas=None):
+    """
+    Bulk insertion of cell-level metadata: each result is written into its cell in a
+    single pass, with one lookup of the row and of the cell. The metadata lists are stored
+    in the cells as they are, without copies
+
+    :table: table in raw format
+    :cellMetadata: iterable of (rowId, columnName, metadata) triples, see iterCellResults
+    :errors: ErrorCollector receiving the ids of the results matching no cell of the table
+    :annotationMetas: the annotationMeta of each result, in the same order, if already computed
+    :return: the table in raw format with metadata
+    """
+    errors = errorsOrDiscard(errors)
+    rows = table["rows"]
+    for (rowId, columnName, metadata), annotationMeta in zip(cellMetadata, annotationMetas or repeat(None)):
+        row = rows.get(rowId)
+        cell = row["cells"].get(columnName) if row is not None else None
+        if cell is None:
+            errors.add('missingCell', str(rowId) + "$" + str(columnName))
+            continue
+        cell["metadata"] = metadata
+        cell["annotationMeta"] = annotationMeta if annotationMeta is not None else createAnnotationMetaCell(metadata)
+    return table
+
+
+@instrumentation.traced('utils.updateMetadataCells')
+def updateMetadataCells(table, metadata, errors=None):
     """
     Allows inserting new cell-level metadata
 
     :table: table in raw format
     :metadata: cell-level metadata
+    :errors: ErrorCollector receiving the ids of the results matching no cell of the table
     :return: the table in raw format with metadata
     """
-    for item in metadata:
-        item["id"] = item["id"].split("$")
-        try:
-            table["rows"][item["id"][0]]["cells"][item["id"]
-                                                  [1]]["metadata"] = item["metadata"]
-            table["rows"][item["id"][0]]["cells"][item["id"][1]
-                                                  ]["annotationMeta"] = createAnnotationMetaCell(item["metadata"])
-        except:
-            print("")
-    return table
+    return mergeCellMetadata(table, iterCellResults(metadata), errors)
+
+
+def postProcessShard(shard, idReconciliator, reconciliatorResponse, topK=None, minScore=None, compact=False):
+    """
+    Post-processes a shard of a reconciliator response in a worker process: the decoding,
+    the name field of the candidates and the annotationMeta of each cell
+
+    :shard: the items of a range of rows, or the undecoded JSON text of a batch response
+    :idReconciliator: ID of the reconciliator performed in the operation
+    :reconciliatorResponse: response containing reconciliator information
+    :topK, minScore, compact: see createCellMetadataNameField
+    :return: the pickled tuple (metadata, annotationMetas, errors), annotationMetas following
+             the order of iterCellResults(metadata)
+    """
+    if isinstance(shard, (str, bytes)):
+        shard = json.loads(shard)
+    errors = ErrorCollector()
+    metadata = createCellMetadataNameField(shard, idReconciliator, reconciliatorResponse, errors,
+                                           topK, minScore, compact)
+    annotationMetas = [createAnnotationMetaCell(cellMetadata) for _, _, cellMetadata in iterCellResults(metadata)]
+    # Pickled here once, the pool then only copies bytes back to the parent process
+    return pickle.dumps((metadata, annotationMetas, errors), protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def loadShardResult(result):
+    """Unpickles the result of postProcessShard without running the garbage collector"""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return pickle.loads(result)
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def shardResponse(response, nShards):
+    """
+    Splits the items of a reconciliator response into contiguous row ranges
+
+    :response: the items returned by the reconciliator, in the order of the rows
+    :nShards: the number of shards
+    :return: list of lists of items
+    """
+    nShards = max(1, min(int(nShards), len(response)))
+    bounds = [len(response) * i // nShards for i in range(nShards + 1)]
+    return [response[bounds[i]:bounds[i + 1]] for i in range(nShards)]
+
+
+@instrumentation.traced('utils.postProcessReconciliation')
+def postProcessReconciliation(table, shards, idReconciliator, reconciliatorResponse,
+                              processes=None, errors=None, executor=None, topK=None, minScore=None, compact=False):
+    """
+    Inserts a reconciliator response into the table. With several processes the shards
+    (row ranges of the response) are decoded and post-processed in parallel, then merged
+    into the table in order. The results still travel back to this process, which bounds
+    the speedup: it needs several cores and is measured by benchmark.py --postprocess-cells
 
-def addExtendedCell(table, newColumnData, newColumnName, idReconciliator, reconciliatorResponse):
+    :table: table in raw format
+    :shards: the response as a list of shards, each being the items of a range of rows
+             (see shardResponse) or the undecoded JSON text of the response of a batch
+    :idReconciliator: ID of the reconciliator performed in the operation
+    :reconciliatorResponse: response containing reconciliator information
+    :processes: the number of worker processes, the shards are processed here if None or 1
+    :errors: ErrorCollector receiving the problems met in the cells
+    :executor: a ProcessPoolExecutor to reuse, a new one is created if None
+    :topK, minScore, compact: see createCellMetadataNameField
+    :return: a tuple (table, metadata), metadata being needed by updateMetadataColumn
+    """
+    processes = max(1, min(int(processes or 1), len(shards)))
+    if processes == 1:
+        response = []
+        for shard in shards:
+            response.extend(json.loads(shard) if isinstance(shard, (str, bytes)) else shard)
+        metadata = createCellMetadataNameField(response, idReconciliator, reconciliatorResponse, errors,
+                                               topK, minScore, compact)
+        return updateMetadataCells(table, metadata, errors), metadata
+    errors = errorsOrDiscard(errors)
+    ownExecutor = executor is None
+    if ownExecutor:
+        executor = ProcessPoolExecutor(max_workers=processes)
+    metadata = []
+    try:
+        # map keeps the order of the shards, so the cells are merged row range by row range
+        for result in executor.map(postProcessShard, shards, repeat(idReconciliator), repeat(reconciliatorResponse),
+                                   repeat(topK), repeat(minScore), repeat(compact)):
+            shardMetadata, annotationMetas, shardErrors = loadShardResult(result)
+            errors.merge(shardErrors)
+            mergeCellMetadata(table, iterCellResults(shardMetadata), errors, annotationMetas)
+            metadata.extend(shardMetadata)
+    finally:
+        if ownExecutor:
+            executor.shutdown()
+    return table, metadata
+
+@instrumentation.traced('utils.addExtendedCell')
+def addExtendedCell(table, newColumnData, newColumnName, idReconciliator, reconciliatorResponse, errors=None):
     """
     Creates and inserts data related to the new column added with the extension into the table 
     at the cell level.
@@ -239,9 +552,10 @@ def addExtendedCell(table, newColumnData, newColumnName, idReconciliator, reconc
     :newColumnName: the name of the new column to add in the table
     :idReconciliator: the ID of the reconciliator used in the original column
     :reconciliatorResponse: response containing reconciliator information
+    :errors: ErrorCollector receiving the extended cells matching no row of the table
     :return: the table with completed cell fields
     """
-    rowKeys = newColumnData['cells']
+    errors = errorsOrDiscard(errors)
     entity = checkEntity(newColumnData)
     if 'kind' in newColumnData: 
         columnType = newColumnData['kind']
@@ -250,23 +564,25 @@ def addExtendedCell(table, newColumnData, newColumnName, idReconciliator, reconc
             columnType = 'entity'
         else:
             columnType = 'literal'
-    print(columnType)
-    for rowKey in rowKeys:
-        table['rows'][rowKey]['cells'][newColumnName] = {}
-        table['rows'][rowKey]['cells'][newColumnName]['id'] = str(
-            rowKey) + "$" + str(newColumnName)
-        table['rows'][rowKey]['cells'][newColumnName]['label'] = newColumnData['cells'][rowKey]['label']
-        table['rows'][rowKey]['cells'][newColumnName]['metadata'] = parseNameEntities(
-            newColumnData['cells'][rowKey]['metadata'], getReconciliator(idReconciliator, reconciliatorResponse)['uri'])
-        if columnType == 'entity':
-            table['rows'][rowKey]['cells'][newColumnName]['annotationMeta'] = createAnnotationMetaCell(
-                table['rows'][rowKey]['cells'][newColumnName]['metadata'])
-        else:
-            table['rows'][rowKey]['cells'][newColumnName]['annotationMeta'] = {}
+    uriReconciliator = getReconciliator(idReconciliator, reconciliatorResponse)['uri']
+    annotate = columnType == 'entity'
+    rows = table['rows']
+    for rowKey, newCell in newColumnData['cells'].items():
+        row = rows.get(rowKey)
+        if row is None:
+            errors.add('missingRow', str(rowKey) + "$" + str(newColumnName))
+            continue
+        metadata = parseNameEntities(newCell['metadata'], uriReconciliator)
+        row['cells'][newColumnName] = {
+            'id': str(rowKey) + "$" + str(newColumnName),
+            'label': newCell['label'],
+            'metadata': metadata,
+            'annotationMeta': createAnnotationMetaCell(metadata) if annotate else {},
+        }
     return table
 
 # COLUMN OPERATIONS
-def calculateScoreBoundColumn(table, columnName, reconciliatorResponse):
+def calculateScoreBoundColumn(table, columnName, reconciliatorResponse, errors=None):
     """
     Calculates the min and max value of the score of the results obtained for
     a single column, also returns whether all cells obtained a match or not
@@ -274,25 +590,26 @@ def calculateScoreBoundColumn(table, columnName, reconciliatorResponse):
     :table: the table in raw format
     :columnName: the name of the column to work on
     :reconciliatorResponse: response containing reconciliator information
+    :errors: ErrorCollector receiving the cells without annotation metadata
     :return: a dictionary containing the results
     """
+    errors = errorsOrDiscard(errors)
     allScores = []
     matchValue = True
-    rows = table["rows"].keys()
-    for row in rows:
-        try:
-            annotationMeta = table["rows"][row]['cells'][columnName]['annotationMeta']
-            if annotationMeta['annotated'] == True:
-                allScores.append(annotationMeta['lowestScore'])
-                allScores.append(annotationMeta['highestScore'])
-            if annotationMeta['match']['value'] == False:
-                matchValue = False
-        except:
-            print("Missed cell annotation metadata")
-    try:
-        return {'lowestScore': min(allScores), 'highestScore': max(allScores), 'matchValue': matchValue}
-    except:
+    for rowId, row in table["rows"].items():
+        cell = row['cells'].get(columnName)
+        annotationMeta = cell.get('annotationMeta') if cell is not None else None
+        if not annotationMeta or 'annotated' not in annotationMeta or 'match' not in annotationMeta:
+            errors.add('missingCellAnnotation', str(rowId) + "$" + str(columnName))
+            continue
+        if annotationMeta['annotated'] == True:
+            allScores.append(annotationMeta['lowestScore'])
+            allScores.append(annotationMeta['highestScore'])
+        if annotationMeta['match']['value'] == False:
+            matchValue = False
+    if not allScores:
         return {'lowestScore': 0, 'highestScore': 0, 'matchValue': False}
+    return {'lowestScore': min(allScores), 'highestScore': max(allScores), 'matchValue': matchValue}
 
 
 def calculateNCellsReconciliatedColumn(table, columnName):
@@ -305,17 +622,15 @@ def calculateNCellsReconciliatedColumn(table, columnName):
     :return: the number of reconciled cells
     """
     cellsReconciliated = 0
-    rowsIndex = table["rows"].keys()
-    for row in rowsIndex:
-        try:
-            if table['rows'][row]['cells'][columnName]['annotationMeta']["annotated"] == True:
-                cellsReconciliated += 1
-        except:
-            cellsReconciliated = cellsReconciliated
+    for row in table["rows"].values():
+        cell = row['cells'].get(columnName)
+        if cell is not None and (cell.get('annotationMeta') or {}).get("annotated") == True:
+            cellsReconciliated += 1
     return cellsReconciliated
 
 
-def updateMetadataColumn(table, columnName, idReconciliator, metadata, reconciliatorResponse):
+@instrumentation.traced('utils.updateMetadataColumn')
+def updateMetadataColumn(table, columnName, idReconciliator, metadata, reconciliatorResponse, errors=None):
     """
     Allows inserting column-level metadata
 
@@ -324,6 +639,7 @@ def updateMetadataColumn(table, columnName, idReconciliator, metadata, reconcili
     :idReconciliator: ID of the reconciliator used
     :metadata: column-level metadata
     :reconciliatorResponse: response containing reconciliator information
+    :errors: ErrorCollector receiving the problems met in the cells of the column
     :return: the table with the new metadata inserted
     """
     # inquire about the different states
@@ -332,33 +648,35 @@ def updateMetadataColumn(table, columnName, idReconciliator, metadata, reconcili
     table['columns'][columnName]['context'] = createContextColumn(
         table, columnName, idReconciliator, reconciliatorResponse)
     table['columns'][columnName]['metadata'] = createMetadataFieldColumn(
-        metadata)
+        metadata, errors)
     table['columns'][columnName]['annotationMeta'] = createAnnotationMetaColumn(
-        True, table, columnName, reconciliatorResponse)
+        True, table, columnName, reconciliatorResponse, errors)
     return table
 
 
-def createMetadataFieldColumn(metadata):
+def createMetadataFieldColumn(metadata, errors=None):
     """
     Allows creating the metadata field for a column, which will
     then be inserted into the general column-level metadata
 
     :metadata: column-level metadata
+    :errors: ErrorCollector receiving the problems met in the metadata
     :return: the metadata field at the column level
     """
+    columnMetadata = getColumnMetadata(metadata, errors)
     return [
         {'id': '',
-         'match': getColumnMetadata(metadata)['matchMetadataValue'],
+         'match': columnMetadata['matchMetadataValue'],
          'score': 0,
          'name':{'value': '', 'uri': ''},
-         'entity': getColumnMetadata(metadata)['entity'],
+         'entity': columnMetadata['entity'],
          'property':[],
-         'type': getColumnMetadata(metadata)['type']}
+         'type': columnMetadata['type']}
     ]
 
-def createAnnotationMetaColumn(annotated, table, columnName, reconciliatorResponse):
+def createAnnotationMetaColumn(annotated, table, columnName, reconciliatorResponse, errors=None):
     scoreBound = calculateScoreBoundColumn(
-        table, columnName, reconciliatorResponse)
+        table, columnName, reconciliatorResponse, errors)
     return {'annotated': annotated,
             'match': {'value': scoreBound['matchValue']},
             'lowestScore': scoreBound['lowestScore'],
@@ -366,33 +684,36 @@ def createAnnotationMetaColumn(annotated, table, columnName, reconciliatorRespon
             }
 
 
-def getColumnMetadata(metadata):
+def getColumnMetadata(metadata, errors=None):
     """
     Allows retrieving column-level data, particularly
     the entity corresponding to the column, the column types,
     and the match value of the entities in the column
 
     :metadata: column metadata obtained from the reconciliator
+    :errors: ErrorCollector receiving the results without entity or type
     :return: dictionary containing the different data
     """
+    errors = errorsOrDiscard(errors)
     entity = []
     types = []
-    for i in range(len(metadata)):
-        try:
-            if metadata[i]['id'] == ['column', 'index']:
-                entity = metadata[i]['metadata']
-        except:
-            print("No column entity is provided")
-        try:
-            if metadata[i]['id'] != ['column', 'index']:
-                for j in range(len(metadata[i]['metadata'])):
-                    if metadata[i]['metadata'][j]['match'] == True:
-                        types.append(metadata[i]['metadata'][j]['type'][0])
-        except:
-            print("No column type is provided")
+    for item in metadata:
+        itemId = item.get('id')
+        if itemId is None:
+            errors.add('missingColumnEntity')
+            continue
+        if itemId == ['column', 'index'] or itemId == 'column$index':
+            entity = item.get('metadata') or []
+            continue
+        for candidate in item.get('metadata') or []:
+            if candidate.get('match') == True:
+                if candidate.get('type'):
+                    types.append(candidate['type'][0])
+                else:
+                    errors.add('missingColumnType', itemId if isinstance(itemId, str) else "$".join(itemId))
     matchMetadataValue = True
     for item in entity:
-        if item['match'] == False:
+        if item.get('match') == False:
             matchMetadataValue = False
     return {'entity': entity, 'type': types, 'matchMetadataValue': matchMetadataValue}
 
@@ -422,7 +743,8 @@ def checkEntity(newColumnData):
             entity = True
     return entity
 
-def addExtendedColumn(table, newColumnData, newColumnName, idReconciliator, reconciliatorResponse):
+@instrumentation.traced('utils.addExtendedColumn')
+def addExtendedColumn(table, newColumnData, newColumnName, idReconciliator, reconciliatorResponse, errors=None):
     """
     Creates and inserts data into the table (at the column level) related to the new column 
     added with the extension
@@ -432,10 +754,10 @@ def addExtendedColumn(table, newColumnData, newColumnName, idReconciliator, reco
     :newColumnName: the name of the new column to add in the table
     :idReconciliator: the ID of the reconciliator used in the original column
     :reconciliatorResponse: response containing reconciliator information
+    :errors: ErrorCollector receiving the problems met in the cells of the column
     :return: the table with completed column fields
     """
     entity = checkEntity(newColumnData)
-    print(entity)
     table['columns'][newColumnName] = {}
     table['columns'][newColumnName]['id'] = newColumnName
     table['columns'][newColumnName]['label'] = newColumnName
@@ -451,7 +773,7 @@ def addExtendedColumn(table, newColumnData, newColumnName, idReconciliator, reco
 
     if ('kind' in newColumnData and newColumnData['kind'] == 'entity') or entity == True:
         table['columns'][newColumnName]['annotationMeta'] = createAnnotationMetaColumn(
-            True, table, newColumnName, reconciliatorResponse)
+            True, table, newColumnName, reconciliatorResponse, errors)
         table['columns'][newColumnName]['context'] = createContextColumn(
             table, newColumnName, idReconciliator, reconciliatorResponse)
     else:
@@ -459,7 +781,8 @@ def addExtendedColumn(table, newColumnData, newColumnName, idReconciliator, reco
         table['columns'][newColumnName]['context'] = {}
     return table
 
-def addExtendedColumns(table, extensionData, newColumnsName, reconciliatorResponse):
+@instrumentation.traced('utils.addExtendedColumns')
+def addExtendedColumns(table, extensionData, newColumnsName, reconciliatorResponse, errors=None):
     """
     Allows iterating the operations to insert a single column for
     all the properties to be inserted
@@ -467,6 +790,7 @@ def addExtendedColumns(table, extensionData, newColumnsName, reconciliatorRespon
     :table: table in raw format
     :extensionData: data obtained from the extender
     :newColumnsName: names of the new columns to insert into the table
+    :errors: ErrorCollector receiving the problems met in the new cells
     :return: the table with the new fields inserted
     """
     newColumns = extensionData['columns'].keys()
@@ -475,9 +799,9 @@ def addExtendedColumns(table, extensionData, newColumnsName, reconciliatorRespon
         idReconciliator = getColumnIdReconciliator(
             table, extensionData['meta'][columnKey], reconciliatorResponse)
         table = addExtendedCell(
-            table, extensionData['columns'][columnKey], newColumnsName[i], idReconciliator, reconciliatorResponse)
+            table, extensionData['columns'][columnKey], newColumnsName[i], idReconciliator, reconciliatorResponse, errors)
         table = addExtendedColumn(
-            table, extensionData['columns'][columnKey], newColumnsName[i], idReconciliator, reconciliatorResponse)
+            table, extensionData['columns'][columnKey], newColumnsName[i], idReconciliator, reconciliatorResponse, errors)
         i += 1
     return table
 
@@ -497,30 +821,30 @@ def getColumnIdReconciliator(table, columnName, reconciliatorResponse):
 
 # TABLE OPERATIONS
 
-def calculateScoreBoundTable(table):
+def calculateScoreBoundTable(table, errors=None):
     """
     Calculates the minimum and maximum score obtained in
     the results of the entire table
 
     :table: the table in raw format
+    :errors: ErrorCollector receiving the columns without annotation metadata
     :return: a dictionary containing the two values
     """
+    errors = errorsOrDiscard(errors)
     allScores = []
-    reconciliateColumns = [column for column in table['columns'].keys(
-    ) if table['columns'][column]['status'] != 'empty']
-    for column in reconciliateColumns:
-        try:
-            if table['columns'][column]['annotationMeta']['annotated'] == True:
-                allScores.append(table['columns'][column]
-                                 ['annotationMeta']['lowestScore'])
-                allScores.append(table['columns'][column]
-                                 ['annotationMeta']['highestScore'])
-        except:
-            print("Missed column annotation metadata")
-    try:
-        return {'lowestScore': min(allScores), 'highestScore': max(allScores)}
-    except:
+    for columnName, column in table['columns'].items():
+        if column['status'] == 'empty':
+            continue
+        annotationMeta = column.get('annotationMeta')
+        if not annotationMeta or 'annotated' not in annotationMeta:
+            errors.add('missingColumnAnnotation', columnName)
+            continue
+        if annotationMeta['annotated'] == True:
+            allScores.append(annotationMeta['lowestScore'])
+            allScores.append(annotationMeta['highestScore'])
+    if not allScores:
         return {'lowestScore': 0, 'highestScore': 0}
+    return {'lowestScore': min(allScores), 'highestScore': max(allScores)}
 
 
 def calculateNCellsReconciliated(table):
@@ -532,26 +856,22 @@ def calculateNCellsReconciliated(table):
     :return: the number of reconciled cells
     """
     cellsReconciliated = 0
-    columnsName = table['columns'].keys()
-    for column in columnsName:
-        try:
-            contextReconciliator = table['columns'][column]['context'].keys()
-            for reconcliator in contextReconciliator:
-                cellsReconciliated += int(table['columns'][column]
-                                          ['context'][reconcliator]['reconciliated'])
-        except:
-            cellsReconciliated += 0
+    for column in table['columns'].values():
+        for context in (column.get('context') or {}).values():
+            cellsReconciliated += int(context.get('reconciliated', 0))
     return cellsReconciliated
 
 
-def updateMetadataTable(table):
+@instrumentation.traced('utils.updateMetadataTable')
+def updateMetadataTable(table, errors=None):
     """
     Inserts metadata at the table level
 
     :table: table in raw format
+    :errors: ErrorCollector receiving the columns without annotation metadata
     :return: the table with the new metadata inserted
     """
-    scoreBound = calculateScoreBoundTable(table)
+    scoreBound = calculateScoreBoundTable(table, errors)
     table['table']['minMetaScore'] = scoreBound['lowestScore']
     table['table']['maxMetaScore'] = scoreBound['highestScore']
     table['table']['nCellsReconciliated'] = calculateNCellsReconciliated(table)
@@ -560,6 +880,7 @@ def updateMetadataTable(table):
 
 # PAYLOAD
 
+@instrumentation.traced('utils.createUpdatePayload')
 def createUpdatePayload(table):
     """
     Creates the payload required to perform the table update operation
@@ -579,11 +900,13 @@ def createUpdatePayload(table):
                                 }
     payload["columns"]["allIds"] = list(table["columns"].keys())
     payload["rows"]["allIds"] = list(table["rows"].keys())
-    payload["rows"]["byId"] = table["rows"]
+    # the compact cell metadata is expanded here, see createCellMetadataNameField
+    payload["rows"]["byId"] = expandRows(table)
     return payload
 
    
 
+@instrumentation.traced('utils.createReconciliationPayload')
 def createReconciliationPayload(table, columnName, idReconciliator):
     """
     Creates the payload for the reconciliation request
@@ -601,6 +924,31 @@ def createReconciliationPayload(table, columnName, idReconciliator):
     return {"serviceId": idReconciliator, "items": rows}
 
 
+def splitReconciliationPayload(payload, batchSize):
+    """
+    Splits a reconciliation payload into smaller payloads of at most batchSize cells.
+    The column item ('column$index') is only sent with the first batch
+
+    :payload: the payload created by createReconciliationPayload
+    :batchSize: maximum number of cells per payload, None to keep a single payload
+    :return: list of payloads
+    """
+    if batchSize is None:
+        return [payload]
+    if batchSize < 1:
+        raise ValueError(f"batchSize must be at least 1, got {batchSize}")
+    columnItems = [item for item in payload["items"] if item["id"] == 'column$index']
+    cellItems = [item for item in payload["items"] if item["id"] != 'column$index']
+    batches = []
+    for start in range(0, max(len(cellItems), 1), batchSize):
+        items = cellItems[start:start + batchSize]
+        if start == 0:
+            items = columnItems + items
+        batches.append({"serviceId": payload["serviceId"], "items": items})
+    return batches
+
+
+@instrumentation.traced('utils.createExensionPayload')
 def createExensionPayload(table, reconciliatedColumnName, idExtender, properties):
     """
     Creates the payload for the extension request
@@ -629,6 +977,24 @@ def createExensionPayload(table, reconciliatedColumnName, idExtender, properties
     return payload
 
 
+def mergeExtensionResponses(responses):
+    """
+    Merges the extender responses of several batches of rows into a single response
+
+    :responses: the decoded responses, in the order of the batches
+    :return: the extension data, as if all the rows had been sent at once
+    """
+    merged = {'columns': {}, 'meta': {}}
+    for response in responses:
+        merged['meta'].update(response.get('meta', {}))
+        for columnKey, column in response.get('columns', {}).items():
+            if columnKey not in merged['columns']:
+                merged['columns'][columnKey] = dict(column, cells=dict(column.get('cells', {})))
+            else:
+                merged['columns'][columnKey]['cells'].update(column.get('cells', {}))
+    return merged
+
+
 # PARSE FUNCTIONS
 
 def parseNameMetadata(metadata, uriReconciliator):
@@ -639,9 +1005,7 @@ def parseNameMetadata(metadata, uriReconciliator):
     :uriReconciliator: the URI of the affiliated knowledge graph
     :return: metadata in the correct format
     """
-    for item in metadata:
-        item['entity'] = parseNameEntities(item['entity'], uriReconciliator)
-    return metadata
+    return [{**item, 'entity': parseNameEntities(item['entity'], uriReconciliator)} for item in metadata]
 
 
 def parseNameEntities(entities, uriReconciliator):
@@ -650,12 +1014,10 @@ def parseNameEntities(entities, uriReconciliator):
 
     :entities: entities present in the cell/column
     :uriReconciliator: the URI of the affiliated knowledge graph
-    :return: entities in the correct format
+    :return: new entities in the correct format
     """
-    for entity in entities:
-        entity['name'] = parseNameField(
-            entity['name'], uriReconciliator, entity['id'].split(':')[1])
-    return entities
+    return [{**entity, 'name': parseNameField(entity['name'], uriReconciliator, entity['id'].split(':')[1])}
+            for entity in entities]
 
 
 def parseNameField(name, uriReconciliator, idEntity):
@@ -673,6 +1035,7 @@ def parseNameField(name, uriReconciliator, idEntity):
     }
 
 
+@instrumentation.traced('utils.parseTable')
 def parseTable(table):
     """
     Obtains the table in parsed format, as a dataframe
@@ -696,3 +1059,57 @@ def parseTable(table):
         dfTable.loc[len(dfTable)] = row
     dfTable = dfTable.set_index(['tableIndex'])
     return dfTable
+
+
+@instrumentation.traced('utils.parseReconciledTable')
+def parseReconciledTable(table):
+    """
+    Obtains the table in parsed format together with the reconciliation results:
+    for each reconciled column, the columns '<column> entity' (name of the matched
+    entity), '<column> uri', '<column> score' (highest score of the cell) and
+    '<column> match' are added next to it. The rows are read in a single pass
+    and each column is built at once
+
+    :table: table in raw format (dictionary)
+    :return: a dataframe with the labels and the reconciliation results, None in the missing cells
+    """
+    columnNames = list(table["columns"].keys())
+    reconciledColumns = [column for column in columnNames
+                         if table["columns"][column].get("context")]
+    rowIds = []
+    data = {column: [] for column in columnNames}
+    results = {column: {'entity': [], 'uri': [], 'score': [], 'match': []} for column in reconciledColumns}
+    contexts = {column: table["columns"][column]["context"] for column in reconciledColumns}
+    for row in table["rows"].values():
+        rowIds.append(row["id"])
+        cells = row["cells"]
+        for column in columnNames:
+            cell = cells.get(column)
+            data[column].append(cell.get("label") if cell else None)
+        for column in reconciledColumns:
+            cell = cells.get(column) or {}
+            annotationMeta = cell.get("annotationMeta") or {}
+            matched = next((item for item in cell.get("metadata") or [] if item.get("match")), None)
+            name = matched.get("name") if matched else None
+            results[column]['entity'].append(name.get("value") if isinstance(name, dict) else name)
+            if isinstance(name, dict):
+                uri = name.get("uri")
+            else:
+                # compact candidate, see createCellMetadataNameField
+                uri = entityUri(matched["id"], contexts[column]) if name is not None else None
+            results[column]['uri'].append(uri)
+            results[column]['score'].append(annotationMeta.get("highestScore"))
+            results[column]['match'].append((annotationMeta.get("match") or {}).get("value"))
+    index = pd.Index(rowIds, name="tableIndex")
+    frame = {}
+    # Labels, entities and URIs stay object columns, whose missing cells are None
+    # (pandas 3 would infer its str dtype, whose missing cells are NaN)
+    for column in columnNames:
+        frame[column] = pd.Series(data[column], index=index, dtype=object)
+        if column in results:
+            frame[column + " entity"] = pd.Series(results[column]['entity'], index=index, dtype=object)
+            frame[column + " uri"] = pd.Series(results[column]['uri'], index=index, dtype=object)
+            frame[column + " score"] = pd.to_numeric(pd.Series(results[column]['score'], index=index, dtype=object))
+            frame[column + " match"] = pd.Series(results[column]['match'], index=index, dtype="boolean")
+    dfTable = pd.DataFrame(frame, index=index)
+    return dfTable